@@ -2,11 +2,20 @@
 Flask Web Application - Xếp Lịch Thi
 """
 
-from flask import Flask, request, jsonify, render_template, send_file
+from flask import Flask, request, jsonify, render_template, send_file, Response
 import os
 import json
+import time
+import atexit
+import threading
 from werkzeug.utils import secure_filename
-from scheduler import ExamScheduler, SchedulerConfig, SchedulerResult
+from scheduler import ExamScheduler, SchedulerConfig, SchedulerResult, rai_sv_vao_to_thi, tach_ho_ten
+from solve_jobs import SolveJobManager
+from schedule_store import ScheduleStore, lhp_key
+from student_sync import StudentFileSync
+from slot_occupancy import StudentSlotIndex
+from exam_config import load_exam_config
+from input_cache import read_excel_cached, convert_workbook, validate_columns, invalidate as invalidate_input_cache
 from datetime import datetime
 import pandas as pd
 import math
@@ -20,10 +29,27 @@ UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
 RESULT_FOLDER = os.path.join(BASE_DIR, 'results')
 RESULT_FOLDER = os.path.join(BASE_DIR, 'results')
 
+# Lịch tốt nhất hiện có của lần chạy đang/đã chạy (ghi liên tục trong lúc giải)
+INCUMBENT_FILE = os.path.join(RESULT_FOLDER, 'lich_thi_tam.json')
+
 # Tạo thư mục nếu chưa có
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(RESULT_FOLDER, exist_ok=True)
 
+# Job xếp lịch chạy nền (1 job chạy tại 1 thời điểm, các job khác xếp hàng)
+solve_jobs = SolveJobManager(max_workers=1)
+
+# Lịch thi đang chỉnh sửa (giữ trong bộ nhớ, lưu qua change log + gộp định kỳ vào Excel)
+schedule_store = ScheduleStore(os.path.join(BASE_DIR, 'ket_qua_xep_lich_thi.xlsx'))
+atexit.register(schedule_store.flush)
+
+# Chỉ số SV × (Ngày, Ca) cho kiểm tra trùng lịch khi chuyển nhiều tổ thi
+slot_index = StudentSlotIndex(schedule_store)
+
+# Bảng SV thi đã xuất (cập nhật tăng dần theo các lần sửa lịch, ghi file nền)
+student_sync = StudentFileSync(os.path.join(BASE_DIR, 'BangTongHopLichThiSinhVien_KetQua.xlsx'))
+atexit.register(student_sync.flush)
+
 # File types được phép
 ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
 
@@ -40,6 +66,18 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def find_latest_result():
+    """
+    File ket_qua_xep_lich_*.xlsx mới nhất trong results/ (dùng làm warm start).
+    Nếu lần chạy sau đó bị dừng giữa chừng, dùng lịch tạm (INCUMBENT_FILE) của lần chạy đó.
+    """
+    candidates = [
+        os.path.join(RESULT_FOLDER, f) for f in os.listdir(RESULT_FOLDER)
+        if (f.startswith('ket_qua_xep_lich_') and f.endswith('.xlsx')) or f == os.path.basename(INCUMBENT_FILE)
+    ]
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+
 
 
 
@@ -70,12 +108,30 @@ def upload_files():
         filename = secure_filename(file.filename)
     
     filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
+    
+    # Lưu tạm, parse mọi sheet 1 lần và kiểm tra cột trước khi thay file cũ
+    tmp_path = os.path.join(UPLOAD_FOLDER, f'.upload_{filename}')
+    file.save(tmp_path)
+    try:
+        sheets = pd.read_excel(tmp_path, sheet_name=None)
+    except Exception as e:
+        os.remove(tmp_path)
+        return jsonify({'success': False, 'error': f'Không đọc được file: {e}'})
+    
+    errors = validate_columns(file_type, sheets)
+    if errors:
+        os.remove(tmp_path)
+        return jsonify({'success': False, 'error': '; '.join(errors)})
+    
+    os.replace(tmp_path, filepath)
+    invalidate_input_cache(filepath)  # File mới -> bỏ kho của file cũ
+    convert_workbook(filepath, sheets)  # Các lần đọc sau lấy từ kho, không parse Excel lại
     
     return jsonify({
         'success': True,
         'filename': filename,
-        'size': os.path.getsize(filepath)
+        'size': os.path.getsize(filepath),
+        'sheets': list(sheets.keys())
     })
 
 
@@ -97,12 +153,40 @@ def get_files():
     return jsonify({'success': True, 'files': files})
 
 
+@app.route('/api/analyze', methods=['GET', 'POST'])
+def analyze():
+    """Phân tích nhanh tính khả thi của dữ liệu đã upload (không chạy solver)"""
+    missing_files = [
+        filename for filename in FILE_TYPES.values()
+        if not os.path.exists(os.path.join(UPLOAD_FOLDER, filename))
+    ]
+    if missing_files:
+        return jsonify({
+            'success': False,
+            'error': f'Thiếu các file: {", ".join(missing_files)}'
+        })
 
+    scheduler = ExamScheduler(SchedulerConfig())
+    load_result = scheduler.load_data(
+        path_lhp=os.path.join(UPLOAD_FOLDER, FILE_TYPES['lhp']),
+        path_data=os.path.join(UPLOAD_FOLDER, FILE_TYPES['data']),
+        path_cfg=os.path.join(UPLOAD_FOLDER, FILE_TYPES['cfg']),
+        path_sv=os.path.join(UPLOAD_FOLDER, FILE_TYPES['sv'])
+    )
+    if not load_result['success']:
+        return jsonify({
+            'success': False,
+            'error': f'Lỗi đọc dữ liệu: {load_result.get("error", "Unknown")}'
+        })
+
+    analysis = scheduler.analyze_feasibility()
+    analysis['data_stats'] = load_result['stats']
+    return jsonify(analysis)
 
 
 @app.route('/api/solve', methods=['POST'])
 def solve():
-    """Chạy solver xếp lịch"""
+    """Tạo job xếp lịch chạy nền, trả về job_id ngay"""
     # Kiểm tra files
     missing_files = []
     for file_type, filename in FILE_TYPES.items():
@@ -117,7 +201,7 @@ def solve():
         })
     
     # Config mặc định (đã loại bỏ tùy chỉnh)
-    config = SchedulerConfig(
+    config_kwargs = dict(
         max_to_per_ca=68,
         sv_khong_trung_ca=True,
         ctdt_khong_trung_ngay=True,
@@ -125,61 +209,60 @@ def solve():
         he_so_penalty_lien_ngay=10,
         solver_timeout=300, # Tăng timeout mặc định
         num_workers=8,
-        distribute_uniformly=True # Luôn bật load balancing
+        distribute_uniformly=True, # Luôn bật load balancing
+        warm_start_file=find_latest_result(), # Gợi ý từ lần xếp lịch thành công gần nhất
+        incumbent_file=INCUMBENT_FILE # Lưu lịch tạm để không mất kết quả nếu job bị dừng
     )
+    # engine="heuristic": lịch xem trước trong vài giây (không chạy CP-SAT)
+    engine = (request.get_json(silent=True) or {}).get('engine', 'cpsat')
+    if engine in ('cpsat', 'heuristic'):
+        config_kwargs['engine'] = engine
     
-    # Khởi tạo scheduler
-    scheduler = ExamScheduler(config)
-    
-    # Load data
-    load_result = scheduler.load_data(
+    paths = dict(
         path_lhp=os.path.join(UPLOAD_FOLDER, FILE_TYPES['lhp']),
         path_data=os.path.join(UPLOAD_FOLDER, FILE_TYPES['data']),
         path_cfg=os.path.join(UPLOAD_FOLDER, FILE_TYPES['cfg']),
         path_sv=os.path.join(UPLOAD_FOLDER, FILE_TYPES['sv'])
     )
     
-    if not load_result['success']:
-        return jsonify({
-            'success': False,
-            'error': f'Lỗi đọc dữ liệu: {load_result.get("error", "Unknown")}'
-        })
-    
-    # Solve
-    result = scheduler.solve()
-    
-    if result.error:
-        return jsonify({
-            'success': False,
-            'status': result.status,
-            'error': result.error,
-            'data_stats': load_result['stats']
-        })
-    
-    # Export kết quả
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    output_filename = f'ket_qua_xep_lich_{timestamp}.xlsx'
-    output_path = os.path.join(RESULT_FOLDER, output_filename)
-    
-    export_result = scheduler.export_to_excel(result, output_path)
+    job_id = solve_jobs.submit(paths, config_kwargs, RESULT_FOLDER)
+    return jsonify({'success': True, 'job_id': job_id, 'status': 'queued'})
+
+
+@app.route('/api/solve/<job_id>', methods=['GET'])
+def solve_status(job_id):
+    """Trạng thái job xếp lịch (polling). ?since=N: chỉ lấy sự kiện từ seq N"""
+    job = solve_jobs.get(job_id, since=request.args.get('since', 0, type=int))
+    if job is None:
+        return jsonify({'success': False, 'error': 'Không tìm thấy job'}), 404
+    return jsonify({'success': True, **job})
+
+
+@app.route('/api/solve/<job_id>/events', methods=['GET'])
+def solve_events(job_id):
+    """Stream tiến độ job (Server-Sent Events), kết thúc khi job xong"""
+    if solve_jobs.get(job_id) is None:
+        return jsonify({'success': False, 'error': 'Không tìm thấy job'}), 404
     
-    # Export danh sách sinh viên thi
-    sv_filename = f'BangTongHopLichThiSinhVien_{timestamp}.xlsx'
-    sv_path = os.path.join(RESULT_FOLDER, sv_filename)
-    sv_export_result = scheduler.export_student_list(result, sv_path)
+    def stream():
+        since = 0
+        while True:
+            job = solve_jobs.get(job_id, since=since)
+            for event in job['events']:
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+            since = job['num_events']
+            if job['status'] in ('done', 'failed'):
+                yield f"event: done\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+                return
+            time.sleep(1)
     
-    return jsonify({
-        'success': True,
-        'status': result.status,
-        'result_file': output_filename,
-        'student_file': sv_filename if sv_export_result.get('success') else None,
-        'num_records': len(result.records),
-        'num_student_records': sv_export_result.get('total_rows', 0),
-        'num_violations': export_result.get('num_violations', 0),
-        'data_stats': load_result['stats'],
-        'solver_stats': result.stats,
-        'records': result.records[:500]  # Giới hạn 500 dòng để tránh quá tải
-    })
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+@app.route('/api/solve-jobs', methods=['GET'])
+def list_solve_jobs():
+    """Danh sách job xếp lịch (mới nhất trước)"""
+    return jsonify({'success': True, 'jobs': solve_jobs.list_jobs()})
 
 
 @app.route('/api/download/<filename>')
@@ -194,65 +277,21 @@ def download_file(filename):
 # ==========================================
 # HELPER: Sync Student File After Schedule Update
 # ==========================================
-def sync_student_file():
-    """Cập nhật BangTongHopLichThiSinhVien_KetQua.xlsx khi lịch thi thay đổi"""
+def sync_student_file(keys):
+    """
+    Cập nhật BangTongHopLichThiSinhVien_KetQua.xlsx khi lịch thi thay đổi.
+    
+    keys: các (MaHP, ToThi) vừa bị sửa - chỉ các dòng SV của những tổ thi này được cập nhật,
+    file được ghi nền sau vài giây (gộp nhiều lần sửa liên tiếp).
+    """
     try:
-        schedule_path = os.path.join(BASE_DIR, 'ket_qua_xep_lich_thi.xlsx')
-        sv_file_path = os.path.join(BASE_DIR, 'BangTongHopLichThiSinhVien_KetQua.xlsx')
-        
-        if not os.path.exists(sv_file_path):
+        if not student_sync.exists():
             print("   ⚠️ BangTongHopLichThiSinhVien_KetQua.xlsx chưa tồn tại, bỏ qua sync.")
             return
         
-        if not os.path.exists(schedule_path):
-            print("   ⚠️ ket_qua_xep_lich_thi.xlsx chưa tồn tại, bỏ qua sync.")
-            return
-        
-        # Load files
-        df_sv = pd.read_excel(sv_file_path)
-        df_schedule = pd.read_excel(schedule_path)
-        
-        # Normalize column names for matching
-        # Student file uses "Mã HP", "Tổ thi" vs schedule uses "MaHP", "ToThi"
-        # Map schedule columns
-        schedule_map = {}
-        for _, row in df_schedule.iterrows():
-            mahp = str(row.get('MaHP', '')).strip()
-            tothi = int(row.get('ToThi', 0)) if pd.notna(row.get('ToThi')) else 0
-            key = (mahp, tothi)
-            schedule_map[key] = {
-                'Ngày thi': row.get('Ngay', ''),
-                'Giờ thi': row.get('GioThi', '') if 'GioThi' in df_schedule.columns else '',
-                'Phòng thi': row.get('PhongThi', ''),
-                'Ca': row.get('Ca', '')
-            }
-        
-        # Map Ca to Gio
-        CA_TO_GIO = {1: "07:00", 2: "09:30", 3: "13:00", 4: "15:30"}
-        
-        # Update student file
-        updated_count = 0
-        for idx, row in df_sv.iterrows():
-            mahp = str(row.get('Mã HP', '')).strip()
-            tothi = int(row.get('Tổ thi', 0)) if pd.notna(row.get('Tổ thi')) else 0
-            key = (mahp, tothi)
-            
-            if key in schedule_map:
-                new_data = schedule_map[key]
-                if 'Ngày thi' in df_sv.columns:
-                    df_sv.at[idx, 'Ngày thi'] = new_data['Ngày thi']
-                if 'Phòng thi' in df_sv.columns:
-                    df_sv.at[idx, 'Phòng thi'] = new_data['Phòng thi']
-                if 'Giờ thi' in df_sv.columns:
-                    gio = new_data['Giờ thi']
-                    if not gio and new_data['Ca']:
-                        gio = CA_TO_GIO.get(int(new_data['Ca']), '')
-                    df_sv.at[idx, 'Giờ thi'] = gio
-                updated_count += 1
-        
-        # Save updated student file
-        df_sv.to_excel(sv_file_path, index=False)
-        print(f"   ✅ Synced {updated_count} rows to BangTongHopLichThiSinhVien_KetQua.xlsx")
+        rows = [row for row in (schedule_store.find(mahp, tothi) for mahp, tothi in keys) if row is not None]
+        updated_count = student_sync.update(rows)
+        print(f"   ✅ Synced {updated_count} rows ({len(rows)} tổ thi), ghi file sau {student_sync.debounce:g}s")
         
     except Exception as e:
         print(f"   ⚠️ Error syncing student file: {e}")
@@ -266,38 +305,30 @@ def get_schedule_data():
     """Lấy dữ liệu lịch thi để hiển thị"""
     try:
         # File paths
-        schedule_path = os.path.join(BASE_DIR, 'ket_qua_xep_lich_thi.xlsx')
         config_path = os.path.join(BASE_DIR, 'cau_hinh.xlsx') # Hoặc file cấu hình upload
 
-        if not os.path.exists(schedule_path):
+        if not schedule_store.exists():
             return jsonify({'success': False, 'error': 'Chưa có dữ liệu lịch thi. Vui lòng xếp lịch trước.'})
         
-        # Load Result
-        df_sche = pd.read_excel(schedule_path)
-        # Clean data (convert NaN to None/Empty)
-        df_sche = df_sche.where(pd.notnull(df_sche), None)
+        # Load Result (từ store trong bộ nhớ, NaN đã đổi thành None)
+        records = schedule_store.records()
         
         # Load Config (Rooms, Days, Shifts)
         if os.path.exists(config_path):
-            df_rooms = pd.read_excel(config_path, sheet_name='PhongThi')
-            rooms = df_rooms['PhongThi'].dropna().unique().tolist()
+            cfg = load_exam_config(config_path)
+            rooms = list(dict.fromkeys(cfg.phong_thi))
             
             # Days from Config or from Result? Better from Result to be safe
             # But we need full list of available slots
-            df_time = pd.read_excel(config_path, sheet_name='ThoiGianThi')
-            available_days = df_time[df_time['SuDung'] == 1]['NgayThi'].dt.strftime('%d/%m/%Y').tolist()
+            available_days = [ngay.strftime('%d/%m/%Y') for ngay in cfg.ngay_thi]
             
-            df_ca = pd.read_excel(config_path, sheet_name='CaThi')
-            shifts = df_ca['Ca'].dropna().unique().tolist()
+            shifts = list(dict.fromkeys(ca for ca in cfg.ca_thi if pd.notna(ca)))
         else:
             # Fallback if config missing
-            rooms = df_sche['PhongThi'].unique().tolist()
-            available_days = df_sche['Ngay'].unique().tolist()
+            rooms = list(dict.fromkeys(r['PhongThi'] for r in records))
+            available_days = list(dict.fromkeys(r['Ngay'] for r in records))
             shifts = [1, 2, 3, 4]
 
-        # Structure data
-        records = df_sche.to_dict('records')
-        
         return jsonify({
             'success': True,
             'rooms': sorted(rooms),
@@ -323,11 +354,8 @@ def update_schedule():
         #   "target": { "Ngay": "...", "Ca": 1, "PhongThi": "..." } 
         # }
         
-        schedule_path = os.path.join(BASE_DIR, 'ket_qua_xep_lich_thi.xlsx')
-        if not os.path.exists(schedule_path):
+        if not schedule_store.exists():
             return jsonify({'success': False, 'error': 'File lịch thi không tồn tại'})
-            
-        df = pd.read_excel(schedule_path)
         
         action = data.get('action')
         source = data.get('source')
@@ -336,48 +364,27 @@ def update_schedule():
         if not source or not target:
             return jsonify({'success': False, 'error': 'Thiếu thông tin source/target'})
 
-        # Tìm source row index
-        source_idx = df[
-            (df['MaHP'] == source['MaHP']) & 
-            (df['ToThi'] == source['ToThi'])
-        ].index
-        
-        if len(source_idx) == 0:
+        # Tìm source (chỉ số (MaHP, ToThi))
+        source_row = schedule_store.find(source['MaHP'], source['ToThi'])
+        if source_row is None:
              return jsonify({'success': False, 'error': 'Không tìm thấy môn học nguồn'})
         
-        source_idx = source_idx[0]
+        # Check if target slot is occupied (chỉ số (Ngay, Ca, PhongThi))
+        target_row = schedule_store.find_in_room(target['Ngay'], target['Ca'], target['PhongThi'])
         
-        # Check if target slot is occupied
-        target_idx = df[
-            (df['Ngay'] == target['Ngay']) & 
-            (df['Ca'] == int(target['Ca'])) & 
-            (df['PhongThi'] == target['PhongThi'])
-        ].index
-        
-        if len(target_idx) > 0:
-            target_idx = target_idx[0]
-            # Target occupied -> SWAP or ERROR?
+        if target_row is not None:
+            # Target occupied -> SWAP
             # User wants to "đổi lịch cho nhau" => Swap
-            
-            # Update target row to source values
-            df.at[target_idx, 'Ngay'] = source['Ngay']
-            df.at[target_idx, 'Ca'] = int(source['Ca'])
-            df.at[target_idx, 'PhongThi'] = source['PhongThi']
-            
+            schedule_store.swap(source_row, target_row)
+            changed = [(source['MaHP'], source['ToThi']), (target_row['MaHP'], target_row['ToThi'])]
             msg = "Đã hoán đổi lịch thi thành công"
         else:
+            schedule_store.move(source['MaHP'], source['ToThi'], target['Ngay'], int(target['Ca']), target['PhongThi'])
+            changed = [(source['MaHP'], source['ToThi'])]
             msg = "Đã chuyển lịch thi thành công"
-
-        # Update source row to target values
-        df.at[source_idx, 'Ngay'] = target['Ngay']
-        df.at[source_idx, 'Ca'] = int(target['Ca'])
-        df.at[source_idx, 'PhongThi'] = target['PhongThi']
-        
-        # Save back to Excel
-        df.to_excel(schedule_path, index=False)
         
         # Sync changes to student file
-        sync_student_file()
+        sync_student_file(changed)
         
         return jsonify({'success': True, 'message': msg})
 
@@ -398,14 +405,11 @@ def batch_update_schedule():
         #   "force_move": false  # If true, bypass same-day warning
         # }
         
-        schedule_path = os.path.join(BASE_DIR, 'ket_qua_xep_lich_thi.xlsx')
         config_path = os.path.join(UPLOAD_FOLDER, 'cau_hinh.xlsx')
         sv_path = os.path.join(UPLOAD_FOLDER, 'danhsachSV.xlsx')
         
-        if not os.path.exists(schedule_path):
+        if not schedule_store.exists():
             return jsonify({'success': False, 'error': 'Schedule file not found'})
-            
-        df_schedule = pd.read_excel(schedule_path)
         
         items = data.get('items', [])
         target = data.get('target', {})
@@ -418,138 +422,75 @@ def batch_update_schedule():
         target_shift = int(target.get('Ca'))
         
         # === CONFLICT CHECK ===
-        # Load student list to check conflicts
+        # Chỉ số SV × (Ngày, Ca): dựng lại khi file SV hoặc lịch thi đổi
         if os.path.exists(sv_path):
-            df_sv = pd.read_excel(sv_path)
-            df_sv['MaSV'] = df_sv['MaSV'].astype(str).str.strip()
-            df_sv['MaHP'] = df_sv['MaHP'].astype(str).str.strip()
+            slot_index.load_student_file(sv_path)
             
-            # Build map: MaSV -> list of MaHP they take
-            sv_to_mahp = df_sv.groupby('MaSV')['MaHP'].apply(list).to_dict()
-            
-            # Get students in items being moved with their ToThi
+            # Items being moved with their ToThi
             moving_info = {item['MaHP']: item['ToThi'] for item in items}
-            moving_mahps = list(moving_info.keys())
-            students_in_moving = df_sv[df_sv['MaHP'].isin(moving_mahps)][['MaSV', 'MaHP']].drop_duplicates()
-            
-            # Get exams already in target slot (same day, same shift)
-            exams_same_shift_df = df_schedule[
-                (df_schedule['Ngay'] == target_day) & 
-                (df_schedule['Ca'] == target_shift) &
-                (~df_schedule['MaHP'].isin(moving_mahps))
-            ][['MaHP', 'ToThi']]
-            exams_same_shift = set(exams_same_shift_df['MaHP'].unique())
-            
-            # Get exams on same day (any shift)
-            exams_same_day_df = df_schedule[
-                (df_schedule['Ngay'] == target_day) &
-                (~df_schedule['MaHP'].isin(moving_mahps))
-            ][['MaHP', 'ToThi', 'Ca']]
-            exams_same_day = set(exams_same_day_df['MaHP'].unique())
             
             # Check for SAME-SHIFT conflicts (HARD BLOCK)
-            conflict_details_shift = []
-            for _, row in students_in_moving.iterrows():
-                masv = row['MaSV']
-                moving_mahp = row['MaHP']
-                moving_to = moving_info[moving_mahp]
-                
-                # Check if this student has other exams in target shift
-                student_other_mahps = [m for m in sv_to_mahp.get(masv, []) if m in exams_same_shift]
-                for conflict_mahp in student_other_mahps:
-                    conflict_to = exams_same_shift_df[exams_same_shift_df['MaHP'] == conflict_mahp]['ToThi'].values
-                    conflict_to = int(conflict_to[0]) if len(conflict_to) > 0 else '?'
-                    conflict_details_shift.append({
-                        'MaSV': masv,
-                        'moving_MaHP': moving_mahp,
-                        'moving_ToThi': moving_to,
-                        'conflict_MaHP': conflict_mahp,
-                        'conflict_ToThi': conflict_to
-                    })
-            
-            if conflict_details_shift:
+            num_conflicts, conflict_details_shift = slot_index.check_shift(moving_info, target_day, target_shift)
+            if num_conflicts:
                 # Limit to 15 entries
                 return jsonify({
                     'success': False,
                     'error_type': 'CONFLICT_SHIFT',
-                    'error': f'Cannot move! {len(conflict_details_shift)} conflict(s) in same shift.',
+                    'error': f'Cannot move! {num_conflicts} conflict(s) in same shift.',
                     'conflict_details': conflict_details_shift[:15]
                 })
             
             # Check for SAME-DAY conflicts (SOFT WARNING)
             if not force_move:
-                conflict_details_day = []
-                for _, row in students_in_moving.iterrows():
-                    masv = row['MaSV']
-                    moving_mahp = row['MaHP']
-                    moving_to = moving_info[moving_mahp]
-                    
-                    student_other_mahps = [m for m in sv_to_mahp.get(masv, []) if m in exams_same_day]
-                    for conflict_mahp in student_other_mahps:
-                        conflict_row = exams_same_day_df[exams_same_day_df['MaHP'] == conflict_mahp].iloc[0] if len(exams_same_day_df[exams_same_day_df['MaHP'] == conflict_mahp]) > 0 else None
-                        if conflict_row is not None:
-                            conflict_details_day.append({
-                                'MaSV': masv,
-                                'moving_MaHP': moving_mahp,
-                                'moving_ToThi': moving_to,
-                                'conflict_MaHP': conflict_mahp,
-                                'conflict_ToThi': int(conflict_row['ToThi']),
-                                'conflict_Ca': int(conflict_row['Ca'])
-                            })
-                
-                if conflict_details_day:
+                num_conflicts, conflict_details_day = slot_index.check_day(moving_info, target_day)
+                if num_conflicts:
                     return jsonify({
                         'success': False,
                         'error_type': 'WARNING_SAME_DAY',
-                        'error': f'Warning: {len(conflict_details_day)} same-day conflict(s).',
+                        'error': f'Warning: {num_conflicts} same-day conflict(s).',
                         'conflict_details': conflict_details_day[:15],
                         'can_force': True
                     })
         
         # === ROOM CHECK ===
+        # Phòng trống lấy từ chỉ số phòng theo (Ngày, Ca) của schedule_store; mặc định mọi phòng trong lịch
         if os.path.exists(config_path):
-            df_rooms = pd.read_excel(config_path, sheet_name='PhongThi')
-            all_rooms = df_rooms['PhongThi'].dropna().astype(str).str.strip().tolist()
-        else:
-            all_rooms = df_schedule['PhongThi'].unique().tolist()
-        
-        used_rooms = df_schedule[
-            (df_schedule['Ngay'] == target_day) & 
-            (df_schedule['Ca'] == target_shift)
-        ]['PhongThi'].tolist()
+            cfg = load_exam_config(config_path)
+            schedule_store.set_rooms(cfg.phong_thi, cfg.loai_phong, cfg.suc_chua_phong)
         
-        available_rooms = [r for r in all_rooms if r not in used_rooms]
+        keys = [(item['MaHP'], item['ToThi']) for item in items]
+        assigned, problems = schedule_store.allocate_rooms(
+            target_day, target_shift, keys, so_sv=student_sync.group_sizes(keys)
+        )
         
-        if len(available_rooms) < len(items):
+        if len(assigned) < len(items):
             return jsonify({
                 'success': False, 
-                'error': f'Not enough rooms. Need {len(items)}, only {len(available_rooms)} available.'
+                'error': f'Not enough rooms. Need {len(items)}, only {len(assigned)} available.'
             })
         
         # === UPDATE SCHEDULE ===
-        moved_count = 0
-        for i, item in enumerate(items):
-            idx = df_schedule[
-                (df_schedule['MaHP'] == item['MaHP']) & 
-                (df_schedule['ToThi'] == item['ToThi'])
-            ].index
-            
-            if len(idx) > 0:
-                idx = idx[0]
-                df_schedule.at[idx, 'Ngay'] = target_day
-                df_schedule.at[idx, 'Ca'] = target_shift
-                df_schedule.at[idx, 'PhongThi'] = available_rooms[i]
-                moved_count += 1
-        
-        df_schedule.to_excel(schedule_path, index=False)
+        moved_count = schedule_store.apply([
+            (mahp, tothi, target_day, target_shift, assigned[lhp_key(mahp, tothi)])
+            for mahp, tothi in keys
+        ])
         
         # Sync changes to student file
-        sync_student_file()
+        sync_student_file([(item['MaHP'], item['ToThi']) for item in items])
         
-        return jsonify({
+        response = {
             'success': True, 
             'message': f'Moved {moved_count} exam group(s) successfully.'
-        })
+        }
+        over_capacity = [p for p in problems if p['reason'] == 'thieu_suc_chua']
+        if over_capacity:
+            # Vẫn chuyển, nhưng báo các tổ đông hơn sức chứa phòng được gán
+            response['room_warnings'] = [
+                {'MaHP': p['key'][0], 'ToThi': p['key'][1], 'PhongThi': p['PhongThi'],
+                 'SucChua': p['SucChua'], 'SoSV': p['so_sv']}
+                for p in over_capacity
+            ]
+        return jsonify(response)
 
     except Exception as e:
         print(f"Error batch updating schedule: {e}")
@@ -579,14 +520,12 @@ def export_students():
     """Xuất file BangTongHopLichThiSinhVien_KetQua.xlsx từ lịch đã chỉnh sửa"""
     try:
         # Paths
-        schedule_path = os.path.join(BASE_DIR, 'ket_qua_xep_lich_thi.xlsx')
         sv_path = os.path.join(BASE_DIR, 'danhsachSV.xlsx')
         lhp_path = os.path.join(BASE_DIR, 'danhsachLHP.xlsx')
         config_path = os.path.join(BASE_DIR, 'cau_hinh.xlsx')
-        output_path = os.path.join(BASE_DIR, 'BangTongHopLichThiSinhVien_KetQua.xlsx')
         
         # Check files exist
-        if not os.path.exists(schedule_path):
+        if not schedule_store.exists():
             return jsonify({'success': False, 'error': 'Chưa có file lịch thi. Vui lòng xếp lịch trước.'})
         if not os.path.exists(sv_path):
             return jsonify({'success': False, 'error': 'Chưa có file danhsachSV.xlsx'})
@@ -594,16 +533,12 @@ def export_students():
             return jsonify({'success': False, 'error': 'Chưa có file danhsachLHP.xlsx'})
         
         # Load data
-        df_kq = pd.read_excel(schedule_path)
-        df_sv = pd.read_excel(sv_path)
-        df_lhp = pd.read_excel(lhp_path)
+        df_kq = schedule_store.to_dataframe()
+        df_sv = read_excel_cached(sv_path, normalize="sv")
+        df_lhp = read_excel_cached(lhp_path, normalize="lhp")
         
         # Normalize MaHP
-        df_sv["MaSV"] = df_sv["MaSV"].astype(str).str.strip()
-        df_sv["Ten"] = df_sv["Ten"].astype(str).str.strip()
-        df_sv["MaHP"] = df_sv["MaHP"].astype(str).str.strip()
         df_kq["MaHP"] = df_kq["MaHP"].astype(str).str.strip()
-        df_lhp["MaHP"] = df_lhp["MaHP"].astype(str).str.strip()
         
         # Remove duplicates
         df_sv = df_sv.drop_duplicates(subset=["MaSV", "MaHP"], keep="first")
@@ -612,31 +547,7 @@ def export_students():
         phong_theo_mon = df_lhp.set_index("MaHP")[["ToThi"]].to_dict("index")
         
         # Distribute students to ToThi
-        ds_sv_to_thi = []
-        for mahp, df_mhp in df_sv.groupby("MaHP"):
-            if mahp not in phong_theo_mon:
-                continue
-            so_to = int(phong_theo_mon[mahp]["ToThi"])
-            df_mhp_sorted = df_mhp.sort_values("Ten").reset_index(drop=True)
-            N = len(df_mhp_sorted)
-            if N == 0:
-                continue
-            base = N // so_to
-            du = N % so_to
-            start_idx = 0
-            for to in range(1, so_to + 1):
-                so_sv_to = base + (1 if to <= du else 0)
-                df_to = df_mhp_sorted.iloc[start_idx:start_idx + so_sv_to]
-                for _, row in df_to.iterrows():
-                    ds_sv_to_thi.append({
-                        "MaSV": row["MaSV"],
-                        "Ten": row["Ten"],
-                        "MaHP": mahp,
-                        "ToThi": to
-                    })
-                start_idx += so_sv_to
-        
-        df_sv_to_thi = pd.DataFrame(ds_sv_to_thi)
+        df_sv_to_thi = rai_sv_vao_to_thi(df_sv, phong_theo_mon)
         
         # Merge with schedule
         df_final_sv = pd.merge(df_sv_to_thi, df_kq, on=["MaHP", "ToThi"], how="left")
@@ -660,19 +571,7 @@ def export_students():
             df_final_sv["GioThi"] = df_final_sv["Ca"].map(CA_TO_GIO)
         
         # Split Ho Ten
-        def tach_ho_ten(full_name):
-            if pd.isna(full_name):
-                return "", ""
-            parts = str(full_name).strip().split()
-            if len(parts) == 0:
-                return "", ""
-            elif len(parts) == 1:
-                return "", parts[0]
-            else:
-                return " ".join(parts[:-1]), parts[-1]
-        
-        df_final_sv["HoDem"] = df_final_sv["Ten"].apply(lambda x: tach_ho_ten(x)[0])
-        df_final_sv["TenSV"] = df_final_sv["Ten"].apply(lambda x: tach_ho_ten(x)[1])
+        df_final_sv["HoDem"], df_final_sv["TenSV"] = tach_ho_ten(df_final_sv["Ten"])
         
         # Rename columns
         rename_dict = {
@@ -701,8 +600,8 @@ def export_students():
         # Remove duplicates
         df_final_sv = df_final_sv.drop_duplicates()
         
-        # Export
-        df_final_sv.to_excel(output_path, index=False)
+        # Export (ghi dòng theo dòng, constant_memory)
+        student_sync.replace(df_final_sv)
         
         return jsonify({
             'success': True,
@@ -721,8 +620,6 @@ def export_students():
 @app.route('/api/preview/<file_type>', methods=['GET'])
 def preview_file(file_type):
     """Xem trước nội dung file"""
-    import pandas as pd
-    
     if file_type not in FILE_TYPES:
         return jsonify({'success': False, 'error': 'Loại file không hợp lệ'})
     
@@ -736,10 +633,8 @@ def preview_file(file_type):
         # Đọc file Excel
         if file_type == 'cfg':
             # Đọc tất cả sheets cho file cấu hình
-            xl = pd.ExcelFile(filepath)
             sheets = {}
-            for sheet in xl.sheet_names:
-                df = pd.read_excel(filepath, sheet_name=sheet)
+            for sheet, df in read_excel_cached(filepath, sheet_name=None).items():
                 sheets[sheet] = {
                     'columns': df.columns.tolist(),
                     'data': df.head(10).to_dict('records'),
@@ -751,7 +646,7 @@ def preview_file(file_type):
                 'sheets': sheets
             })
         else:
-            df = pd.read_excel(filepath)
+            df = read_excel_cached(filepath)
             return jsonify({
                 'success': True,
                 'type': 'single_sheet',
@@ -771,4 +666,7 @@ if __name__ == '__main__':
     print(f"📁 Result folder: {RESULT_FOLDER}")
     print("🌐 Mở trình duyệt tại: http://127.0.0.1:5000")
     print("=" * 50)
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Process chạy app (không phải process reloader): nạp sẵn lịch + bảng SV cho các API chỉnh sửa
+        threading.Thread(target=lambda: (schedule_store.exists(), student_sync.preload()), daemon=True).start()
     app.run(debug=True, port=5000)
@@ -0,0 +1,314 @@
+"""
+Benchmark - Đo thời gian / bộ nhớ từng bước của pipeline xếp lịch trên dữ liệu giả lập
+
+Sinh bộ input (danhsachLHP / Data / cau_hinh / danhsachSV) theo kích thước chọn trước rồi chạy:
+load_data (đọc lần đầu + đọc lại từ cache) -> solve (từng phase) -> export_to_excel -> export_student_list.
+
+Ví dụ:
+    python benchmark.py --sizes small,medium --timeout 60
+    python benchmark.py --sizes large --set capacity_model=cumulative --baseline bench_results.jsonl
+    python benchmark.py --so-sv 20000 --so-ctdt-khoa 40 --so-phong 80 --so-ngay 24
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from scheduler import ExamScheduler, SchedulerConfig, ghi_excel_stream
+from input_cache import invalidate as invalidate_input_cache
+
+try:
+    import resource  # Không có trên Windows
+except ImportError:
+    resource = None
+
+# Kích thước mẫu ("large" ~ dữ liệu thật của trường: ~12k SV, ~220 môn, ~55k lượt đăng ký)
+KICH_THUOC = {
+    "tiny": dict(so_sv=300, so_ctdt_khoa=4, so_mon_rieng=4, so_mon_chung=4, so_phong=12, so_ngay=8),
+    "small": dict(so_sv=1500, so_ctdt_khoa=8, so_mon_rieng=5, so_mon_chung=8, so_phong=30, so_ngay=12),
+    "medium": dict(so_sv=6000, so_ctdt_khoa=20, so_mon_rieng=6, so_mon_chung=14, so_phong=50, so_ngay=18),
+    "large": dict(so_sv=12500, so_ctdt_khoa=36, so_mon_rieng=5, so_mon_chung=30, so_phong=68, so_ngay=25),
+    "xlarge": dict(so_sv=30000, so_ctdt_khoa=72, so_mon_rieng=5, so_mon_chung=50, so_phong=100, so_ngay=30),
+}
+
+CTDT = ["CNTT", "KT", "TC", "NH", "QTKD", "KDQT", "LKT", "HTTT", "ATC", "KTDT", "CNTC", "MKT"]
+HO = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng", "Bùi", "Đỗ"]
+DEM = ["Văn", "Thị", "Minh", "Ngọc", "Thanh", "Quốc", "Hoài", "Gia", "Bảo", ""]
+TEN = ["An", "Bình", "Chi", "Dũng", "Giang", "Hà", "Hải", "Hạnh", "Khoa", "Lan", "Linh", "Long",
+       "Mai", "Nam", "Nhi", "Phúc", "Quân", "Sơn", "Tâm", "Thảo", "Trang", "Tú", "Vy", "Yến"]
+
+
+# ==========================================
+# SINH DỮ LIỆU GIẢ LẬP
+# ==========================================
+def tao_du_lieu(out_dir: str, so_sv: int, so_ctdt_khoa: int, so_mon_rieng: int, so_mon_chung: int,
+                so_phong: int, so_ngay: int, mat_do: float = 0.85, so_ca: int = 4, nhom_moi_mon_chung: int = 3,
+                ty_le_pm: float = 0.1, suc_chua: int = 40, so_nhom_uu_tien: int = 2, seed: int = 0) -> dict:
+    """
+    Ghi 4 file input vào out_dir, trả về {path_lhp, path_data, path_cfg, path_sv}.
+
+    - so_ctdt_khoa nhóm CTĐT-Khóa, mỗi nhóm có so_mon_rieng môn riêng;
+      so_mon_chung môn chung, mỗi môn thuộc nhom_moi_mon_chung nhóm (chọn ngẫu nhiên).
+    - Mỗi SV thuộc 1 nhóm và đăng ký mỗi môn của nhóm với xác suất mat_do (ít nhất 1 môn).
+    - ToThi = ceil(số SV / suc_chua); ty_le_pm môn thi phòng máy (PM).
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Nhóm CTĐT-Khóa
+    cohorts = [(CTDT[i % len(CTDT)] + (str(i // (len(CTDT) * 4)) if i >= len(CTDT) * 4 else ""),
+                f"K{24 + (i // len(CTDT)) % 4}") for i in range(so_ctdt_khoa)]
+
+    # Môn của từng nhóm
+    mon_nhom = {k: [f"R{k:03d}{j:02d}A" for j in range(so_mon_rieng)] for k in range(so_ctdt_khoa)}
+    for j in range(so_mon_chung):
+        so_nhom = min(max(2, nhom_moi_mon_chung), so_ctdt_khoa)
+        for k in rng.choice(so_ctdt_khoa, size=so_nhom, replace=False):
+            mon_nhom[int(k)].append(f"C{j:03d}A")
+
+    # Đăng ký: SV -> nhóm -> môn (vector hóa theo nhóm)
+    nhom_sv = rng.integers(0, so_ctdt_khoa, size=so_sv)
+    ma_sv = np.array([f"{24 + int(k) % 4}A{i:07d}" for i, k in enumerate(nhom_sv)], dtype=object)
+    sv_parts, hp_parts = [], []
+    for k, mon_list in mon_nhom.items():
+        idx = np.flatnonzero(nhom_sv == k)
+        if not len(idx) or not mon_list:
+            continue
+        chon = rng.random((len(idx), len(mon_list))) < mat_do
+        chon[np.arange(len(idx)), rng.integers(0, len(mon_list), size=len(idx))] = True
+        r, c = np.nonzero(chon)
+        sv_parts.append(idx[r])
+        hp_parts.append(np.asarray(mon_list, dtype=object)[c])
+    sv_idx = np.concatenate(sv_parts)
+    ho_ten = np.array([
+        " ".join(p for p in (HO[a], DEM[b], TEN[c]) if p)
+        for a, b, c in zip(rng.integers(0, len(HO), so_sv), rng.integers(0, len(DEM), so_sv), rng.integers(0, len(TEN), so_sv))
+    ], dtype=object)
+    df_sv = pd.DataFrame({"MaSV": ma_sv[sv_idx], "Ten": ho_ten[sv_idx], "MaHP": np.concatenate(hp_parts)})
+
+    # danhsachLHP
+    slsv = df_sv.groupby("MaHP").size()
+    ds_mon = sorted(slsv.index)
+    df_lhp = pd.DataFrame({
+        "MaHP": ds_mon,
+        "SLSV": [int(slsv[m]) for m in ds_mon],
+        "HinhThucThi": "3. Tự luận",
+        "PhongThi": np.where(rng.random(len(ds_mon)) < ty_le_pm, "PM", "PH"),
+        "ToThi": [max(1, math.ceil(slsv[m] / suc_chua)) for m in ds_mon],
+        "TenMH": [f"Học phần {m}" for m in ds_mon],
+        "SoTC": rng.integers(2, 4, size=len(ds_mon)),
+    })
+
+    # Data (chương trình đào tạo theo nhóm)
+    df_data = pd.DataFrame([
+        {"CTDT": cohorts[k][0], "Khoa": cohorts[k][1], "NamTH": 2025, "HKTH": 1, "MaHP": m, "TenHP": f"Học phần {m}", "SoTC": 3}
+        for k, mon_list in mon_nhom.items() for m in mon_list if m in slsv.index
+    ])
+
+    # cau_hinh: ngày thi bỏ Chủ nhật
+    ngay, d = [], date(2025, 12, 1)
+    while len(ngay) < so_ngay:
+        if d.weekday() != 6:
+            ngay.append(pd.Timestamp(d))
+        d += timedelta(days=1)
+    so_pm = max(1, int(round(so_phong * ty_le_pm))) if ty_le_pm > 0 else 0
+    phong = [f"A{k // 20 + 1}.{101 + k % 20}" for k in range(so_phong - so_pm)] + [f"M{k + 1:02d}" for k in range(so_pm)]
+    cfg_sheets = {
+        "ThoiGianThi": pd.DataFrame({"NgayThi": ngay, "SuDung": 1}),
+        "HK": pd.DataFrame({"NamTH": [2025], "HKTH": [1]}),
+        "CaThi": pd.DataFrame({"Ca": list(range(1, so_ca + 1))}),
+        "PhongThi": pd.DataFrame({
+            "PhongThi": phong,
+            "TcPhong": ["PH"] * (so_phong - so_pm) + ["PM"] * so_pm,
+            "SucChua": suc_chua,
+        }),
+        "UuTienPhase2": pd.DataFrame({
+            "CTDT_Khoa": [f"{c}-{k}" for c, k in cohorts[:so_nhom_uu_tien]],
+            "SoNgayThi": min(5, so_ngay),
+        }),
+    }
+
+    paths = {
+        "path_lhp": os.path.join(out_dir, "danhsachLHP.xlsx"),
+        "path_data": os.path.join(out_dir, "Data.xlsx"),
+        "path_cfg": os.path.join(out_dir, "cau_hinh.xlsx"),
+        "path_sv": os.path.join(out_dir, "danhsachSV.xlsx"),
+    }
+    df_lhp.to_excel(paths["path_lhp"], index=False)
+    df_data.to_excel(paths["path_data"], index=False)
+    with pd.ExcelWriter(paths["path_cfg"]) as writer:
+        for name, df in cfg_sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+    ghi_excel_stream(paths["path_sv"], df_sv)
+    return paths
+
+
+# ==========================================
+# ĐO
+# ==========================================
+def _peak_rss_mb():
+    """Đỉnh RSS của process tới thời điểm gọi (MB), None nếu không đo được"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def do_buoc(ket_qua: dict, ten: str, fn, trace_py: bool = False):
+    """Chạy fn(), ghi thời gian + bộ nhớ vào ket_qua["stages"][ten], trả về kết quả của fn"""
+    if trace_py:
+        tracemalloc.start()
+    t = time.perf_counter()
+    try:
+        return fn()
+    finally:
+        stage = {"time": round(time.perf_counter() - t, 3), "peak_rss_mb": _peak_rss_mb()}
+        if trace_py:
+            stage["peak_py_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+            tracemalloc.stop()
+        ket_qua["stages"][ten] = stage
+        print(f"   ⏱  {ten}: {stage['time']:.2f}s (peak RSS {stage['peak_rss_mb']} MB"
+              + (f", Python {stage['peak_py_mb']} MB" if trace_py else "") + ")")
+
+
+def chay_benchmark(paths: dict, config_kwargs: dict, out_dir: str, trace_py: bool = False) -> dict:
+    """Chạy toàn bộ pipeline trên bộ input paths, trả về số liệu từng bước + từng phase"""
+    ket_qua = {"stages": {}, "phases": []}
+
+    for path in paths.values():
+        invalidate_input_cache(path)
+
+    scheduler = ExamScheduler(SchedulerConfig(**config_kwargs))
+    load = do_buoc(ket_qua, "load_data", lambda: scheduler.load_data(**paths), trace_py)
+    if not load.get("success"):
+        ket_qua["error"] = load.get("error")
+        return ket_qua
+    ket_qua["data_stats"] = load["stats"]
+    ket_qua["data_stats"]["so_luot_dang_ky"] = len(scheduler.df_sv)
+    ket_qua["data_stats"]["so_to_thi_tong"] = int(scheduler.df_lhp["ToThi"].sum())
+
+    # Đọc lại (input đã nằm trong cache)
+    do_buoc(ket_qua, "load_data_cached", lambda: ExamScheduler(SchedulerConfig(**config_kwargs)).load_data(**paths), trace_py)
+
+    result = do_buoc(ket_qua, "solve", scheduler.solve, trace_py)
+    ket_qua["status"] = result.status
+    ket_qua["error"] = result.error
+    ket_qua["objective"] = result.stats.get("objective")
+    ket_qua["phases"] = result.stats.get("phases", [])
+    ket_qua["solve_stages"] = result.stats.get("stages", {})
+    if result.error:
+        return ket_qua
+
+    export = do_buoc(ket_qua, "export_to_excel",
+                     lambda: scheduler.export_to_excel(result, os.path.join(out_dir, "ket_qua_xep_lich.xlsx")), trace_py)
+    ket_qua["num_violations"] = export.get("num_violations")
+    do_buoc(ket_qua, "export_student_list",
+            lambda: scheduler.export_student_list(result, os.path.join(out_dir, "BangTongHopLichThiSinhVien.xlsx")), trace_py)
+    return ket_qua
+
+
+def so_sanh_baseline(ket_qua: dict, baseline_file: str, nguong: float = 1.5):
+    """So với lần chạy gần nhất cùng kích thước + cấu hình trong baseline_file, in các bước chậm hơn nguong lần"""
+    if not os.path.exists(baseline_file):
+        return
+    truoc = None
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if rec.get("params") == ket_qua["params"] and rec.get("config") == ket_qua["config"]:
+                truoc = rec
+    if truoc is None:
+        print(f"   (Chưa có lần chạy cùng tham số trong {baseline_file})")
+        return
+    for ten, stage in ket_qua["stages"].items():
+        cu = truoc.get("stages", {}).get(ten)
+        if not cu or cu["time"] < 0.05:
+            continue
+        ty_le = stage["time"] / cu["time"]
+        flag = "⚠️ REGRESSION" if ty_le > nguong else ""
+        print(f"   {ten:22s} {cu['time']:8.2f}s -> {stage['time']:8.2f}s  (x{ty_le:.2f}) {flag}")
+    if truoc.get("objective") is not None and ket_qua.get("objective") is not None:
+        print(f"   objective              {truoc['objective']:.0f} -> {ket_qua['objective']:.0f}")
+
+
+def _parse_set(items):
+    """--set key=value (value đọc dạng JSON nếu được: true, 60, "cumulative")"""
+    config = {}
+    for item in items or []:
+        key, _, value = item.partition("=")
+        try:
+            config[key] = json.loads(value)
+        except ValueError:
+            config[key] = value
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline xếp lịch thi trên dữ liệu giả lập")
+    parser.add_argument("--sizes", default="small", help=f"Danh sách kích thước mẫu: {', '.join(KICH_THUOC)}")
+    for name, default in KICH_THUOC["small"].items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=None,
+                            help=f"Ghi đè {name} (mặc định theo --sizes, small={default})")
+    parser.add_argument("--mat-do", type=float, default=0.85, help="Xác suất SV đăng ký mỗi môn của nhóm")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=int, default=60, help="solver_timeout (P2 = 0.5x, P3 = 1.5x)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="num_workers của CP-SAT")
+    parser.add_argument("--set", action="append", metavar="KEY=VALUE", help="Ghi đè trường SchedulerConfig")
+    parser.add_argument("--tracemalloc", action="store_true", help="Đo thêm đỉnh bộ nhớ Python (chậm hơn)")
+    parser.add_argument("--data-dir", default=None, help="Thư mục ghi input/output (mặc định: thư mục tạm)")
+    parser.add_argument("--output", default="bench_results.jsonl", help="File JSONL lưu kết quả (nối thêm)")
+    parser.add_argument("--baseline", default=None, help="File JSONL để so sánh (phát hiện chậm đi)")
+    args = parser.parse_args()
+
+    config_kwargs = {"solver_timeout": args.timeout, "num_workers": args.workers}
+    config_kwargs.update(_parse_set(args.set))
+
+    for size in [s.strip() for s in args.sizes.split(",") if s.strip()]:
+        params = dict(KICH_THUOC[size], mat_do=args.mat_do, seed=args.seed)
+        for name in KICH_THUOC["small"]:
+            if getattr(args, name) is not None:
+                params[name] = getattr(args, name)
+
+        out_dir = os.path.join(args.data_dir, size) if args.data_dir else tempfile.mkdtemp(prefix=f"bench_{size}_")
+        print("=" * 60)
+        print(f"📐 {size}: {params}")
+        print(f"📁 {out_dir}")
+
+        t = time.perf_counter()
+        paths = tao_du_lieu(out_dir, **params)
+        print(f"   ⏱  generate: {time.perf_counter() - t:.2f}s")
+
+        ket_qua = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "size": size,
+            "params": params,
+            "config": config_kwargs,
+        }
+        ket_qua.update(chay_benchmark(paths, config_kwargs, out_dir, args.tracemalloc))
+
+        print(f"   status: {ket_qua.get('status')}  objective: {ket_qua.get('objective')}  error: {ket_qua.get('error')}")
+        for phase in ket_qua["phases"]:
+            print(f"   - {phase['phase']}: {phase['status']} obj={phase.get('objective')} bound={phase.get('best_bound')} "
+                  f"vars={phase.get('num_vars')} cons={phase.get('num_constraints')} "
+                  f"build={phase.get('build_time')}s solve={phase.get('solve_time')}s")
+
+        if args.baseline:
+            so_sanh_baseline(ket_qua, args.baseline)
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(ket_qua, ensure_ascii=False, default=str) + "\n")
+
+
+if __name__ == "__main__":
+    main()
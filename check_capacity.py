@@ -1,18 +1,18 @@
-import pandas as pd
 import os
 
+from exam_config import load_exam_config
+from input_cache import read_excel_cached
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Load files
-df_lhp = pd.read_excel(os.path.join(BASE_DIR, "danhsachLHP.xlsx"))
-df_cfg = pd.read_excel(os.path.join(BASE_DIR, "cau_hinh.xlsx"), sheet_name="PhongThi")
-df_time = pd.read_excel(os.path.join(BASE_DIR, "cau_hinh.xlsx"), sheet_name="ThoiGianThi")
-df_ca = pd.read_excel(os.path.join(BASE_DIR, "cau_hinh.xlsx"), sheet_name="CaThi")
+df_lhp = read_excel_cached(os.path.join(BASE_DIR, "danhsachLHP.xlsx"))
+cfg = load_exam_config(os.path.join(BASE_DIR, "cau_hinh.xlsx"))
 
 # Calculate
-so_phong = len(df_cfg)
-so_ngay = len(df_time[df_time["SuDung"] == 1])
-so_ca = len(df_ca)
+so_phong = len(cfg.phong_thi)
+so_ngay = len(cfg.ngay_thi)
+so_ca = len(cfg.ca_thi)
 tong_slot = so_phong * so_ngay * so_ca
 tong_to_thi = df_lhp["ToThi"].sum()
 
@@ -0,0 +1,268 @@
+"""
+Conflict Graph Module - Đồ thị xung đột giữa các môn thi
+"""
+
+import numpy as np
+from collections import defaultdict
+from typing import Dict, List, Tuple, Optional
+
+
+class CourseConflictGraph:
+    """
+    Đồ thị xung đột môn thi, xây 1 lần trong load_data và dùng chung cho mọi phase.
+
+    Lưu dạng mảng kề thưa (CSR), chỉ số môn theo self.courses:
+    - indptr / indices / weights: cặp môn -> số SV học chung
+    - clique_indptr / clique_indices / clique_counts: tập môn của SV (gom theo chữ ký) -> số SV
+    - cohort_keys / cohort_indptr / cohort_indices: (CTDT, Khoa) -> các môn của CTĐT-Khóa
+    """
+
+    def __init__(self, courses: List[str], cliques: Dict[frozenset, int], cohorts: Dict[tuple, list]):
+        self.courses = list(courses)
+        self.index = {m: i for i, m in enumerate(self.courses)}
+
+        # Tập môn của SV -> số SV
+        clique_items = sorted(cliques.items(), key=lambda kv: sorted(kv[0]))
+        self.clique_indptr, self.clique_indices = self._to_csr(
+            [sorted(self.index[m] for m in mon_set) for mon_set, _ in clique_items]
+        )
+        self.clique_counts = np.array([so_sv for _, so_sv in clique_items], dtype=np.int64)
+
+        # CTĐT-Khóa -> môn
+        self.cohort_keys = list(cohorts.keys())
+        self.cohort_indptr, self.cohort_indices = self._to_csr(
+            [sorted({self.index[m] for m in cohorts[key]}) for key in self.cohort_keys]
+        )
+        self._cohort_count = np.bincount(self.cohort_indices, minlength=len(self.courses))
+
+        # Cặp môn -> số SV chung (đối xứng)
+        pair_weight = defaultdict(int)
+        for k in range(len(self.clique_counts)):
+            idx = self.clique_indices[self.clique_indptr[k]:self.clique_indptr[k + 1]]
+            so_sv = int(self.clique_counts[k])
+            for a in idx:
+                for b in idx:
+                    if a != b:
+                        pair_weight[(int(a), int(b))] += so_sv
+
+        adj = [[] for _ in self.courses]
+        for (a, b), w in pair_weight.items():
+            adj[a].append((b, w))
+        for row in adj:
+            row.sort()
+        self.indptr, self.indices = self._to_csr([[b for b, _ in row] for row in adj])
+        self.weights = np.array([w for row in adj for _, w in row], dtype=np.int64)
+
+    @staticmethod
+    def _to_csr(rows: List[List[int]]) -> Tuple[np.ndarray, np.ndarray]:
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(r) for r in rows])
+        indices = np.array([i for r in rows for i in r], dtype=np.int64)
+        return indptr, indices
+
+    @classmethod
+    def from_enrollments(cls, sv_to_mon: dict, ctdt_khoa_to_mon: dict, courses: Optional[list] = None) -> "CourseConflictGraph":
+        """Xây đồ thị từ {MaSV: [MaHP]} và {(CTDT, Khoa): [MaHP]}"""
+        cliques = defaultdict(int)
+        for mon_list in sv_to_mon.values():
+            mon_set = frozenset(mon_list)
+            if mon_set:
+                cliques[mon_set] += 1
+
+        all_courses = list(dict.fromkeys(courses or []))
+        seen = set(all_courses)
+        for mon_set in cliques:
+            for m in sorted(mon_set):
+                if m not in seen:
+                    seen.add(m)
+                    all_courses.append(m)
+        for mon_list in ctdt_khoa_to_mon.values():
+            for m in mon_list:
+                if m not in seen:
+                    seen.add(m)
+                    all_courses.append(m)
+
+        return cls(all_courses, dict(cliques), ctdt_khoa_to_mon)
+
+    def with_split_courses(self, split_map: dict) -> "CourseConflictGraph":
+        """Tạo đồ thị mới, thay MaHP gốc bằng các MaHP_D1/D2 theo split_map"""
+        def replace(mon_iter):
+            result = []
+            for m in mon_iter:
+                if m in split_map:
+                    result.extend(mahp_split for mahp_split, _ in split_map[m])
+                else:
+                    result.append(m)
+            return result
+
+        cliques = defaultdict(int)
+        for mon_set, so_sv in self.iter_cliques():
+            cliques[frozenset(replace(sorted(mon_set)))] += so_sv
+        cohorts = {key: replace(mon_list) for key, mon_list in self.iter_cohorts()}
+        courses = replace(self.courses)
+        return CourseConflictGraph(courses, dict(cliques), cohorts)
+
+    def subgraph(self, courses) -> "CourseConflictGraph":
+        """Đồ thị con chỉ gồm các môn trong courses (giữ số SV của từng tập môn)"""
+        keep = set(courses)
+        cliques = defaultdict(int)
+        for mon_set, so_sv in self.iter_cliques():
+            mon_sub = mon_set & keep
+            if mon_sub:
+                cliques[frozenset(mon_sub)] += so_sv
+        cohorts = {}
+        for key, mon_list in self.iter_cohorts():
+            mon_sub = [m for m in mon_list if m in keep]
+            if mon_sub:
+                cohorts[key] = mon_sub
+        return CourseConflictGraph([m for m in self.courses if m in keep], dict(cliques), cohorts)
+
+    def components(self, courses, extra_links=()) -> List[List[str]]:
+        """
+        Thành phần liên thông của các môn trong courses.
+        
+        2 môn liên thông nếu có SV chung, cùng CTĐT-Khóa, hoặc có trong extra_links (cặp môn).
+        """
+        courses = list(courses)
+        parent = {m: m for m in courses}
+
+        def find(m):
+            while parent[m] != m:
+                parent[m] = parent[parent[m]]
+                m = parent[m]
+            return m
+
+        def union_all(mon_iter):
+            goc = None
+            for m in mon_iter:
+                if m not in parent:
+                    continue
+                if goc is None:
+                    goc = find(m)
+                else:
+                    r = find(m)
+                    if r != goc:
+                        parent[r] = goc
+
+        for mon_set, _ in self.iter_cliques():
+            union_all(mon_set)
+        for _, mon_list in self.iter_cohorts():
+            union_all(mon_list)
+        for link in extra_links:
+            union_all(link)
+
+        groups = defaultdict(list)
+        for m in courses:
+            groups[find(m)].append(m)
+        return sorted(groups.values(), key=len, reverse=True)
+
+    # ------------------------------------------------------------------
+    # Truy vấn
+    # ------------------------------------------------------------------
+    def iter_cliques(self):
+        """Duyệt (frozenset MaHP, số SV) cho từng tập môn của SV"""
+        for k in range(len(self.clique_counts)):
+            idx = self.clique_indices[self.clique_indptr[k]:self.clique_indptr[k + 1]]
+            yield frozenset(self.courses[i] for i in idx), int(self.clique_counts[k])
+
+    def iter_cohorts(self):
+        """Duyệt ((CTDT, Khoa), [MaHP])"""
+        for k, key in enumerate(self.cohort_keys):
+            idx = self.cohort_indices[self.cohort_indptr[k]:self.cohort_indptr[k + 1]]
+            yield key, [self.courses[i] for i in idx]
+
+    def _mask(self, ds_mon_set) -> np.ndarray:
+        mask = np.zeros(len(self.courses), dtype=bool)
+        for m in ds_mon_set:
+            i = self.index.get(m)
+            if i is not None:
+                mask[i] = True
+        return mask
+
+    def student_cliques(self, ds_mon_set, drop_subsets: bool = False) -> Dict[frozenset, int]:
+        """
+        Tập môn của SV sau khi lọc theo ds_mon_set -> số SV.
+
+        Bỏ các tập chỉ có <= 1 môn.
+        drop_subsets=True: bỏ luôn các tập là tập con của tập khác
+        (dùng cho ràng buộc cứng, vì clique lớn đã bao clique nhỏ).
+        """
+        mask = self._mask(ds_mon_set)
+        nhom = defaultdict(int)
+        for k in range(len(self.clique_counts)):
+            idx = self.clique_indices[self.clique_indptr[k]:self.clique_indptr[k + 1]]
+            idx = idx[mask[idx]]
+            if len(idx) > 1:
+                nhom[frozenset(self.courses[i] for i in idx)] += int(self.clique_counts[k])
+
+        if not drop_subsets:
+            return dict(nhom)
+
+        # Duyệt từ tập lớn đến nhỏ, chỉ giữ tập không nằm trong tập đã giữ
+        kept = {}
+        mon_to_kept = defaultdict(list)  # MaHP -> các tập đã giữ chứa MaHP
+        for mon_set in sorted(nhom, key=len, reverse=True):
+            pivot = min(mon_set, key=lambda m: len(mon_to_kept[m]))
+            if any(mon_set <= other for other in mon_to_kept[pivot]):
+                continue
+            kept[mon_set] = nhom[mon_set]
+            for m in mon_set:
+                mon_to_kept[m].append(mon_set)
+        return kept
+
+    def cohort_courses(self, ds_mon_set=None) -> Dict[tuple, List[str]]:
+        """(CTDT, Khoa) -> các môn thuộc ds_mon_set (giữ cả CTĐT-Khóa chỉ còn <= 1 môn)"""
+        mask = self._mask(ds_mon_set) if ds_mon_set is not None else None
+        result = {}
+        for k, key in enumerate(self.cohort_keys):
+            idx = self.cohort_indices[self.cohort_indptr[k]:self.cohort_indptr[k + 1]]
+            if mask is not None:
+                idx = idx[mask[idx]]
+            result[key] = [self.courses[i] for i in idx]
+        return result
+
+    def equivalence_classes(self, courses) -> List[List[str]]:
+        """
+        Nhóm các môn có cùng "hàng xóm": thuộc đúng cùng các tập môn của SV và cùng các CTĐT-Khóa.
+        
+        Chỉ trả về các nhóm có >= 2 môn (thứ tự môn theo self.courses).
+        """
+        membership = defaultdict(list)  # chỉ số môn -> [("sv", k) / ("ctdt", k)]
+        for k in range(len(self.clique_counts)):
+            for i in self.clique_indices[self.clique_indptr[k]:self.clique_indptr[k + 1]]:
+                membership[int(i)].append(("sv", k))
+        for k in range(len(self.cohort_keys)):
+            for i in self.cohort_indices[self.cohort_indptr[k]:self.cohort_indptr[k + 1]]:
+                membership[int(i)].append(("ctdt", k))
+
+        groups = defaultdict(list)
+        for m in sorted(set(courses), key=lambda m: self.index.get(m, -1)):
+            i = self.index.get(m)
+            key = tuple(membership[i]) if i is not None else ()
+            groups[key].append(m)
+        return [g for g in groups.values() if len(g) > 1]
+
+    def cohort_count(self, mahp: str) -> int:
+        """Số CTĐT-Khóa có môn mahp"""
+        i = self.index.get(mahp)
+        return int(self._cohort_count[i]) if i is not None else 0
+
+    def neighbors(self, mahp: str) -> Dict[str, int]:
+        """Các môn có SV chung với mahp -> số SV chung"""
+        i = self.index.get(mahp)
+        if i is None:
+            return {}
+        s, e = self.indptr[i], self.indptr[i + 1]
+        return {self.courses[j]: int(w) for j, w in zip(self.indices[s:e], self.weights[s:e])}
+
+    def shared_students(self, mahp_a: str, mahp_b: str) -> int:
+        """Số SV học chung 2 môn"""
+        return self.neighbors(mahp_a).get(mahp_b, 0)
+
+    def stats(self) -> dict:
+        return {
+            "so_mon": len(self.courses),
+            "so_canh": int(len(self.indices) // 2),
+            "so_nhom_sv": int(len(self.clique_counts)),
+            "so_ctdt_khoa": len(self.cohort_keys),
+        }
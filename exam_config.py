@@ -0,0 +1,79 @@
+"""
+Exam Config Module - Đọc file cấu hình cau_hinh.xlsx (mọi sheet trong 1 lần đọc)
+"""
+
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from input_cache import read_excel_cached
+
+
+@dataclass
+class ExamConfigData:
+    """Cấu hình kỳ thi đọc từ cau_hinh.xlsx"""
+    nam_th: int
+    hk_th: int
+    ngay_thi: List[pd.Timestamp]  # Ngày thi có SuDung == 1, tăng dần
+    ca_thi: List[int]  # Ca thi, tăng dần
+    phong_thi: List[str]  # Phòng thi khả dụng (sheet PhongThi)
+    suc_chua_phong: Dict[str, int]  # PhongThi -> SucChua
+    loai_phong: Dict[str, str] = field(default_factory=dict)  # PhongThi -> TcPhong (PH/PM/...), rỗng nếu sheet không có cột
+    uu_tien_phase2: List[Tuple[str, str, int]] = field(default_factory=list)  # (CTDT, Khoa, SoNgayThi)
+    sheets: Dict[str, pd.DataFrame] = field(default_factory=dict)  # Toàn bộ sheet (tên cột đã strip)
+
+
+def _doc_uu_tien_phase2(df_p2: pd.DataFrame) -> List[Tuple[str, str, int]]:
+    """Sheet UuTienPhase2: cột "CTDT-Khoa" (vd CNTC-K27) + cột số ngày thi (mặc định 5)"""
+    result = []
+    col_ctdt = next((c for c in df_p2.columns if "CTDT" in c or "Khoa" in c), None)
+    col_days = next((c for c in df_p2.columns if "Ngay" in c), None)
+    if not col_ctdt or not col_days:
+        return result
+
+    for _, row in df_p2.iterrows():
+        if pd.notna(row[col_ctdt]):
+            text = str(row[col_ctdt]).strip()
+            try:
+                days = int(row[col_days])
+            except (TypeError, ValueError):
+                days = 5
+
+            parts = text.split("-")
+            if len(parts) >= 2:
+                k = parts[-1].strip()
+                c = "-".join(parts[:-1]).strip()
+                result.append((c, k, days))
+    return result
+
+
+def load_exam_config(path_cfg: str) -> ExamConfigData:
+    """Đọc cau_hinh.xlsx (1 lần cho mọi sheet, qua input_cache) -> ExamConfigData"""
+    sheets = read_excel_cached(path_cfg, sheet_name=None, normalize="strip_columns")
+
+    df_hk = sheets["HK"]
+    df_thoigianthi = sheets["ThoiGianThi"]
+    df_phongthi = sheets["PhongThi"]
+
+    uu_tien_phase2 = []
+    if "UuTienPhase2" in sheets:
+        try:
+            uu_tien_phase2 = _doc_uu_tien_phase2(sheets["UuTienPhase2"])
+        except Exception as e:
+            print(f"Warning load Core Config P2: {e}")
+
+    return ExamConfigData(
+        nam_th=int(df_hk.loc[0, "NamTH"]),
+        hk_th=int(df_hk.loc[0, "HKTH"]),
+        ngay_thi=df_thoigianthi.query("SuDung == 1")["NgayThi"].sort_values().tolist(),
+        ca_thi=sheets["CaThi"]["Ca"].sort_values().tolist(),
+        phong_thi=df_phongthi["PhongThi"].dropna().astype(str).str.strip().tolist(),
+        suc_chua_phong=dict(zip(df_phongthi["PhongThi"].astype(str).str.strip(), df_phongthi["SucChua"])),
+        loai_phong={
+            str(phong).strip(): str(loai).strip()
+            for phong, loai in zip(df_phongthi["PhongThi"], df_phongthi.get("TcPhong", pd.Series(dtype=object)))
+            if pd.notna(phong) and pd.notna(loai)
+        },
+        uu_tien_phase2=uu_tien_phase2,
+        sheets=sheets,
+    )
@@ -0,0 +1,231 @@
+"""
+Feasibility Module - Phân tích nhanh tính khả thi trước khi chạy CP-SAT
+
+Chỉ dùng các cận rẻ (đếm, sắp xếp) trên dữ liệu đã load_data:
+- Lỗi (errors): vi phạm ràng buộc cứng của solve() -> chắc chắn INFEASIBLE.
+  Sức chứa mỗi ca, mỗi môn đúng 1 ca, khoảng cách D1/D2 của môn chia.
+- Cảnh báo (warnings): ràng buộc mềm (solve() luôn relax_same_day) chắc chắn bị vi phạm,
+  hoặc PHASE 2 không thể xếp trong số ngày ưu tiên (sẽ gộp vào PHASE 3).
+"""
+
+import math
+import time
+import numpy as np
+from typing import TYPE_CHECKING, List
+
+from solver_constants import NGUONG_CHIA_TO, MIN_GAP_SPLIT
+
+if TYPE_CHECKING:
+    from scheduler import ExamScheduler
+
+SO_MUC_TOI_DA = 10   # Số CTĐT-Khóa / môn tối đa liệt kê trong mỗi thông báo
+
+
+def chia_to_thi(to_thi: int) -> List[int]:
+    """Số tổ thi của các phần sau khi chia (cùng quy tắc với solve())"""
+    if to_thi > NGUONG_CHIA_TO:
+        return [to_thi // 2, to_thi - to_thi // 2]
+    return [to_thi]
+
+
+def so_slot_toi_thieu(sizes, capacity: int) -> int:
+    """
+    Cận dưới số ca (bin) cần để xếp các môn có số tổ thi sizes vào ca sức chứa capacity
+    (cận L2 của Martello-Toth, luôn >= ceil(tổng / capacity)).
+    """
+    s = np.sort(np.asarray(sizes, dtype=np.int64))
+    if not len(s):
+        return 0
+    if capacity <= 0:
+        return len(s)
+    l1 = int(math.ceil(s.sum() / capacity))
+    prefix = np.concatenate([[0], np.cumsum(s)])
+
+    def tong(lo, hi):  # Tổng s[lo:hi]
+        return int(prefix[hi] - prefix[lo])
+
+    best = l1
+    i_j2 = int(np.searchsorted(s, capacity // 2, side="right"))  # s[:i_j2] <= C / 2
+    for k in np.unique(np.concatenate([[0], s[:i_j2]])):
+        # J1: > C - K | J2: (C/2, C - K] | J3: [K, C/2]
+        i_j1 = np.searchsorted(s, capacity - k, side="right")
+        i_j3 = np.searchsorted(s, k, side="left")
+        n_j1, n_j2 = len(s) - i_j1, i_j1 - i_j2
+        du_j2 = n_j2 * capacity - tong(i_j2, i_j1)
+        them = max(0, int(math.ceil((tong(i_j3, i_j2) - du_j2) / capacity)))
+        best = max(best, n_j1 + n_j2 + them)
+    return best
+
+
+def _liet_ke(items) -> str:
+    items = list(items)
+    text = ", ".join(str(x) for x in items[:SO_MUC_TOI_DA])
+    return text + (f", ... (+{len(items) - SO_MUC_TOI_DA})" if len(items) > SO_MUC_TOI_DA else "")
+
+
+def phan_tich_kha_thi(scheduler: "ExamScheduler") -> dict:
+    """
+    Phân tích dữ liệu đã nạp của scheduler (gọi trước solve(), khi môn chưa bị chia).
+
+    Trả về {"success", "feasible", "errors", "warnings", "bounds", "time"};
+    mỗi lỗi/cảnh báo là {"code", "message", ...chi tiết}.
+    """
+    if not scheduler.data_loaded:
+        return {"success": False, "error": "Data not loaded"}
+
+    t_start = time.time()
+    errors, warnings = [], []
+    so_ngay, so_ca, so_phong = len(scheduler.ngay_thi), len(scheduler.ca_thi), len(scheduler.phong_kha_dung)
+    so_slot = so_ngay * so_ca
+
+    ds_mon = [m for m in scheduler.ds_mahp_thi if m in scheduler.phong_theo_mon]
+    to_thi = {m: int(scheduler.phong_theo_mon[m]["ToThi"]) for m in ds_mon}
+    phan = {m: chia_to_thi(n) for m, n in to_thi.items()}  # Môn -> số tổ của từng phần
+    sizes = [n for parts in phan.values() for n in parts]
+    tong_to_thi = sum(sizes)
+    mon_chia = [m for m, parts in phan.items() if len(parts) > 1]
+
+    bounds = {
+        "so_ngay": so_ngay,
+        "so_ca": so_ca,
+        "so_phong": so_phong,
+        "so_slot": so_slot,
+        "so_mon": len(ds_mon),
+        "so_mon_chia": len(mon_chia),
+        "tong_to_thi": tong_to_thi,
+        "suc_chua": so_phong * so_slot,
+    }
+
+    # 1. Dữ liệu rỗng
+    if not so_ngay or not so_ca or not so_phong:
+        errors.append({
+            "code": "EMPTY_CONFIG",
+            "message": f"Cấu hình không có ngày/ca/phòng thi (ngày={so_ngay}, ca={so_ca}, phòng={so_phong})",
+        })
+
+    # 2. Môn lớn nhất (sau khi chia) phải vừa 1 ca
+    to_lon_nhat = max(sizes, default=0)
+    bounds["to_thi_lon_nhat"] = to_lon_nhat
+    if so_phong and to_lon_nhat > so_phong:
+        qua_lon = sorted((m for m in ds_mon if max(phan[m]) > so_phong), key=lambda m: -to_thi[m])
+        errors.append({
+            "code": "COURSE_TOO_LARGE",
+            "message": (f"{len(qua_lon)} môn có số tổ thi (sau khi chia) > {so_phong} phòng/ca: "
+                        + _liet_ke(f"{m} ({max(phan[m])} tổ)" for m in qua_lon)),
+            "courses": qua_lon,
+        })
+
+    # 3. Sức chứa tổng + cận bin packing (môn không tách được giữa các ca)
+    if so_phong:
+        slot_can = so_slot_toi_thieu(sizes, so_phong)
+        bounds["so_slot_toi_thieu"] = slot_can
+        if tong_to_thi > so_phong * so_slot:
+            errors.append({
+                "code": "CAPACITY",
+                "message": (f"Cần {tong_to_thi} tổ thi nhưng chỉ có {so_phong * so_slot} "
+                            f"({so_phong} phòng × {so_ngay} ngày × {so_ca} ca)"),
+            })
+        elif to_lon_nhat <= so_phong and slot_can > so_slot:
+            errors.append({
+                "code": "CAPACITY_PACKING",
+                "message": (f"Cần ít nhất {slot_can} ca để xếp {tong_to_thi} tổ thi "
+                            f"(mỗi môn nằm trọn 1 ca, tối đa {so_phong} tổ/ca) nhưng chỉ có {so_slot} ca"),
+            })
+
+    # 4. Môn chia: D2 cách D1 ít nhất MIN_GAP_SPLIT ngày
+    if mon_chia and so_ngay < MIN_GAP_SPLIT + 1:
+        errors.append({
+            "code": "SPLIT_GAP",
+            "message": (f"{len(mon_chia)} môn > {NGUONG_CHIA_TO} tổ thi phải chia 2 ngày cách nhau "
+                        f">= {MIN_GAP_SPLIT} ngày, cần >= {MIN_GAP_SPLIT + 1} ngày thi (có {so_ngay})"),
+            "courses": mon_chia,
+        })
+
+    # 5. Clique SV lớn nhất: SV có k môn cần k ca khác nhau (mềm: trùng ca bị phạt)
+    graph = scheduler.conflict_graph
+    clique_size = np.diff(graph.clique_indptr)
+    clique_lon_nhat = int(clique_size.max()) if len(clique_size) else 0
+    bounds["clique_sv_lon_nhat"] = clique_lon_nhat
+    if clique_lon_nhat > so_slot:
+        so_sv = int(graph.clique_counts[clique_size > so_slot].sum())
+        warnings.append({
+            "code": "STUDENT_SHIFT",
+            "message": (f"{so_sv} SV có > {so_slot} môn (tối đa {clique_lon_nhat}): "
+                        f"chắc chắn có SV thi trùng ca"),
+            "so_sv": so_sv,
+        })
+    elif clique_lon_nhat > so_ngay:
+        so_sv = int(graph.clique_counts[clique_size > so_ngay].sum())
+        warnings.append({
+            "code": "STUDENT_DAY",
+            "message": f"{so_sv} SV có > {so_ngay} môn (tối đa {clique_lon_nhat}): chắc chắn có SV thi 2 môn/ngày",
+            "so_sv": so_sv,
+        })
+
+    # 6. Số ngày cần của mỗi CTĐT-Khóa (môn chia cần 2 ngày)
+    nhu_cau_ngay = {
+        key: sum(len(phan.get(m, [1])) for m in mon_list)
+        for key, mon_list in graph.iter_cohorts()
+    }
+    bounds["ngay_can_lon_nhat"] = max(nhu_cau_ngay.values(), default=0)
+    trung_ngay = sorted((k for k, n in nhu_cau_ngay.items() if n > so_ngay), key=lambda k: -nhu_cau_ngay[k])
+    if trung_ngay:
+        warnings.append({
+            "code": "COHORT_SAME_DAY",
+            "message": (f"{len(trung_ngay)} CTĐT-Khóa cần > {so_ngay} ngày thi, chắc chắn thi 2 môn/ngày: "
+                        + _liet_ke(f"{c}-{k} ({nhu_cau_ngay[(c, k)]})" for c, k in trung_ngay)),
+            "cohorts": [f"{c}-{k}" for c, k in trung_ngay],
+        })
+    # Không trùng ngày và không liền ngày: tối đa ceil(so_ngay / 2) ngày thi (nguyên lý Dirichlet).
+    # Chỉ chắc chắn "trùng ngày HOẶC liền ngày": solver có thể chọn trùng ngày để tránh liền ngày.
+    ngay_cach = (so_ngay + 1) // 2
+    lien_ngay = [k for k, n in nhu_cau_ngay.items() if ngay_cach < n <= so_ngay]
+    if lien_ngay:
+        warnings.append({
+            "code": "COHORT_CONSECUTIVE",
+            "message": (f"{len(lien_ngay)} CTĐT-Khóa cần > {ngay_cach} ngày thi: "
+                        f"có thể phải thi liền ngày (chắc chắn có trùng ngày hoặc liền ngày)"),
+            "cohorts": [f"{c}-{k}" for c, k in lien_ngay],
+        })
+
+    # 7. PHASE 2: môn riêng của CTĐT-Khóa ưu tiên trong số ngày đầu
+    if scheduler.priority_phase2_config and so_phong:
+        so_ngay_p2 = min(so_ngay, max(p[2] for p in scheduler.priority_phase2_config))
+        mon_p2 = {
+            m
+            for c, k, _ in scheduler.priority_phase2_config
+            for m in scheduler.ctdt_khoa_to_mon.get((c, k), [])
+            if m in phan and graph.cohort_count(m) <= 1
+        }
+        slot_p2 = so_slot_toi_thieu([n for m in mon_p2 for n in phan[m]], so_phong)
+        bounds["so_slot_phase2"] = slot_p2
+        if slot_p2 > so_ngay_p2 * so_ca:
+            warnings.append({
+                "code": "PHASE2_CAPACITY",
+                "message": (f"PHASE 2 cần >= {slot_p2} ca cho {len(mon_p2)} môn ưu tiên nhưng "
+                            f"{so_ngay_p2} ngày đầu chỉ có {so_ngay_p2 * so_ca} ca (sẽ gộp vào PHASE 3)"),
+            })
+        # Số ngày cần cho môn riêng (môn chung đã xếp ở PHASE 1, không bị giới hạn ngày)
+        ngay_p2 = {
+            (c, k): sum(len(phan[m]) for m in scheduler.ctdt_khoa_to_mon.get((c, k), []) if m in mon_p2)
+            for c, k, _ in scheduler.priority_phase2_config
+        }
+        qua_han = [
+            (c, k, min(n, so_ngay)) for c, k, n in scheduler.priority_phase2_config
+            if ngay_p2[(c, k)] > min(n, so_ngay)
+        ]
+        if qua_han:
+            warnings.append({
+                "code": "PHASE2_DAYS",
+                "message": (f"{len(qua_han)} CTĐT-Khóa ưu tiên có nhiều môn riêng hơn số ngày ưu tiên: "
+                            + _liet_ke(f"{c}-{k} ({ngay_p2[(c, k)]} > {n})" for c, k, n in qua_han)),
+            })
+
+    return {
+        "success": True,
+        "feasible": not errors,
+        "errors": errors,
+        "warnings": warnings,
+        "bounds": bounds,
+        "time": round(time.time() - t_start, 3),
+    }
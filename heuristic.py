@@ -0,0 +1,424 @@
+"""
+Heuristic Module - Xếp lịch nhanh không dùng CP-SAT (xem trước lịch / gợi ý cho CP-SAT)
+
+- Dựng lời giải: DSatur trên đồ thị xung đột môn (SV chung + cùng CTĐT-Khóa),
+  mỗi môn vào (ngày, ca) còn đủ phòng có chi phí tăng thêm nhỏ nhất (hòa thì chọn ca vừa khít nhất).
+- Cải thiện: tabu search, mỗi bước chuyển 1 môn sang (ngày, ca) khác.
+
+Hàm mục tiêu giống model CP-SAT (cùng hệ số phạt trong solver_constants.py, môn fixed luôn được tính),
+nên objective so sánh được với CP-SAT / LNS.
+"""
+
+import random
+import time
+import numpy as np
+from typing import Dict, Optional
+
+from solver_constants import MIN_GAP_SPLIT, HE_SO_SV_TRUNG_CA, HE_SO_TRUNG_NGAY, HE_SO_SV_TRUNG_NGAY
+
+
+class _PhaseState:
+    """
+    Trạng thái 1 phase: vị trí (slot) của từng môn + các bảng đếm dùng để tính chi phí tăng dần.
+
+    - cnt_slot[k, s] / cnt_day[k, d]: số môn của tập môn SV k trong slot s / ngày d
+    - coh[h, d]: số môn của CTĐT-Khóa h trong ngày d
+    - day_count / shift_count: số môn mỗi ngày / mỗi ca (cân bằng tải)
+    - load[s]: số tổ thi của môn chưa fixed trong slot s (so với cap[s])
+    """
+
+    def __init__(self, owner: "HeuristicScheduler", courses: list, fixed: dict, allowed_days: dict,
+                 prioritize_early: bool, distribute_uniformly: bool, slot_capacity: dict = None):
+        s = owner.scheduler
+        cfg = s.config
+        self.courses = courses
+        self.index = {m: i for i, m in enumerate(courses)}
+        n = len(courses)
+
+        DAYS = list(range(1, len(s.ngay_thi) + 1))
+        CA = list(s.ca_thi)
+        self.slots = [(d, c) for d in DAYS for c in CA]
+        self.n_days = len(DAYS)
+        self.slot_day = np.array([d - 1 for d, _ in self.slots], dtype=np.int64)
+        self.slot_shift = np.array([CA.index(c) for _, c in self.slots], dtype=np.int64)
+        self.slot_ca = np.array([c for _, c in self.slots], dtype=np.float64)
+        slot_index = {slot: i for i, slot in enumerate(self.slots)}
+
+        self.size = np.array([int(s.phong_theo_mon[m]["ToThi"]) for m in courses], dtype=np.int64)
+        self.pos = np.full(n, -1, dtype=np.int64)
+        self.fixed_pos = {self.index[m]: slot_index[tuple(slot)] for m, slot in fixed.items()
+                          if m in self.index and tuple(slot) in slot_index}
+        self.free = np.array([i not in self.fixed_pos for i in range(n)], dtype=bool)
+
+        # Ngày được phép (restricted_days của PHASE 2)
+        self.allowed = np.ones((n, len(self.slots)), dtype=bool)
+        for m, days in (allowed_days or {}).items():
+            i = self.index.get(m)
+            if i is not None and self.free[i]:
+                self.allowed[i] = np.isin(self.slot_day + 1, list(days))
+
+        # Sức chứa: số phòng - phần đã fixed (như _run_solver_phase)
+        max_to = len(s.phong_kha_dung)
+        used = np.zeros(len(self.slots), dtype=np.int64)
+        for m, slot in fixed.items():
+            if m in s.phong_theo_mon and tuple(slot) in slot_index:
+                used[slot_index[tuple(slot)]] += int(s.phong_theo_mon[m]["ToThi"])
+        if slot_capacity is not None:
+            self.cap = np.array([slot_capacity.get(slot, 0) for slot in self.slots], dtype=np.int64)
+        else:
+            self.cap = max_to - used
+        self.cap = np.maximum(self.cap, 0)
+        self.load = np.zeros(len(self.slots), dtype=np.int64)
+
+        # Môn chia: D2 cách D1 ít nhất MIN_GAP_SPLIT ngày
+        self.split_partner: Dict[int, tuple] = {}  # i -> (j, +1 nếu i là D1 / -1 nếu i là D2)
+        for split_list in s.split_courses.values():
+            if len(split_list) >= 2 and split_list[0][0] in self.index and split_list[1][0] in self.index:
+                i1, i2 = self.index[split_list[0][0]], self.index[split_list[1][0]]
+                self.split_partner[i1] = (i2, 1)
+                self.split_partner[i2] = (i1, -1)
+        self.gap = MIN_GAP_SPLIT
+
+        # Tập môn của SV / CTĐT-Khóa trong phase
+        course_set = set(courses)
+        cliques = list(s.conflict_graph.student_cliques(course_set).items())
+        self.w = np.array([so_sv for _, so_sv in cliques], dtype=np.int64)
+        self.course_cliques = self._membership([mon_set for mon_set, _ in cliques], n)
+        cohorts = [mon for mon in s.conflict_graph.cohort_courses(course_set).values() if len(mon) > 1]
+        self.course_cohorts = self._membership(cohorts, n)
+        self.cnt_slot = np.zeros((len(cliques), len(self.slots)), dtype=np.int32)
+        self.cnt_day = np.zeros((len(cliques), self.n_days), dtype=np.int32)
+        self.coh = np.zeros((len(cohorts), self.n_days), dtype=np.int32)
+        self.day_count = np.zeros(self.n_days, dtype=np.int64)
+        self.shift_count = np.zeros(len(CA), dtype=np.int64)
+
+        # Láng giềng cho DSatur (SV chung hoặc cùng CTĐT-Khóa)
+        self.neighbors = [set() for _ in range(n)]
+        for group in [mon_set for mon_set, _ in cliques] + cohorts:
+            idx = [self.index[m] for m in group]
+            for i in idx:
+                self.neighbors[i].update(idx)
+        for i in range(n):
+            self.neighbors[i].discard(i)
+
+        # Hệ số phạt (ràng buộc tắt trong config -> 0)
+        self.w_sv_ca = HE_SO_SV_TRUNG_CA if cfg.sv_khong_trung_ca else 0
+        self.w_sv_ngay = HE_SO_SV_TRUNG_NGAY
+        self.w_ctdt = HE_SO_TRUNG_NGAY if cfg.ctdt_khong_trung_ngay else 0
+        self.w_lien = cfg.he_so_penalty_lien_ngay if cfg.ctdt_khong_lien_ngay else 0
+        self.early = prioritize_early and not distribute_uniformly
+        self.ca_order = not distribute_uniformly
+        self.balance = distribute_uniformly
+
+        for i, slot in self.fixed_pos.items():
+            self.place(i, slot)
+
+    def _membership(self, groups, n):
+        members = [[] for _ in range(n)]
+        for k, group in enumerate(groups):
+            for m in group:
+                members[self.index[m]].append(k)
+        return [np.array(ks, dtype=np.int64) for ks in members]
+
+    # ------------------------------------------------------------------
+    # Cập nhật trạng thái
+    # ------------------------------------------------------------------
+    def _update(self, i: int, slot: int, sign: int):
+        d = self.slot_day[slot]
+        if self.free[i]:
+            self.load[slot] += sign * self.size[i]
+        K, H = self.course_cliques[i], self.course_cohorts[i]
+        self.cnt_slot[K, slot] += sign
+        self.cnt_day[K, d] += sign
+        self.coh[H, d] += sign
+        self.day_count[d] += sign
+        self.shift_count[self.slot_shift[slot]] += sign
+
+    def place(self, i: int, slot: int):
+        self.pos[i] = slot
+        self._update(i, slot, 1)
+
+    def move(self, i: int, slot: int):
+        self._update(i, self.pos[i], -1)
+        self.place(i, slot)
+
+    # ------------------------------------------------------------------
+    # Chi phí
+    # ------------------------------------------------------------------
+    def delta(self, i: int) -> np.ndarray:
+        """Chi phí thay đổi khi đặt môn i vào từng slot (so với hiện tại); inf = không hợp lệ"""
+        s0 = self.pos[i]
+        placed = s0 >= 0
+        d0 = self.slot_day[s0] if placed else 0
+        cost = np.zeros(len(self.slots))
+
+        K = self.course_cliques[i]
+        if len(K):
+            w = self.w[K]
+            cs, cd = self.cnt_slot[K], self.cnt_day[K]
+            if placed:
+                cs[:, s0] -= 1
+                cd[:, d0] -= 1
+            if self.w_sv_ca:
+                add = w @ (cs >= 1)
+                cost += self.w_sv_ca * (add - (add[s0] if placed else 0))
+            add = w @ (cd >= 1)
+            cost += self.w_sv_ngay * (add - (add[d0] if placed else 0))[self.slot_day]
+
+        H = self.course_cohorts[i]
+        if len(H) and (self.w_ctdt or self.w_lien):
+            ch = self.coh[H]
+            if placed:
+                ch[:, d0] -= 1
+            pres = ch >= 1
+            day_cost = np.zeros(self.n_days)
+            if self.w_ctdt:
+                add = pres.sum(axis=0)
+                day_cost += self.w_ctdt * (add - (add[d0] if placed else 0))
+            if self.w_lien:
+                p = np.pad(pres, ((0, 0), (1, 1)))
+                new = (~pres & p[:, :-2]).sum(axis=0) + (~pres & p[:, 2:]).sum(axis=0)
+                day_cost += self.w_lien * (new - (new[d0] if placed else 0))
+            cost += day_cost[self.slot_day]
+
+        if self.early:
+            cost += self.size[i] * (self.slot_day - (d0 if placed else 0) + (0 if placed else 1))
+        if self.ca_order:
+            cost += 0.1 * (self.slot_ca - (self.slot_ca[s0] if placed else 0))
+        if self.balance:
+            dc, sc = self.day_count.copy(), self.shift_count.copy()
+            if placed:
+                dc[d0] -= 1
+                sc[self.slot_shift[s0]] -= 1
+            cost += 5000 * (np.maximum(dc.max(), dc + 1)[self.slot_day] - self.day_count.max())
+            cost += 2000 * (np.maximum(sc.max(), sc + 1)[self.slot_shift] - self.shift_count.max())
+
+        return np.where(self.feasible(i), cost, np.inf)
+
+    def feasible(self, i: int) -> np.ndarray:
+        """Slot hợp lệ cho môn i: ngày được phép, còn đủ phòng, khoảng cách D1/D2"""
+        ok = self.allowed[i].copy()
+        if self.free[i]:
+            room = self.cap - self.load
+            if self.pos[i] >= 0:
+                room[self.pos[i]] += self.size[i]
+            ok &= room >= self.size[i]
+        partner = self.split_partner.get(i)
+        if partner is not None:
+            j, sign = partner
+            if self.pos[j] >= 0:
+                dj = self.slot_day[self.pos[j]]
+                ok &= (self.slot_day <= dj - self.gap) if sign > 0 else (self.slot_day >= dj + self.gap)
+            else:
+                # Chừa chỗ cho phần còn lại
+                ok &= (self.slot_day <= self.n_days - 1 - self.gap) if sign > 0 else (self.slot_day >= self.gap)
+        return ok
+
+    def penalties(self) -> dict:
+        """Từng thành phần hàm mục tiêu (tính lại toàn bộ từ bảng đếm)"""
+        placed = self.pos >= 0
+        return {
+            "sv_trung_ca": int(self.w @ np.maximum(self.cnt_slot - 1, 0).sum(axis=1)) if len(self.w) else 0,
+            "sv_trung_ngay": int(self.w @ np.maximum(self.cnt_day - 1, 0).sum(axis=1)) if len(self.w) else 0,
+            "ctdt_trung_ngay": int(np.maximum(self.coh - 1, 0).sum()),
+            "lien_ngay": int(((self.coh[:, :-1] > 0) & (self.coh[:, 1:] > 0)).sum()),
+            "early": int((self.size[placed] * (self.slot_day[self.pos[placed]] + 1)).sum()),
+            "ca": float(self.slot_ca[self.pos[placed]].sum()),
+            "max_day": int(self.day_count.max()) if self.n_days else 0,
+            "max_shift": int(self.shift_count.max()) if len(self.shift_count) else 0,
+        }
+
+    def objective(self, relax_same_day: bool = True) -> float:
+        """Giá trị hàm mục tiêu như CP-SAT (relax_same_day=False: bỏ phần ràng buộc cứng)"""
+        p = self.penalties()
+        obj = self.w_sv_ngay * p["sv_trung_ngay"] + self.w_lien * p["lien_ngay"]
+        if relax_same_day:
+            obj += self.w_sv_ca * p["sv_trung_ca"] + self.w_ctdt * p["ctdt_trung_ngay"]
+        if self.early:
+            obj += p["early"]
+        if self.ca_order:
+            obj += 0.1 * p["ca"]
+        if self.balance:
+            obj += 5000 * p["max_day"] + 2000 * p["max_shift"]
+        return obj
+
+    def hard_violations(self) -> int:
+        """Số vi phạm ràng buộc cứng khi relax_same_day=False (SV trùng ca, CTĐT-Khóa trùng ngày)"""
+        p = self.penalties()
+        return (p["sv_trung_ca"] if self.w_sv_ca else 0) + (p["ctdt_trung_ngay"] if self.w_ctdt else 0)
+
+
+class HeuristicScheduler:
+    """
+    Engine heuristic thuộc về 1 ExamScheduler (SchedulerConfig.engine="heuristic"),
+    dùng chung dữ liệu đã load_data và cùng giao diện run_phase với _run_solver_phase.
+    """
+
+    TABU_CANDIDATES = 24  # Số môn xét mỗi bước tabu
+    TABU_TENURE = (7, 15)  # Số bước cấm quay lại slot cũ (ngẫu nhiên trong khoảng)
+    MAX_STALL = 400  # Dừng sau chừng này bước liên tiếp không cải thiện
+
+    def __init__(self, scheduler, seed: int = 0):
+        self.scheduler = scheduler
+        self.rng = random.Random(seed)
+        self.stats = {}
+
+    def run_phase(self,
+                  phase_name: str,
+                  ds_mon_to_schedule: list,
+                  fixed_schedule: dict = None,
+                  time_limit: int = 60,
+                  restricted_days: list = None,
+                  prioritize_early: bool = True,
+                  relax_same_day: bool = False,
+                  distribute_uniformly: bool = False,
+                  hint_schedule: dict = None,
+                  slot_capacity: dict = None) -> Optional[dict]:
+        """Cùng chữ ký và kết quả với ExamScheduler._run_solver_phase (thời gian tối đa: heuristic_time_limit)"""
+        s = self.scheduler
+        print(f" [Scheduler] Starting {phase_name} (heuristic)...")
+        print(f"   Courses to schedule: {len(ds_mon_to_schedule)}")
+        s._report(event="phase_start", phase=phase_name, courses=len(ds_mon_to_schedule))
+
+        fixed_schedule = fixed_schedule or {}
+        allowed_days = None
+        if restricted_days is not None:
+            allowed_days = {m: restricted_days for m in ds_mon_to_schedule if m not in fixed_schedule}
+        schedule = self.schedule(
+            ds_mon_to_schedule, fixed_schedule,
+            time_limit=min(time_limit, s.config.heuristic_time_limit),
+            allowed_days=allowed_days,
+            prioritize_early=prioritize_early,
+            relax_same_day=relax_same_day,
+            distribute_uniformly=distribute_uniformly,
+            hint_schedule=hint_schedule,
+            slot_capacity=slot_capacity,
+        )
+
+        s.last_phase_result = dict(self.stats, incumbents=[])
+        s._report(event="phase_end", phase=phase_name, status=self.stats["status"], objective=self.stats["objective"])
+        if schedule is not None:
+            s._save_incumbent(phase_name, {**fixed_schedule, **schedule}, self.stats["objective"], force=True)
+        return schedule
+
+    def schedule(self, ds_mon: list, fixed_schedule: dict = None, time_limit: float = 10,
+                 allowed_days: dict = None, prioritize_early: bool = False, relax_same_day: bool = True,
+                 distribute_uniformly: bool = True, hint_schedule: dict = None,
+                 slot_capacity: dict = None) -> Optional[dict]:
+        """
+        Xếp các môn ds_mon -> {MaHP: (d, c)} (kể cả môn fixed), None nếu không xếp được.
+
+        allowed_days: {MaHP: các ngày được phép} cho từng môn (vd môn PHASE 2).
+        Thống kê lần chạy ở self.stats.
+        """
+        t_start = time.time()
+        fixed_schedule = fixed_schedule or {}
+        ds_mon = list(dict.fromkeys(ds_mon))
+        # Môn fixed luôn tham gia để tính cả xung đột với môn đã xếp ở phase trước
+        ds_mon_set = set(ds_mon)
+        courses = ds_mon + [m for m in fixed_schedule if m not in ds_mon_set and m in self.scheduler.phong_theo_mon]
+        state = _PhaseState(self, courses, fixed_schedule, allowed_days, prioritize_early,
+                            distribute_uniformly, slot_capacity)
+        t_build = time.time()
+
+        ok = self._construct(state, hint_schedule or {})
+        t_construct = time.time()
+        self.stats = {"engine": "heuristic", "status": "INFEASIBLE", "objective": None,
+                      "build_time": round(t_build - t_start, 3)}
+        if not ok:
+            print("   ❌ Heuristic: không còn (ngày, ca) đủ phòng cho một số môn")
+            self.stats["solve_time"] = round(time.time() - t_build, 3)
+            return None
+
+        start_obj = state.objective(relax_same_day)
+        iterations, improvements = self._tabu(state, deadline=t_start + time_limit)
+        objective = state.objective(relax_same_day)
+        self.stats.update(
+            construct_time=round(t_construct - t_build, 3),
+            solve_time=round(time.time() - t_build, 3),
+            start_objective=start_obj,
+            iterations=iterations,
+            improvements=improvements,
+            penalties=state.penalties(),
+        )
+        if not relax_same_day and state.hard_violations():
+            print(f"   ❌ Heuristic: còn {state.hard_violations()} vi phạm ràng buộc cứng")
+            self.stats["objective"] = objective
+            return None
+
+        self.stats.update(status="FEASIBLE", objective=objective)
+        print(f"   ✅ Heuristic: objective {start_obj} -> {objective} ({iterations} bước tabu, "
+              f"{self.stats['solve_time']}s)")
+        return {m: tuple(fixed_schedule[m]) if m in fixed_schedule else state.slots[state.pos[state.index[m]]]
+                for m in ds_mon}
+
+    def _construct(self, state: _PhaseState, hint_schedule: dict) -> bool:
+        """DSatur: môn có nhiều ngày bị láng giềng chiếm nhất xếp trước (hòa: nhiều láng giềng, nhiều tổ)"""
+        slot_index = {slot: k for k, slot in enumerate(state.slots)}
+        todo = set(np.flatnonzero(state.free & (state.pos < 0)).tolist())
+        sat = [set() for _ in state.courses]
+        for i in np.flatnonzero(state.pos >= 0):
+            for j in state.neighbors[i]:
+                sat[j].add(state.slot_day[state.pos[i]])
+
+        def place(i, slot):
+            state.place(i, slot)
+            todo.discard(i)
+            for j in state.neighbors[i]:
+                sat[j].add(state.slot_day[slot])
+
+        # Môn có gợi ý hợp lệ giữ nguyên vị trí gợi ý
+        for i in sorted(todo, key=lambda i: -state.size[i]):
+            slot = slot_index.get(tuple(hint_schedule.get(state.courses[i], ())))
+            if slot is not None and state.feasible(i)[slot]:
+                place(i, slot)
+
+        while todo:
+            i = max(todo, key=lambda i: (len(sat[i]), len(state.neighbors[i]), state.size[i], -i))
+            cost = state.delta(i)
+            if not np.isfinite(cost).any():
+                return False
+            # Hòa chi phí -> slot còn ít chỗ nhất sau khi xếp (để dành slot trống cho môn lớn)
+            left = state.cap - state.load - state.size[i] if state.free[i] else np.zeros(len(cost))
+            place(i, int(np.lexsort((left, cost))[0]))
+        return True
+
+    def _tabu(self, state: _PhaseState, deadline: float):
+        """Tabu search trên bước chuyển 1 môn; giữ lại lời giải tốt nhất"""
+        movable = [i for i in np.flatnonzero(state.free).tolist() if state.allowed[i].sum() > 1]
+        if not movable:
+            return 0, 0
+        tabu_until = np.zeros((len(state.courses), len(state.slots)), dtype=np.int64)
+        current = best = state.objective()
+        best_pos = state.pos.copy()
+        iterations = improvements = stall = 0
+
+        while stall < self.MAX_STALL and time.time() < deadline:
+            iterations += 1
+            move = None
+            for i in self.rng.sample(movable, min(self.TABU_CANDIDATES, len(movable))):
+                cost = state.delta(i)
+                cost[state.pos[i]] = np.inf
+                # Aspiration: bỏ qua tabu nếu bước chuyển cho lời giải tốt nhất mới
+                cost[(tabu_until[i] > iterations) & (current + cost >= best - 1e-6)] = np.inf
+                slot = int(np.argmin(cost))
+                if np.isfinite(cost[slot]) and (move is None or cost[slot] < move[2]):
+                    move = (i, slot, cost[slot])
+            if move is None:
+                stall += 1
+                continue
+
+            i, slot, cost = move
+            tabu_until[i, state.pos[i]] = iterations + self.rng.randint(*self.TABU_TENURE)
+            state.move(i, slot)
+            current += cost
+            if current < best - 1e-6:
+                best, best_pos = current, state.pos.copy()
+                improvements += 1
+                stall = 0
+            else:
+                stall += 1
+
+        for i in np.flatnonzero(state.pos != best_pos):
+            state.move(i, best_pos[i])
+        return iterations, improvements
@@ -0,0 +1,218 @@
+"""
+Input Cache Module - Kho dữ liệu đầu vào đã parse (mỗi sheet 1 file), tránh đọc lại Excel
+"""
+
+import os
+import glob
+import shutil
+import hashlib
+import pandas as pd
+from typing import Dict, List
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+
+# Cột bắt buộc theo loại file (key như FILE_TYPES của app): {sheet (None = sheet đầu): [cột]}
+REQUIRED_COLUMNS = {
+    "lhp": {None: ["MaHP", "ToThi", "PhongThi"]},
+    "data": {None: ["MaHP", "NamTH", "HKTH", "CTDT", "Khoa"]},
+    "sv": {None: ["MaSV", "Ten", "MaHP"]},
+    "cfg": {
+        "HK": ["NamTH", "HKTH"],
+        "ThoiGianThi": ["NgayThi", "SuDung"],
+        "CaThi": ["Ca"],
+        "PhongThi": ["PhongThi", "SucChua"],
+    },
+}
+
+# (đường dẫn, mtime_ns, size) -> sha1 nội dung file (tránh băm lại file chưa đổi);
+# mỗi đường dẫn chỉ giữ phiên bản mới nhất, tối đa HASH_MEMO_MAX mục (bỏ mục cũ nhất)
+HASH_MEMO_MAX = 256
+_hash_memo = {}
+
+
+def _chuan_hoa_sv(df: pd.DataFrame) -> pd.DataFrame:
+    for col in ("MaSV", "Ten", "MaHP"):
+        df[col] = df[col].astype(str).str.strip()
+    return df
+
+
+def _chuan_hoa_lhp(df: pd.DataFrame) -> pd.DataFrame:
+    df["MaHP"] = df["MaHP"].astype(str).str.strip()
+    return df
+
+
+def _loc_data_thi(df: pd.DataFrame, nam_th: int, hk_th: int) -> pd.DataFrame:
+    return df[(df["NamTH"] == nam_th) & (df["HKTH"] == hk_th)]
+
+
+def _strip_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+
+# Tên chuẩn hóa -> hàm(df, **params)
+NORMALIZERS = {
+    "sv": _chuan_hoa_sv,
+    "lhp": _chuan_hoa_lhp,
+    "data_thi": _loc_data_thi,
+    "strip_columns": _strip_columns,
+}
+
+
+def file_hash(path: str) -> str:
+    """sha1 nội dung file (nhớ theo mtime + size)"""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    digest = _hash_memo.get(memo_key)
+    if digest is None:
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        for old_key in [k for k in _hash_memo if k[0] == memo_key[0]]:
+            del _hash_memo[old_key]
+        _hash_memo[memo_key] = digest
+        while len(_hash_memo) > HASH_MEMO_MAX:
+            del _hash_memo[next(iter(_hash_memo))]
+    return digest
+
+
+def _path_prefix(path: str) -> str:
+    return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:12]
+
+
+def _store_dir(path: str) -> str:
+    """Thư mục kho của file: khóa theo đường dẫn + sha1 nội dung + mtime"""
+    key = hashlib.sha1(
+        f"{file_hash(path)}|{os.stat(path).st_mtime_ns}|{pd.__version__}".encode("utf-8")
+    ).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{_path_prefix(path)}_{key}")
+
+
+def _write_pickle(obj, target: str):
+    tmp = f"{target}.tmp"
+    pd.to_pickle(obj, tmp)
+    os.replace(tmp, target)
+
+
+def convert_workbook(path: str, sheets: Dict[str, pd.DataFrame] = None) -> List[str]:
+    """
+    Chuyển mọi sheet của workbook vào kho (parse Excel đúng 1 lần).
+
+    sheets: kết quả pd.read_excel(path, sheet_name=None) nếu đã đọc sẵn (ví dụ lúc upload).
+    Các phiên bản cũ hơn của cùng file trong kho bị xóa (file sửa trực tiếp trên đĩa không để lại rác).
+    Trả về danh sách tên sheet theo thứ tự trong file.
+    """
+    if sheets is None:
+        sheets = pd.read_excel(path, sheet_name=None)
+    store = _store_dir(path)
+    os.makedirs(store, exist_ok=True)
+    names = list(sheets.keys())
+    for i, name in enumerate(names):
+        _write_pickle(sheets[name], os.path.join(store, f"sheet_{i}.pkl"))
+    _write_pickle(names, os.path.join(store, "sheets.pkl"))
+    _xoa_phien_ban_cu(path, keep=store)
+    return names
+
+
+def _xoa_phien_ban_cu(path: str, keep: str = None) -> int:
+    """Xóa các thư mục kho của path trừ keep. Trả về số phiên bản đã xóa"""
+    so_ban = 0
+    for store in glob.glob(os.path.join(CACHE_DIR, f"{_path_prefix(path)}_*")):
+        if keep is not None and os.path.abspath(store) == os.path.abspath(keep):
+            continue
+        shutil.rmtree(store, ignore_errors=True)
+        so_ban += 1
+    return so_ban
+
+
+def sheet_names(path: str) -> List[str]:
+    """Tên các sheet của workbook (chuyển vào kho nếu chưa có)"""
+    manifest = os.path.join(_store_dir(path), "sheets.pkl")
+    if os.path.exists(manifest):
+        try:
+            return pd.read_pickle(manifest)
+        except Exception as e:
+            print(f"Warning read store manifest: {e}")
+    return convert_workbook(path)
+
+
+def _sheet_index(path: str, sheet_name) -> int:
+    names = sheet_names(path)
+    if isinstance(sheet_name, int):
+        if not 0 <= sheet_name < len(names):
+            raise ValueError(f"Worksheet index {sheet_name} is invalid, {len(names)} worksheets found")
+        return sheet_name
+    if sheet_name not in names:
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+    return names.index(sheet_name)
+
+
+def read_excel_cached(path: str, sheet_name=0, normalize: str = None, **params):
+    """
+    Thay cho pd.read_excel: đọc sheet từ kho (pickle của pandas trong CACHE_DIR).
+
+    Workbook chỉ được parse 1 lần cho mỗi phiên bản file (sha1 + mtime), mọi sheet cùng lúc.
+    normalize: tên hàm trong NORMALIZERS (kết quả chuẩn hóa cũng được lưu, khóa theo params).
+    sheet_name=None trả về dict {sheet: DataFrame} như pd.read_excel.
+    """
+    if sheet_name is None:
+        return {
+            name: read_excel_cached(path, sheet_name=name, normalize=normalize, **params)
+            for name in sheet_names(path)
+        }
+
+    idx = _sheet_index(path, sheet_name)
+    store = _store_dir(path)
+    if normalize:
+        param_key = hashlib.sha1(repr(sorted(params.items())).encode("utf-8")).hexdigest()[:10]
+        target = os.path.join(store, f"sheet_{idx}_{normalize}_{param_key}.pkl")
+    else:
+        target = os.path.join(store, f"sheet_{idx}.pkl")
+
+    if os.path.exists(target):
+        try:
+            return pd.read_pickle(target)
+        except Exception as e:
+            print(f"Warning read cache {os.path.basename(target)}: {e}")
+
+    raw_file = os.path.join(store, f"sheet_{idx}.pkl")
+    if os.path.exists(raw_file):
+        df = pd.read_pickle(raw_file)
+    else:
+        df = pd.read_excel(path, sheet_name=idx)
+    if not normalize:
+        return df
+
+    df = NORMALIZERS[normalize](df, **params)
+    try:
+        _write_pickle(df, target)
+    except Exception as e:
+        print(f"Warning write cache: {e}")
+    return df
+
+
+def validate_columns(file_type: str, sheets: Dict[str, pd.DataFrame]) -> List[str]:
+    """Kiểm tra cột bắt buộc (REQUIRED_COLUMNS) -> danh sách lỗi (rỗng = hợp lệ)"""
+    errors = []
+    names = list(sheets.keys())
+    for sheet, cols in REQUIRED_COLUMNS.get(file_type, {}).items():
+        name = names[0] if sheet is None and names else sheet
+        if name not in sheets:
+            errors.append(f"Thiếu sheet {sheet}")
+            continue
+        co_san = {str(c).strip() for c in sheets[name].columns}
+        thieu = [c for c in cols if c not in co_san]
+        if thieu:
+            errors.append(f"Sheet {name}: thiếu cột {', '.join(thieu)}")
+    return errors
+
+
+def invalidate(path: str) -> int:
+    """Xóa kho của file path (gọi khi file được upload lại). Trả về số phiên bản đã xóa"""
+    so_ban = _xoa_phien_ban_cu(path)
+    abs_path = os.path.abspath(path)
+    for memo_key in [k for k in _hash_memo if k[0] == abs_path]:
+        del _hash_memo[memo_key]
+    return so_ban
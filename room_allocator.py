@@ -0,0 +1,169 @@
+"""
+Room Allocator Module - Gán phòng thi theo sức chứa + chỉ số phòng trống theo (Ngày, Ca)
+
+- Mỗi phòng 1 bit; phòng đã dùng của mỗi slot là 1 bitset (int), không phải duyệt lại cả lịch.
+- Tổ đông SV xếp trước, vào phòng trống đúng loại (TcPhong) nhỏ nhất mà vẫn đủ SucChua.
+Dùng chung cho ExamScheduler.solve (gán phòng sau PHASE 3) và ScheduleStore (/api/schedule/batch-update).
+"""
+
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+SUC_CHUA_KHONG_RO = 10 ** 9  # Phòng không có SucChua: coi như đủ chỗ
+
+
+class RoomIndex:
+    """
+    Danh sách phòng + phòng đang dùng ở mỗi slot.
+
+    - Bit i = self.rooms[i]; phòng chưa biết (vd có trong lịch nhưng không có trong cấu hình) được thêm bit khi gặp.
+    - available: bitset phòng được phép gán (phòng trong cấu hình; None = mọi phòng đã biết).
+    - type_mask[TcPhong]: bitset phòng cùng loại; phòng không rõ loại dùng được cho mọi loại.
+    - used[slot]: bitset phòng đã có tổ thi trong slot.
+    """
+
+    def __init__(self, rooms: Iterable[str] = (), loai_phong: Dict[str, str] = None,
+                 suc_chua: Dict[str, int] = None):
+        self.rooms: List[str] = []
+        self.bit_of: Dict[str, int] = {}
+        self.loai: List[Optional[str]] = []
+        self.suc_chua: List[int] = []
+        self.available: Optional[int] = None
+        self.type_mask: Dict[str, int] = {}
+        self.untyped_mask = 0
+        self.by_capacity: List[int] = []  # Chỉ số phòng theo SucChua tăng dần
+        self.used: Dict[Hashable, int] = {}
+        if rooms:
+            self.set_rooms(rooms, loai_phong, suc_chua)
+
+    # ------------------------------------------------------------------
+    # Danh sách phòng
+    # ------------------------------------------------------------------
+    def _register(self, room: str) -> int:
+        i = self.bit_of.get(room)
+        if i is None:
+            i = len(self.rooms)
+            self.rooms.append(room)
+            self.bit_of[room] = i
+            self.loai.append(None)
+            self.suc_chua.append(SUC_CHUA_KHONG_RO)
+            self._rebuild_masks()
+        return i
+
+    def set_rooms(self, rooms: Iterable[str], loai_phong: Dict[str, str] = None, suc_chua: Dict[str, int] = None):
+        """Phòng được phép gán (sheet PhongThi). Giữ nguyên bit cũ nên không ảnh hưởng used"""
+        loai_phong, suc_chua = loai_phong or {}, suc_chua or {}
+        available = 0
+        for room in rooms:
+            i = self._register(room)
+            loai = loai_phong.get(room)
+            self.loai[i] = str(loai).strip() if loai is not None and str(loai).strip() else None
+            cap = suc_chua.get(room)
+            try:
+                self.suc_chua[i] = int(cap)
+            except (TypeError, ValueError):
+                self.suc_chua[i] = SUC_CHUA_KHONG_RO
+            available |= 1 << i
+        self.available = available
+        self._rebuild_masks()
+
+    def _rebuild_masks(self):
+        self.type_mask, self.untyped_mask = {}, 0
+        for i, loai in enumerate(self.loai):
+            if loai is None:
+                self.untyped_mask |= 1 << i
+            else:
+                self.type_mask[loai] = self.type_mask.get(loai, 0) | (1 << i)
+        self.by_capacity = sorted(range(len(self.rooms)), key=lambda i: (self.suc_chua[i], i))
+
+    def room_type(self, room) -> Optional[str]:
+        i = self.bit_of.get(room)
+        return self.loai[i] if i is not None else None
+
+    def _all_mask(self) -> int:
+        return self.available if self.available is not None else (1 << len(self.rooms)) - 1
+
+    # ------------------------------------------------------------------
+    # Phòng đang dùng
+    # ------------------------------------------------------------------
+    def clear(self):
+        self.used = {}
+
+    def occupy(self, slot, room):
+        self.used[slot] = self.used.get(slot, 0) | (1 << self._register(room))
+
+    def release(self, slot, room):
+        i = self.bit_of.get(room)
+        if i is None or slot not in self.used:
+            return
+        mask = self.used[slot] & ~(1 << i)
+        if mask:
+            self.used[slot] = mask
+        else:
+            del self.used[slot]
+
+    def free_mask(self, slot, loai: str = None) -> int:
+        mask = self._all_mask() & ~self.used.get(slot, 0)
+        if loai is not None:
+            mask &= self.type_mask.get(loai, 0) | self.untyped_mask
+        return mask
+
+    def free_rooms(self, slot, loai: str = None) -> List[str]:
+        mask = self.free_mask(slot, loai)
+        return [room for i, room in enumerate(self.rooms) if mask >> i & 1]
+
+    # ------------------------------------------------------------------
+    # Gán phòng
+    # ------------------------------------------------------------------
+    def _best_fit(self, free: int, need: int) -> Optional[int]:
+        """Phòng trống nhỏ nhất có SucChua >= need, không có thì phòng trống lớn nhất (-1 - chỉ số)"""
+        largest = None
+        for i in self.by_capacity:
+            if free >> i & 1:
+                if self.suc_chua[i] >= need:
+                    return i
+                largest = i
+        return None if largest is None else -1 - largest
+
+    def allocate(self, slot, groups: List[Tuple[Hashable, int, Optional[str]]],
+                 release: Iterable[str] = (), reserve: bool = True) -> Tuple[Dict[Hashable, str], List[dict]]:
+        """
+        Gán phòng cho các tổ thi của 1 slot. groups: [(khóa tổ, số SV, loại phòng cần)].
+
+        Tổ đông SV trước; thứ tự thử: phòng đúng loại đủ chỗ -> phòng khác loại đủ chỗ
+        -> phòng đúng loại lớn nhất -> phòng bất kỳ lớn nhất. Không bao giờ gán 1 phòng cho 2 tổ.
+        release: phòng coi như trống (vd phòng hiện tại của chính các tổ đang chuyển trong slot).
+        Trả về ({khóa: phòng}, [vấn đề: {"key", "reason": "thieu_suc_chua" | "thieu_phong", ...}]).
+        """
+        used = self.used.get(slot, 0)
+        for room in release:
+            i = self.bit_of.get(room)
+            if i is not None:
+                used &= ~(1 << i)
+        free = self._all_mask() & ~used
+
+        assigned, problems = {}, []
+        for key, need, loai in sorted(groups, key=lambda g: -(g[1] or 0)):
+            need = need or 0
+            typed = free & (self.type_mask.get(loai, 0) | self.untyped_mask) if loai is not None else free
+            pick = self._best_fit(typed, need)
+            if pick is None or pick < 0:
+                other = self._best_fit(free, need)
+                if other is not None and (other >= 0 or pick is None):
+                    pick = other
+            if pick is None:
+                problems.append({"key": key, "reason": "thieu_phong"})
+                continue
+            if pick < 0:
+                pick = -1 - pick
+                problems.append({"key": key, "reason": "thieu_suc_chua", "so_sv": need,
+                                 "PhongThi": self.rooms[pick], "SucChua": self.suc_chua[pick]})
+            free &= ~(1 << pick)
+            used |= 1 << pick
+            assigned[key] = self.rooms[pick]
+
+        if reserve:
+            if used:
+                self.used[slot] = used
+            else:
+                self.used.pop(slot, None)
+        return assigned, problems
@@ -0,0 +1,300 @@
+"""
+Schedule Store Module - Lịch thi nằm sẵn trong bộ nhớ server cho các API chỉnh sửa
+
+- Chỉ số băm: (MaHP, ToThi) -> dòng, (Ngay, Ca, PhongThi) -> dòng, (Ngay, Ca) -> các dòng.
+- Phòng đã dùng của mỗi (Ngay, Ca) giữ trong RoomIndex (bitset) để gán phòng khi chuyển tổ thi.
+- Move / swap cập nhật O(1), ghi nối tiếp vào change log (.changes.jsonl cạnh file Excel).
+- Sau COMPACT_EVERY thay đổi (hoặc khi flush) log được gộp vào file Excel rồi làm rỗng.
+"""
+
+import os
+import json
+import time
+import threading
+import pandas as pd
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from room_allocator import RoomIndex
+
+def ngay_key(ngay) -> str:
+    """Ngày thi dạng dd/mm/YYYY (file kết quả lưu chuỗi, Excel có thể trả về Timestamp)"""
+    if isinstance(ngay, date):
+        return ngay.strftime("%d/%m/%Y")
+    return str(ngay).strip()
+
+
+def lhp_key(mahp, tothi) -> Tuple[str, int]:
+    return str(mahp).strip(), int(tothi)
+
+
+def slot_key(ngay, ca) -> Tuple[str, int]:
+    return ngay_key(ngay), int(ca)
+
+
+class ScheduleStore:
+    """
+    Lịch thi (ket_qua_xep_lich_thi.xlsx) trong bộ nhớ.
+
+    File Excel + change log là dạng lưu trữ; mọi API đọc/ghi lịch đi qua store
+    (file Excel có thể chậm hơn log tối đa COMPACT_EVERY thay đổi).
+    Nếu file Excel bị thay từ bên ngoài (mtime/size khác), store đọc lại và bỏ log cũ.
+    """
+
+    COMPACT_EVERY = 50
+
+    def __init__(self, path: str, compact_every: int = None):
+        self.path = path
+        self.log_path = os.path.splitext(path)[0] + ".changes.jsonl"
+        self.compact_every = compact_every or self.COMPACT_EVERY
+        self.columns: List[str] = []
+        self.rows: List[dict] = []
+        self.by_key: Dict[Tuple[str, int], int] = {}
+        self.by_room: Dict[Tuple[str, int, str], set] = {}
+        self.by_slot: Dict[Tuple[str, int], set] = {}
+        self.rooms = RoomIndex()  # Phòng đã dùng theo (Ngay, Ca), cập nhật cùng by_room
+        self.version = 0  # Tăng mỗi lần lịch thay đổi (để các chỉ số phụ biết khi nào cần dựng lại)
+        self._file_sig = None
+        self._pending = 0
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # Nạp dữ liệu
+    # ------------------------------------------------------------------
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return [st.st_mtime_ns, st.st_size]
+
+    def exists(self) -> bool:
+        with self._lock:
+            return self._ensure_loaded()
+
+    def _ensure_loaded(self) -> bool:
+        sig = self._stat()
+        if sig is None:
+            return False
+        if sig != self._file_sig:
+            self._load(sig)
+        return True
+
+    def _load(self, sig):
+        df = pd.read_excel(self.path)
+        df = df.astype(object).where(df.notna(), None)
+        self.columns = list(df.columns)
+        self.rows = df.to_dict("records")
+        self._file_sig = sig
+
+        replayed = self._replay_log()
+        self._rebuild_index()
+        self.version += 1
+        print(f"   📋 ScheduleStore: {len(self.rows)} tổ thi (+{replayed} thay đổi từ log)")
+
+    def _replay_log(self) -> int:
+        """Áp lại các thay đổi chưa gộp vào Excel (chỉ khi log thuộc đúng phiên bản file hiện tại)"""
+        self._pending = 0
+        if not os.path.exists(self.log_path):
+            self._write_log_header()
+            return 0
+
+        index = {lhp_key(r["MaHP"], r["ToThi"]): i for i, r in enumerate(self.rows)}
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+        if header.get("base") != self._file_sig:
+            # Log của phiên bản file cũ (file đã được thay) -> bỏ
+            self._write_log_header()
+            return 0
+
+        replayed = 0
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break  # Dòng ghi dở (server dừng giữa chừng)
+            for mahp, tothi, ngay, ca, phong in entry["changes"]:
+                i = index.get(lhp_key(mahp, tothi))
+                if i is not None:
+                    self.rows[i].update(Ngay=ngay, Ca=ca, PhongThi=phong)
+            replayed += 1
+        self._pending = replayed
+        return replayed
+
+    def _rebuild_index(self):
+        self.by_key, self.by_room, self.by_slot = {}, {}, {}
+        self.rooms.clear()
+        for i, row in enumerate(self.rows):
+            self.by_key.setdefault(lhp_key(row["MaHP"], row["ToThi"]), i)
+            self._index_add(i)
+
+    def _room_key(self, row) -> Tuple[str, int, str]:
+        return ngay_key(row["Ngay"]), int(row["Ca"]), str(row["PhongThi"]).strip()
+
+    def _index_add(self, i: int):
+        row = self.rows[i]
+        if row["Ngay"] is None or row["Ca"] is None:
+            return
+        ngay, ca, phong = self._room_key(row)
+        self.by_room.setdefault((ngay, ca, phong), set()).add(i)
+        self.by_slot.setdefault((ngay, ca), set()).add(i)
+        self.rooms.occupy((ngay, ca), phong)
+
+    def _index_remove(self, i: int):
+        row = self.rows[i]
+        if row["Ngay"] is None or row["Ca"] is None:
+            return
+        ngay, ca, phong = self._room_key(row)
+        for index, key in ((self.by_room, (ngay, ca, phong)), (self.by_slot, (ngay, ca))):
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.discard(i)
+                if not bucket:
+                    del index[key]
+        if (ngay, ca, phong) not in self.by_room:
+            self.rooms.release((ngay, ca), phong)
+
+    # ------------------------------------------------------------------
+    # Truy vấn
+    # ------------------------------------------------------------------
+    def find(self, mahp, tothi) -> Optional[dict]:
+        """Tổ thi (MaHP, ToThi) hoặc None"""
+        with self._lock:
+            self._ensure_loaded()
+            i = self.by_key.get(lhp_key(mahp, tothi))
+            return dict(self.rows[i]) if i is not None else None
+
+    def find_in_room(self, ngay, ca, phong) -> Optional[dict]:
+        """Tổ thi đang ở phòng (Ngay, Ca, PhongThi) hoặc None"""
+        with self._lock:
+            self._ensure_loaded()
+            bucket = self.by_room.get((ngay_key(ngay), int(ca), str(phong).strip()))
+            return dict(self.rows[min(bucket)]) if bucket else None
+
+    def rows_in_slot(self, ngay, ca) -> List[dict]:
+        """Các tổ thi trong (Ngay, Ca)"""
+        with self._lock:
+            self._ensure_loaded()
+            return [dict(self.rows[i]) for i in sorted(self.by_slot.get(slot_key(ngay, ca), ()))]
+
+    def set_rooms(self, rooms: List[str], loai_phong: Dict[str, str] = None, suc_chua: Dict[str, int] = None):
+        """Phòng được phép gán khi chuyển tổ thi (sheet PhongThi); mặc định mọi phòng đã có trong lịch"""
+        with self._lock:
+            self.rooms.set_rooms(rooms, loai_phong, suc_chua)
+
+    def free_rooms(self, ngay, ca) -> List[str]:
+        """Phòng còn trống trong (Ngay, Ca)"""
+        with self._lock:
+            self._ensure_loaded()
+            return self.rooms.free_rooms(slot_key(ngay, ca))
+
+    def allocate_rooms(self, ngay, ca, items: List[Tuple], so_sv: Dict[Tuple[str, int], int] = None):
+        """
+        Chọn phòng trong (Ngay, Ca) cho các tổ thi items [(MaHP, ToThi), ...] (chưa ghi vào lịch).
+
+        Giữ loại phòng (TcPhong) hiện tại của từng tổ, ưu tiên phòng vừa đủ so_sv[(MaHP, ToThi)].
+        Phòng đang dùng bởi chính các tổ này trong (Ngay, Ca) được coi là trống.
+        Trả về ({(MaHP, ToThi): PhongThi}, vấn đề) như RoomIndex.allocate.
+        """
+        so_sv = so_sv or {}
+        key = slot_key(ngay, ca)
+        with self._lock:
+            self._ensure_loaded()
+            keys = [lhp_key(mahp, tothi) for mahp, tothi in items]
+            moving = {self.by_key[k] for k in keys if k in self.by_key}
+            groups, release = [], []
+            for k in keys:
+                i = self.by_key.get(k)
+                loai = None
+                if i is not None and self.rows[i]["PhongThi"] is not None:
+                    loai = self.rooms.room_type(str(self.rows[i]["PhongThi"]).strip())
+                    if self.rows[i]["Ngay"] is not None and self.rows[i]["Ca"] is not None:
+                        room_key = self._room_key(self.rows[i])
+                        if room_key[:2] == key and self.by_room.get(room_key, set()) <= moving:
+                            release.append(room_key[2])
+                groups.append((k, so_sv.get(k, 0), loai))
+            return self.rooms.allocate(key, groups, release=release, reserve=False)
+
+    def records(self) -> List[dict]:
+        with self._lock:
+            self._ensure_loaded()
+            return [dict(r) for r in self.rows]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        with self._lock:
+            self._ensure_loaded()
+            return pd.DataFrame(self.rows, columns=self.columns)
+
+    # ------------------------------------------------------------------
+    # Chỉnh sửa
+    # ------------------------------------------------------------------
+    def apply(self, changes: List[Tuple]) -> int:
+        """
+        Áp 1 nhóm thay đổi [(MaHP, ToThi, Ngay, Ca, PhongThi), ...] (ghi 1 dòng log).
+        Trả về số tổ thi đã cập nhật.
+        """
+        with self._lock:
+            if not self._ensure_loaded():
+                raise FileNotFoundError(self.path)
+            applied = []
+            for mahp, tothi, ngay, ca, phong in changes:
+                i = self.by_key.get(lhp_key(mahp, tothi))
+                if i is None:
+                    continue
+                self._index_remove(i)
+                self.rows[i].update(Ngay=ngay, Ca=int(ca), PhongThi=phong)
+                self._index_add(i)
+                row = self.rows[i]
+                applied.append([row["MaHP"], row["ToThi"], ngay, int(ca), phong])
+            if not applied:
+                return 0
+
+            self.version += 1
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"t": round(time.time(), 3), "changes": applied}, ensure_ascii=False, default=str) + "\n")
+            self._pending += 1
+            if self._pending >= self.compact_every:
+                self.compact()
+            return len(applied)
+
+    def move(self, mahp, tothi, ngay, ca, phong) -> bool:
+        return self.apply([(mahp, tothi, ngay, ca, phong)]) > 0
+
+    def swap(self, source: dict, target: dict) -> bool:
+        """Hoán đổi (Ngay, Ca, PhongThi) của 2 tổ thi"""
+        return self.apply([
+            (source["MaHP"], source["ToThi"], target["Ngay"], target["Ca"], target["PhongThi"]),
+            (target["MaHP"], target["ToThi"], source["Ngay"], source["Ca"], source["PhongThi"]),
+        ]) > 0
+
+    # ------------------------------------------------------------------
+    # Lưu trữ
+    # ------------------------------------------------------------------
+    def _write_log_header(self):
+        tmp = f"{self.log_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"base": self._file_sig}) + "\n")
+        os.replace(tmp, self.log_path)
+
+    def compact(self):
+        """Gộp log vào file Excel (ghi file tạm rồi thay thế) và làm rỗng log"""
+        with self._lock:
+            if self._file_sig is None:
+                return
+            tmp = f"{os.path.splitext(self.path)[0]}.tmp.xlsx"
+            pd.DataFrame(self.rows, columns=self.columns).to_excel(tmp, index=False)
+            os.replace(tmp, self.path)
+            self._file_sig = self._stat()
+            self._write_log_header()
+            print(f"   💾 ScheduleStore: gộp {self._pending} thay đổi vào {os.path.basename(self.path)}")
+            self._pending = 0
+
+    def flush(self):
+        """Ghi các thay đổi còn trong log ra Excel (gọi khi tắt server / trước khi tải file)"""
+        with self._lock:
+            if self._pending:
+                self.compact()
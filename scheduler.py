@@ -2,12 +2,262 @@
 Exam Scheduler Module - Module xếp lịch thi sử dụng OR-Tools CP-SAT Solver
 """
 
+import numpy as np
 import pandas as pd
 from ortools.sat.python import cp_model
 from collections import defaultdict
 import os
-from typing import Dict, List, Tuple, Optional
+import copy
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple, Optional
 from dataclasses import dataclass, field
+from datetime import datetime
+
+from conflict_graph import CourseConflictGraph
+from input_cache import read_excel_cached
+from exam_config import ExamConfigData, load_exam_config
+from feasibility import phan_tich_kha_thi
+from solver_constants import NGUONG_CHIA_TO, MIN_GAP_SPLIT, HE_SO_SV_TRUNG_CA, HE_SO_TRUNG_NGAY, HE_SO_SV_TRUNG_NGAY
+from heuristic import HeuristicScheduler
+from room_allocator import RoomIndex
+
+
+def rai_sv_vao_to_thi(df_sv: pd.DataFrame, phong_theo_mon: dict) -> pd.DataFrame:
+    """
+    Rải sinh viên vào tổ thi (chia đều theo tên ABC).
+    
+    Mỗi môn có N SV, so_to tổ: các tổ đầu nhận base+1 SV (base = N // so_to),
+    các tổ còn lại nhận base SV. Bỏ qua môn không có trong phong_theo_mon.
+    Trả về DataFrame [MaSV, Ten, MaHP, ToThi].
+    """
+    so_to_map = pd.Series({m: info["ToThi"] for m, info in phong_theo_mon.items()}, dtype="float64")
+    
+    df = df_sv.loc[df_sv["MaHP"].isin(so_to_map.index), ["MaSV", "Ten", "MaHP"]]
+    df = df.sort_values(["MaHP", "Ten"], kind="stable").reset_index(drop=True)
+    if len(df) == 0:
+        return pd.DataFrame(columns=["MaSV", "Ten", "MaHP", "ToThi"])
+    
+    grp = df.groupby("MaHP", sort=False)["MaHP"]
+    rank = grp.cumcount().to_numpy()
+    n = grp.transform("size").to_numpy()
+    so_to = df["MaHP"].map(so_to_map).astype(int).to_numpy()
+    
+    base = n // so_to
+    du = n % so_to
+    # du tổ đầu có base+1 SV, phần còn lại mỗi tổ base SV
+    nguong = du * (base + 1)
+    to_thi = np.where(
+        rank < nguong,
+        rank // (base + 1),
+        du + (rank - nguong) // np.maximum(base, 1)
+    ) + 1
+    
+    df["ToThi"] = to_thi.astype(int)
+    return df
+
+
+def tach_ho_ten(ten: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Tách họ tên (vector hóa): "Nguyễn Văn  A" -> ("Nguyễn Văn", "A"); 1 từ -> ("", từ)"""
+    ten = ten.fillna("").astype(str).str.replace(r"\s+", " ", regex=True).str.strip()
+    ho_dem = ten.str.replace(r"\s*\S+$", "", regex=True)
+    ten_sv = ten.str.extract(r"(\S*)$", expand=False).fillna("")
+    return ho_dem, ten_sv
+
+
+def _ten_sheet(ten: str, da_dung: set) -> str:
+    """Tên sheet hợp lệ (<= 31 ký tự, không trùng)"""
+    ten = "".join("-" if ch in '[]:*?/\\' else ch for ch in str(ten))[:31] or "Sheet"
+    goc, i = ten, 1
+    while ten.lower() in da_dung:
+        i += 1
+        ten = f"{goc[:28]}_{i}"
+    da_dung.add(ten.lower())
+    return ten
+
+
+def ghi_excel_stream(output_path: str, df, sheet_name: str = "Sheet1",
+                     partition_col: Optional[str] = None, chunk_size: int = 20000) -> int:
+    """
+    Ghi DataFrame ra .xlsx bằng xlsxwriter chế độ constant_memory (ghi từng dòng, xả ra đĩa ngay).
+    
+    df: 1 DataFrame, hoặc iterable các DataFrame cùng cột (sinh dần) được ghi nối tiếp nhau.
+    partition_col: mỗi giá trị của cột ra 1 sheet riêng (theo thứ tự xuất hiện); các sheet được ghi xen kẽ.
+    Trả về số dòng đã ghi.
+    """
+    import xlsxwriter
+    
+    parts = [df] if isinstance(df, pd.DataFrame) else df
+    workbook = xlsxwriter.Workbook(output_path, {"constant_memory": True})
+    so_dong = 0
+    try:
+        da_dung = set()
+        sheets = {}  # Giá trị partition_col -> [worksheet, dòng ghi tiếp theo]
+        
+        def sheet_cua(ten, columns):
+            key = None if pd.isna(ten) else ten
+            if key not in sheets:
+                worksheet = workbook.add_worksheet(_ten_sheet(ten, da_dung))
+                worksheet.write_row(0, 0, [str(c) for c in columns])
+                sheets[key] = [worksheet, 1]
+            return sheets[key]
+        
+        for part in parts:
+            if partition_col is None:
+                sheet_cua(sheet_name, part.columns)
+            for start in range(0, len(part), chunk_size):
+                chunk = part.iloc[start:start + chunk_size]
+                rows = list(chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None))
+                if partition_col is None:
+                    groups = [(sheet_name, range(len(rows)))]
+                else:
+                    groups = chunk.groupby(partition_col, sort=False, dropna=False).indices.items()
+                for ten, idx in groups:
+                    sheet = sheet_cua(ten, chunk.columns)
+                    worksheet, row = sheet
+                    for i in idx:
+                        worksheet.write_row(row, 0, rows[i])
+                        row += 1
+                    so_dong += row - sheet[1]
+                    sheet[1] = row
+        if not sheets:
+            workbook.add_worksheet(_ten_sheet(sheet_name, da_dung))
+    finally:
+        workbook.close()
+    return so_dong
+
+
+def danh_so_slot(df_kq: pd.DataFrame) -> pd.Series:
+    """Slot = thứ tự tổ thi trong mỗi (Ngay, Ca), sắp theo MaHP, ToThi (bắt đầu từ 1)"""
+    df_sap = df_kq.sort_values(["Ngay", "Ca", "MaHP", "ToThi"], kind="stable")
+    slot = df_sap.groupby(["Ngay", "Ca"], sort=False).cumcount() + 1
+    return slot.reindex(df_kq.index).fillna(0).astype(int)
+
+
+def tim_vi_pham_lien_ngay(df_kq_ctdt: pd.DataFrame) -> pd.DataFrame:
+    """
+    Các cặp ngày thi liền nhau của cùng CTDT-Khoa (vector hóa).
+
+    df_kq_ctdt: kết quả xếp lịch đã merge CTDT, Khoa.
+    Trả về DataFrame cột CTDT, Khoa, Ngay1, Mon_Ngay1, Ngay2, Mon_Ngay2.
+    """
+    cot = ["CTDT", "Khoa", "Ngay1", "Mon_Ngay1", "Ngay2", "Mon_Ngay2"]
+    df = df_kq_ctdt.dropna(subset=["CTDT", "Khoa"])[["CTDT", "Khoa", "Ngay", "MaHP"]]
+    if df.empty:
+        return pd.DataFrame(columns=cot)
+
+    # Bảng (CTDT, Khoa, Ngay) -> danh sách môn trong ngày (giữ thứ tự xuất hiện)
+    df_ngay = (
+        df.drop_duplicates(["CTDT", "Khoa", "Ngay", "MaHP"])
+        .assign(MaHP=lambda d: d["MaHP"].astype(str))
+        .groupby(["CTDT", "Khoa", "Ngay"], sort=True)["MaHP"]
+        .agg(", ".join)
+        .reset_index()
+    )
+
+    # Ngày thi kế tiếp của cùng CTDT-Khoa
+    nhom = df_ngay.groupby(["CTDT", "Khoa"], sort=False)
+    df_ngay["Ngay2"] = nhom["Ngay"].shift(-1)
+    df_ngay["Mon_Ngay2"] = nhom["MaHP"].shift(-1)
+
+    lien_ngay = (pd.to_datetime(df_ngay["Ngay2"]) - pd.to_datetime(df_ngay["Ngay"])).dt.days == 1
+    return (
+        df_ngay[lien_ngay]
+        .rename(columns={"Ngay": "Ngay1", "MaHP": "Mon_Ngay1"})[cot]
+        .reset_index(drop=True)
+    )
+
+
+def _giai_thanh_phan(scheduler: "ExamScheduler", kwargs: dict):
+    """Worker (chạy trong process con) giải 1 nhóm thành phần liên thông -> (lịch, thống kê phase)"""
+    schedule = scheduler._run_solver_phase(**kwargs)
+    return schedule, {k: v for k, v in scheduler.last_phase_result.items() if k != "incumbents"}
+
+
+def chia_suc_chua(remaining: dict, demand: list, mon_lon_nhat: list) -> List[dict]:
+    """
+    Chia sức chứa còn lại của từng slot cho các nhóm theo tỉ lệ demand (phần dư lớn nhất).
+    
+    Tổng các phần của 1 slot đúng bằng sức chứa; mỗi nhóm được ít nhất môn lớn nhất của nhóm
+    (khi đó tổng có thể vượt sức chứa -> master model xếp lại). Trả về [{slot: số tổ}] theo nhóm.
+    """
+    so_nhom = len(demand)
+    total_demand = max(1, sum(demand))
+    budgets = [{} for _ in range(so_nhom)]
+    for slot, cap in remaining.items():
+        cap = max(0, cap)
+        quota = [cap * dem / total_demand for dem in demand]
+        phan = [int(q) for q in quota]
+        thu_tu = sorted(range(so_nhom), key=lambda i: phan[i] - quota[i])
+        for i in thu_tu[:cap - sum(phan)]:
+            phan[i] += 1
+        for i in range(so_nhom):
+            budgets[i][slot] = min(cap, max(phan[i], mon_lon_nhat[i]))
+    return budgets
+
+
+def thong_ke_model(model: cp_model.CpModel, solver: cp_model.CpSolver, build_time: float, solve_time: float) -> dict:
+    """Kích thước model + thời gian xây / giải của 1 lần Solve"""
+    proto = model.Proto()
+    return {
+        "num_vars": len(proto.variables),
+        "num_constraints": len(proto.constraints),
+        "build_time": round(build_time, 3),
+        "solve_time": round(solve_time, 3),
+        "best_bound": solver.BestObjectiveBound(),
+        "num_conflicts": solver.NumConflicts(),
+        "num_branches": solver.NumBranches(),
+    }
+
+
+class PhaseProgressCallback(cp_model.CpSolverSolutionCallback):
+    """
+    Theo dõi các lời giải tốt hơn (incumbent) của CP-SAT trong 1 phase.
+    
+    - self.incumbents: [{"objective", "time"}].
+    - report(event): nhận sự kiện tiến độ (objective, bound, thời gian).
+    - on_incumbent(schedule, objective): nhận lời giải {MaHP: (d, c)} mỗi lần có incumbent mới;
+      chỉ khi có on_incumbent mới đọc vector lời giải (var_index: chỉ số biến z, hàng = môn trong courses,
+      cột = slot; hoặc 1 chiều: chỉ số biến slot nguyên của từng môn).
+    """
+    
+    def __init__(self, phase_name: str, report: Optional[Callable[[dict], None]] = None,
+                 var_index: Optional[np.ndarray] = None, courses: list = (), slots: list = (),
+                 on_incumbent: Optional[Callable[[dict, float], None]] = None):
+        super().__init__()
+        self.phase_name = phase_name
+        self.report = report
+        self.on_incumbent = on_incumbent if var_index is not None and len(courses) else None
+        self.courses = list(courses)
+        self.slots = list(slots)
+        self.incumbents = []
+        self._var_index = var_index
+    
+    def schedule(self, assignment) -> dict:
+        """Giải mã assignment -> {MaHP: (d, c)}"""
+        return {mahp: self.slots[i] for mahp, i in zip(self.courses, assignment)}
+    
+    def on_solution_callback(self):
+        objective = self.ObjectiveValue()
+        self.incumbents.append({"objective": objective, "time": round(self.WallTime(), 2)})
+        
+        if self.report is not None:
+            self.report({
+                "event": "solution",
+                "phase": self.phase_name,
+                "phase_time": round(self.WallTime(), 2),
+                "objective": objective,
+                "bound": self.BestObjectiveBound(),
+                "solutions": len(self.incumbents),
+            })
+        if self.on_incumbent is not None:
+            solution = np.asarray(self.Response().solution)
+            assignment = solution[self._var_index]
+            if assignment.ndim == 2:
+                assignment = assignment.argmax(axis=1)
+            self.on_incumbent(self.schedule(assignment), objective)
 
 
 @dataclass
@@ -21,6 +271,18 @@ class SchedulerConfig:
     solver_timeout: int = 300 
     num_workers: int = 8
     distribute_uniformly: bool = True # Mặc định bật load balancing
+    warm_start_file: Optional[str] = None  # File kết quả lần chạy trước (LichThi_ToThi) dùng làm gợi ý
+    decompose: bool = False  # Tách bài toán theo thành phần liên thông, giải song song
+    symmetry_breaking: bool = False  # Thêm ràng buộc thứ tự cho môn giống hệt nhau và các ca hoán đổi được
+    capacity_model: str = "linear"  # "linear": tổng z*ToThi mỗi slot | "cumulative": 1 biến slot nguyên / môn (không có z) + AddCumulative
+    lns_time_limit: int = 0  # Thời gian (giây) cho vòng cải thiện LNS sau PHASE 3 (0 = tắt)
+    lns_step_time: int = 10  # Thời gian tối đa cho mỗi model con của LNS
+    decompose_workers: int = 0  # Số process khi decompose (0 = số CPU)
+    incumbent_file: Optional[str] = None  # File JSON ghi lời giải tốt nhất hiện có trong lúc giải (dùng lại được làm warm_start_file)
+    presolve_check: bool = True  # Phân tích khả thi (feasibility.py) trước PHASE 1, dừng ngay nếu chắc chắn INFEASIBLE
+    engine: str = "cpsat"  # "cpsat" | "heuristic": DSatur + tabu search (heuristic.py), có lịch trong vài giây
+    heuristic_time_limit: int = 10  # Thời gian tối đa (giây) cho mỗi phase của engine heuristic
+    heuristic_warm_start: bool = False  # engine="cpsat": chạy heuristic trước để làm gợi ý (hint) cho các phase
 
 
 
@@ -38,6 +300,8 @@ class SchedulerResult:
 class ExamScheduler:
     """Class xử lý xếp lịch thi"""
     
+    INCUMBENT_SAVE_INTERVAL = 5  # Giây tối thiểu giữa 2 lần ghi incumbent_file trong 1 phase
+    
     def __init__(self, config: SchedulerConfig = None):
         self.config = config or SchedulerConfig()
         self.data_loaded = False
@@ -47,6 +311,7 @@ class ExamScheduler:
         self.df_data = None
         self.df_sv = None
         self.df_cfg = None
+        self.exam_config: Optional[ExamConfigData] = None
         self.df_data_thi = None
         self.df_sv_to_thi = None
         
@@ -61,8 +326,13 @@ class ExamScheduler:
         self.map_ngay = {}
         self.ds_mahp_set = set()
         self.ctdt_khoa_to_mon = {}
+        self.conflict_graph: Optional[CourseConflictGraph] = None
         self.priority_phase2_config = [] # List[(CTDT, Khoa, SoNgay)]
         self.split_courses = {} # {MaHP_gốc: [(MaHP_D1, ToThi_D1), ...]}
+        self.last_phase_result = {} # {"status", "objective", kích thước model, thời gian} của lần gọi _run_solver_phase gần nhất
+        self.lns_stats = {} # {"rounds", "improvements", "start_objective", "objective"} của lần chạy LNS gần nhất
+        self.progress_callback: Optional[Callable[[dict], None]] = None # Nhận sự kiện tiến độ (phase_start, solution, phase_end)
+        self._incumbent_saved = None # {"so_mon", "objective", "time", "phase"} của lần ghi incumbent_file gần nhất
                 
         # Mapping Ca -> Giờ thi
         self.CA_TO_GIO = {
@@ -75,89 +345,26 @@ class ExamScheduler:
     def load_data(self, path_lhp: str, path_data: str, path_cfg: str, path_sv: str) -> dict:
         """Đọc và xử lý dữ liệu từ các file Excel"""
         try:
-            # Đọc files
-            self.df_lhp = pd.read_excel(path_lhp)
-            self.df_data = pd.read_excel(path_data)
-            self.df_cfg = pd.read_excel(path_cfg)
-            self.df_sv = pd.read_excel(path_sv)
-            
-            # Chuẩn hóa dữ liệu SV
-            self.df_sv["MaSV"] = self.df_sv["MaSV"].astype(str).str.strip()
-            self.df_sv["Ten"] = self.df_sv["Ten"].astype(str).str.strip()
-            self.df_sv["MaHP"] = self.df_sv["MaHP"].astype(str).str.strip()
-            
-            # Chuẩn hóa dữ liệu LHP để khớp với SV
-            self.df_lhp["MaHP"] = self.df_lhp["MaHP"].astype(str).str.strip()
-            
-            # Đọc các sheet cấu hình
-            df_hk = pd.read_excel(path_cfg, sheet_name="HK")
-            df_hk.columns = df_hk.columns.str.strip()
-            
-            df_thoigianthi = pd.read_excel(path_cfg, sheet_name="ThoiGianThi")
-            df_thoigianthi.columns = df_thoigianthi.columns.str.strip()
-            
-            df_ca_thi = pd.read_excel(path_cfg, sheet_name="CaThi")
-            df_ca_thi.columns = df_ca_thi.columns.str.strip()
-            
-            # Đọc danh sách phòng thi
-            df_phongthi = pd.read_excel(path_cfg, sheet_name="PhongThi")
-            df_phongthi.columns = df_phongthi.columns.str.strip()
-            
-            self.phong_kha_dung = (
-                df_phongthi["PhongThi"]
-                .dropna()
-                .astype(str)
-                .str.strip()
-                .tolist()
-            )
-
-            # Đọc Cấu hình Phase 2 (Optional)
-            try:
-                xl = pd.ExcelFile(path_cfg)
-                if "UuTienPhase2" in xl.sheet_names:
-                    df_p2 = pd.read_excel(path_cfg, sheet_name="UuTienPhase2")
-                    df_p2.columns = [str(c).strip() for c in df_p2.columns]
-                    
-                    col_ctdt = next((c for c in df_p2.columns if "CTDT" in c or "Khoa" in c), None)
-                    col_days = next((c for c in df_p2.columns if "Ngay" in c), None)
-                    
-                    if col_ctdt and col_days:
-                        for _, row in df_p2.iterrows():
-                            if pd.notna(row[col_ctdt]):
-                                text = str(row[col_ctdt]).strip()
-                                try:
-                                    days = int(row[col_days])
-                                except:
-                                    days = 5
-                                
-                                parts = text.split("-")
-                                if len(parts) >= 2:
-                                    k = parts[-1].strip()
-                                    c = "-".join(parts[:-1]).strip()
-                                    self.priority_phase2_config.append((c, k, days))
-            except Exception as e:
-                print(f"Warning load Core Config P2: {e}")
-
-            
-            self.suc_chua_phong = dict(
-                zip(
-                    df_phongthi["PhongThi"].astype(str).str.strip(),
-                    df_phongthi["SucChua"]
-                )
-            )
+            # Đọc files (qua cache: chỉ parse Excel khi file thay đổi)
+            # SV: MaSV/Ten/MaHP đã strip; LHP: MaHP đã strip để khớp với SV
+            self.df_lhp = read_excel_cached(path_lhp, normalize="lhp")
+            self.df_data = read_excel_cached(path_data)
+            self.df_sv = read_excel_cached(path_sv, normalize="sv")
+            
+            # Đọc cấu hình (mọi sheet trong 1 lần đọc workbook)
+            self.exam_config = load_exam_config(path_cfg)
+            cfg = self.exam_config
+            self.df_cfg = next(iter(cfg.sheets.values()))
+            
+            self.phong_kha_dung = list(cfg.phong_thi)
+            self.suc_chua_phong = dict(cfg.suc_chua_phong)
+            self.priority_phase2_config = list(cfg.uu_tien_phase2)
             
             # Cập nhật max_to_per_ca theo số phòng khả dụng
             self.config.max_to_per_ca = len(self.phong_kha_dung)
             
-            # Lấy năm và học kỳ
-            nam_th = int(df_hk.loc[0, "NamTH"])
-            hk_th = int(df_hk.loc[0, "HKTH"])
-            
             # Lọc data theo năm + học kỳ
-            self.df_data_thi = self.df_data[
-                (self.df_data["NamTH"] == nam_th) &
-                (self.df_data["HKTH"] == hk_th)
-            ]
+            self.df_data_thi = read_excel_cached(path_data, normalize="data_thi", nam_th=cfg.nam_th, hk_th=cfg.hk_th)
             
             # Danh sách môn thi
             self.ds_mahp_thi = self.df_lhp["MaHP"].drop_duplicates()
@@ -168,17 +375,12 @@ class ExamScheduler:
             ].copy()
             
             # Ngày thi
-            self.ngay_thi = (
-                df_thoigianthi
-                .query("SuDung == 1")["NgayThi"]
-                .sort_values()
-                .tolist()
-            )
+            self.ngay_thi = list(cfg.ngay_thi)
             NGAY = list(range(1, len(self.ngay_thi) + 1))
             self.map_ngay = dict(zip(NGAY, self.ngay_thi))
             
             # Ca thi
-            self.ca_thi = df_ca_thi["Ca"].sort_values().tolist()
+            self.ca_thi = list(cfg.ca_thi)
             
             # Thông tin phòng theo môn
             self.phong_theo_mon = (
@@ -194,36 +396,7 @@ class ExamScheduler:
             if len(self.df_sv) < original_count:
                 print(f"   [WARNING] Removed {original_count - len(self.df_sv)} duplicate (MaSV, MaHP) entries")
             
-            ds_sv_to_thi = []
-            for mahp, df_mhp in self.df_sv.groupby("MaHP"):
-                if mahp not in self.phong_theo_mon:
-                    continue
-                    
-                so_to = int(self.phong_theo_mon[mahp]["ToThi"])
-                df_mhp_sorted = df_mhp.sort_values("Ten").reset_index(drop=True)
-                
-                N = len(df_mhp_sorted)
-                if N == 0:
-                    continue
-                    
-                base = N // so_to
-                du = N % so_to
-                start_idx = 0
-                
-                for to in range(1, so_to + 1):
-                    so_sv_to = base + (1 if to <= du else 0)
-                    df_to = df_mhp_sorted.iloc[start_idx:start_idx + so_sv_to]
-                    
-                    for _, row in df_to.iterrows():
-                        ds_sv_to_thi.append({
-                            "MaSV": row["MaSV"],
-                            "Ten": row["Ten"],
-                            "MaHP": mahp,
-                            "ToThi": to
-                        })
-                    start_idx += so_sv_to
-            
-            self.df_sv_to_thi = pd.DataFrame(ds_sv_to_thi)
+            self.df_sv_to_thi = rai_sv_vao_to_thi(self.df_sv, self.phong_theo_mon)
             
             # SV -> danh sách môn thi
             self.sv_to_mon = (
@@ -241,6 +414,11 @@ class ExamScheduler:
                 .to_dict()
             )
             
+            # Đồ thị xung đột môn (dùng chung cho mọi phase)
+            self.conflict_graph = CourseConflictGraph.from_enrollments(
+                self.sv_to_mon, self.ctdt_khoa_to_mon, courses=self.ds_mahp_thi.tolist()
+            )
+            
             self.data_loaded = True
             
             return {
@@ -262,6 +440,95 @@ class ExamScheduler:
                 "error": str(e)
             }
     
+    def analyze_feasibility(self) -> dict:
+        """Kiểm tra nhanh các cận (sức chứa, môn lớn, clique SV, số ngày CTĐT-Khóa) trước khi giải"""
+        return phan_tich_kha_thi(self)
+    
+    def _report(self, **event):
+        """Gửi sự kiện tiến độ cho progress_callback (nếu có)"""
+        if self.progress_callback is not None:
+            self.progress_callback(event)
+    
+    def _thong_ke_phase(self, phase_name: str, ds_mon: list, fixed_schedule: dict, wall_time: float) -> dict:
+        """Thống kê 1 phase cho SchedulerResult.stats (từ last_phase_result của lần chạy vừa xong)"""
+        fixed_schedule = fixed_schedule or {}
+        so_fixed = sum(1 for m in ds_mon if m in fixed_schedule)
+        stats = {
+            "phase": phase_name,
+            "wall_time": round(wall_time, 3),
+            "courses": len(ds_mon),
+            "courses_fixed": so_fixed,
+            "courses_free": len(ds_mon) - so_fixed,
+        }
+        stats.update({k: v for k, v in self.last_phase_result.items() if k != "incumbents"})
+        stats["num_incumbents"] = len(self.last_phase_result.get("incumbents", []))
+        return stats
+    
+    def _solution_callback(self, phase_name: str, z: dict = None, ds_mon_free: list = (),
+                           fixed_schedule: dict = None, var_index: np.ndarray = None) -> PhaseProgressCallback:
+        """
+        Callback ghi nhận incumbent của phase (báo tiến độ + ghi incumbent_file nếu có cấu hình).
+        
+        Ma trận chỉ số biến z (var_index) chỉ dựng khi có incumbent_file; truyền sẵn nếu model dùng lại nhiều lần.
+        """
+        slots = [(d, c) for d in range(1, len(self.ngay_thi) + 1) for c in self.ca_thi]
+        if not self.config.incumbent_file or (z is None and var_index is None):
+            return PhaseProgressCallback(phase_name, self.progress_callback, slots=slots)
+        
+        base = dict(fixed_schedule or {})
+        
+        def _save(schedule, objective):
+            merged = dict(base)
+            merged.update(schedule)
+            self._save_incumbent(phase_name, merged, objective)
+        
+        if var_index is None:
+            var_index = np.array(
+                [[z[(mahp, d, c)].Index() for (d, c) in slots] for mahp in ds_mon_free], dtype=np.int64
+            ).reshape(len(ds_mon_free), len(slots))
+        return PhaseProgressCallback(phase_name, self.progress_callback, var_index, ds_mon_free, slots, _save)
+    
+    def _save_incumbent(self, phase_name: str, schedule: dict, objective: float, force: bool = False):
+        """
+        Ghi lịch tốt nhất hiện có ra config.incumbent_file (JSON, ghi đè nguyên tử).
+        
+        Chỉ ghi khi lịch phủ nhiều môn hơn lần trước, hoặc cùng số môn và (phase mới hoặc objective tốt hơn);
+        trong cùng 1 phase ghi tối đa mỗi INCUMBENT_SAVE_INTERVAL giây (trừ khi force).
+        Objective chỉ so sánh trong cùng 1 phase (mỗi phase 1 hàm mục tiêu); các vòng LNS giải lại
+        model của phase cuối nên so sánh cùng phase đó.
+        """
+        path = self.config.incumbent_file
+        if not path:
+            return
+        last = self._incumbent_saved
+        phase_key = phase_name.split(" [")[0]  # "PHASE 3 (...) [master]" -> "PHASE 3 (...)"
+        if phase_key.startswith("LNS") and last is not None:
+            phase_key = last["phase"]
+        if last is not None and len(schedule) <= last["so_mon"]:
+            if len(schedule) < last["so_mon"]:
+                return
+            if phase_key == last["phase"]:
+                if objective is not None and last["objective"] is not None and objective >= last["objective"]:
+                    return
+                if not force and time.time() - last["time"] < self.INCUMBENT_SAVE_INTERVAL:
+                    return
+        
+        data = {
+            "phase": phase_name,
+            "objective": objective,
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "schedule": {
+                mahp: {"Ngay": self.map_ngay[d].strftime("%d/%m/%Y"), "Ca": int(c)}
+                for mahp, (d, c) in schedule.items()
+            },
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._incumbent_saved = {"so_mon": len(schedule), "objective": objective, "time": time.time(),
+                                 "phase": phase_key}
+    
     def _run_solver_phase(self, 
                           phase_name: str, 
                           ds_mon_to_schedule: list, 
@@ -270,12 +537,22 @@ class ExamScheduler:
                           restricted_days: list = None,
                           prioritize_early: bool = True,
                           relax_same_day: bool = False,
-                          distribute_uniformly: bool = False):
-        """Helper chạy solver cho một phase"""
+                          distribute_uniformly: bool = False,
+                          hint_schedule: dict = None,
+                          slot_capacity: dict = None):
+        """
+        Helper chạy solver cho một phase.
+        
+        Môn trong fixed_schedule (đã xếp ở phase trước) được coi là hằng số, không tạo biến.
+        hint_schedule: {MaHP: (d, c)} - lời giải gợi ý (AddHint) cho các môn chưa fixed.
+        slot_capacity: {(d, c): số tổ} - sức chứa dành cho môn chưa fixed (mặc định = số phòng - phần đã fixed).
+        """
         print(f" [Scheduler] Starting {phase_name}...")
         print(f"   Courses to schedule: {len(ds_mon_to_schedule)}")
+        self._report(event="phase_start", phase=phase_name, courses=len(ds_mon_to_schedule))
         print(f"   relax_same_day: {relax_same_day}")
         print(f"   distribute_uniformly: {distribute_uniformly}")
+        t_start = time.time()
         
         model = cp_model.CpModel()
         
@@ -283,37 +560,66 @@ class ExamScheduler:
         DAYS = list(range(1, len(self.ngay_thi) + 1)) # DAYS index 1..N
         CA = self.ca_thi
         
+        fixed_schedule = fixed_schedule or {}
+        ds_mon_free = [m for m in ds_mon_to_schedule if m not in fixed_schedule]
+        print(f"   Fixed from previous phases: {len(ds_mon_to_schedule) - len(ds_mon_free)}")
+        
+        if self.config.capacity_model == "cumulative":
+            # Model gọn: 1 biến slot nguyên / môn, không tạo z
+            SLOTS = [(d, c) for d in DAYS for c in CA]
+            model, slot_of = self._build_compact_model(
+                ds_mon_to_schedule, fixed_schedule, restricted_days, prioritize_early,
+                relax_same_day, distribute_uniformly, hint_schedule, slot_capacity
+            )
+            callback = self._solution_callback(
+                phase_name, ds_mon_free=ds_mon_free, fixed_schedule=fixed_schedule,
+                var_index=np.array([slot_of[m].Index() for m in ds_mon_free], dtype=np.int64)
+            )
+            return self._solve_phase_model(
+                model, callback, phase_name, ds_mon_to_schedule, fixed_schedule, time_limit, t_start,
+                lambda solver, mahp: SLOTS[solver.Value(slot_of[mahp])]
+            )
+        
         # Biến quyết định
+        # 2. Môn cố định (từ phase trước): z là hằng số 0/1 thay vì biến
         z = {}
         for mahp in ds_mon_to_schedule:
+            fix = fixed_schedule.get(mahp)
             for d in DAYS:
                 for c in CA:
-                    z[(mahp, d, c)] = model.NewBoolVar(f"z_{mahp}_{d}_{c}")
+                    if fix is not None:
+                        z[(mahp, d, c)] = 1 if (d, c) == tuple(fix) else 0
+                    else:
+                        z[(mahp, d, c)] = model.NewBoolVar(f"z_{mahp}_{d}_{c}")
                     
-        # 0. Ràng buộc Restricted Days (Phase 2)
+        # 0. Ràng buộc Restricted Days (Phase 2) - chỉ áp cho môn chưa fixed
         if restricted_days is not None:
             valid_days_set = set(restricted_days)
             for d in DAYS:
                 if d not in valid_days_set:
-                    for mahp in ds_mon_to_schedule:
-                        # Nếu môn này đã được fixed (từ Phase trước), thì KHÔNG chặn
-                        if fixed_schedule and mahp in fixed_schedule:
-                            continue
+                    for mahp in ds_mon_free:
                         # Chặn không cho xếp vào ngày d
                         for c in CA:
                             model.Add(z[(mahp, d, c)] == 0)
         
         # 1. Mỗi môn thi đúng 1 ca
-        for mahp in ds_mon_to_schedule:
+        for mahp in ds_mon_free:
             model.Add(
                 sum(z[(mahp, d, c)] for d in DAYS for c in CA) == 1
             )
-            
-        # 2. Ràng buộc cố định (từ phase trước)
-        if fixed_schedule:
-            for mahp, (fix_d, fix_c) in fixed_schedule.items():
-                if mahp in ds_mon_to_schedule:
-                    model.Add(z[(mahp, fix_d, fix_c)] == 1)
+        
+        # Gợi ý lời giải (warm start)
+        so_hint = 0
+        if hint_schedule:
+            for mahp in ds_mon_free:
+                slot = hint_schedule.get(mahp)
+                if slot is None or slot[0] not in DAYS or slot[1] not in CA:
+                    continue
+                for d in DAYS:
+                    for c in CA:
+                        model.AddHint(z[(mahp, d, c)], (d, c) == tuple(slot))
+                so_hint += 1
+            print(f"   Hinted courses: {so_hint}/{len(ds_mon_free)}")
         
         # 3. Ràng buộc sức chứa
         # FIX: Phải tính capacity đã chiếm bởi fixed_schedule
@@ -321,29 +627,36 @@ class ExamScheduler:
         
         # Tính capacity đã dùng bởi fixed_schedule ở mỗi slot
         fixed_usage = {}  # (d, c) -> tổng tổ thi đã fixed
-        if fixed_schedule:
-            for mahp, (fix_d, fix_c) in fixed_schedule.items():
-                if mahp in self.phong_theo_mon:
-                    key = (fix_d, fix_c)
-                    fixed_usage[key] = fixed_usage.get(key, 0) + self.phong_theo_mon[mahp]["ToThi"]
+        for mahp, (fix_d, fix_c) in fixed_schedule.items():
+            if mahp in self.phong_theo_mon:
+                key = (fix_d, fix_c)
+                fixed_usage[key] = fixed_usage.get(key, 0) + self.phong_theo_mon[mahp]["ToThi"]
         
         for d in DAYS:
             for c in CA:
                 # Capacity còn lại sau khi trừ phần đã fixed
-                used = fixed_usage.get((d, c), 0)
-                remaining = MAX_TO_PER_CA - used
+                if slot_capacity is not None:
+                    remaining = slot_capacity.get((d, c), 0)
+                else:
+                    used = fixed_usage.get((d, c), 0)
+                    remaining = MAX_TO_PER_CA - used
                 
                 # Chỉ constraint cho môn CHƯA fixed (môn mới)
                 model.Add(
                     sum(
                         z[(mahp, d, c)] * self.phong_theo_mon[mahp]["ToThi"]
-                        for mahp in ds_mon_to_schedule
-                        if mahp not in (fixed_schedule or {})  # Môn mới
+                        for mahp in ds_mon_free  # Môn mới
                     ) <= max(0, remaining)  # Đảm bảo không âm
                 )
 
+        # 3.2 Phá đối xứng (tùy chọn)
+        if self.config.symmetry_breaking:
+            self._add_symmetry_breaking(
+                model, z, DAYS, CA, ds_mon_free, fixed_usage, slot_capacity,
+                shifts_symmetric=distribute_uniformly  # Hàm mục tiêu không phụ thuộc số thứ tự ca
+            )
+
         # 3.5 Ràng buộc môn chia: D2 phải cách D1 ít nhất 2 ngày
-        MIN_GAP_SPLIT = 2
         ds_mon_set = set(ds_mon_to_schedule)
         
         for mahp_goc, split_list in self.split_courses.items():
@@ -363,80 +676,94 @@ class ExamScheduler:
         # 4. Sinh viên không trùng ca
         # Phase 1/2 (relax_same_day=False): HARD CONSTRAINT
         # Phase 3 (relax_same_day=True): SOFT với penalty CỰC CAO
+        # Gom SV có cùng tập môn -> mỗi clique chỉ sinh ràng buộc 1 lần, penalty nhân số SV
         ds_mon_set = set(ds_mon_to_schedule)
-        penalty_sv_trung_ca = []
+        penalty_sv_trung_ca = []  # List[(biến vi phạm, số SV)]
         if self.config.sv_khong_trung_ca:
-            for masv, mon_list in self.sv_to_mon.items():
-                mon_list_filtered = [m for m in mon_list if m in ds_mon_set]
-                if len(mon_list_filtered) <= 1:
-                    continue
+            nhom_sv_ca = self.conflict_graph.student_cliques(
+                ds_mon_set, drop_subsets=not relax_same_day
+            )
+            print(f"   Student cliques (shift): {len(nhom_sv_ca)}")
+            for idx, (mon_set, so_sv) in enumerate(nhom_sv_ca.items()):
+                mon_list_filtered = sorted(mon_set)
                 for d in DAYS:
                     for c in CA:
                         sum_sv = sum(z[(mahp, d, c)] for mahp in mon_list_filtered)
+                        if isinstance(sum_sv, int):
+                            # Toàn môn fixed: vi phạm là hằng số
+                            if relax_same_day and sum_sv > 1:
+                                penalty_sv_trung_ca.append((sum_sv - 1, so_sv))
+                            continue
                         
                         if relax_same_day:
                             # SOFT CONSTRAINT for Phase 3
-                            vi_pham = model.NewIntVar(0, len(mon_list_filtered), f"vpsv_{masv}_{d}_{c}")
+                            vi_pham = model.NewIntVar(0, len(mon_list_filtered), f"vpsv_{idx}_{d}_{c}")
                             model.Add(vi_pham >= sum_sv - 1)
-                            penalty_sv_trung_ca.append(vi_pham)
+                            penalty_sv_trung_ca.append((vi_pham, so_sv))
                         else:
                             # HARD CONSTRAINT for Phase 1/2
                             model.Add(sum_sv <= 1)
         
         # 4b. Penalty cho SV thi NHIỀU MÔN CÙNG NGÀY (khác ca) - SOFT CONSTRAINT
         # Hạn chế tối đa SV phải thi nhiều môn trong 1 ngày
-        penalty_sv_trung_ngay = []
-        for masv, mon_list in self.sv_to_mon.items():
-            mon_list_filtered = [m for m in mon_list if m in ds_mon_set]
-            if len(mon_list_filtered) <= 1:
-                continue
+        penalty_sv_trung_ngay = []  # List[(biến vi phạm, số SV)]
+        nhom_sv_ngay = self.conflict_graph.student_cliques(ds_mon_set)
+        for idx, (mon_set, so_sv) in enumerate(nhom_sv_ngay.items()):
+            mon_list_filtered = sorted(mon_set)
             
             for d in DAYS:
                 sum_sv_ngay = sum(z[(mahp, d, c)] for mahp in mon_list_filtered for c in CA)
-                vi_pham_ngay = model.NewIntVar(0, len(mon_list_filtered), f"vpsvngay_{masv}_{d}")
+                if isinstance(sum_sv_ngay, int):
+                    if sum_sv_ngay > 1:
+                        penalty_sv_trung_ngay.append((sum_sv_ngay - 1, so_sv))
+                    continue
+                vi_pham_ngay = model.NewIntVar(0, len(mon_list_filtered), f"vpsvngay_{idx}_{d}")
                 model.Add(vi_pham_ngay >= sum_sv_ngay - 1)
-                penalty_sv_trung_ngay.append(vi_pham_ngay)
+                penalty_sv_trung_ngay.append((vi_pham_ngay, so_sv))
+        
+        # 5/6. Biến "CTĐT-Khóa có thi trong ngày d" - tạo 1 lần, dùng chung cho 5 và 6
+        # occ = 1 <=> có ít nhất 1 môn của CTĐT-Khóa thi trong ngày d
+        cohort_mon = {
+            key: mon_list
+            for key, mon_list in self.conflict_graph.cohort_courses(ds_mon_set).items()
+            if len(mon_list) > 1
+        }
+        occ = {}  # ((ctdt, khoa), d) -> (occ, tổng số môn thi trong ngày)
+        if self.config.ctdt_khong_trung_ngay or self.config.ctdt_khong_lien_ngay:
+            for (ctdt, khoa), mon_list_filtered in cohort_mon.items():
+                for d in DAYS:
+                    thi_trong_ngay = [sum(z[(mahp, d, c)] for c in CA) for mahp in mon_list_filtered]
+                    sum_mon = sum(thi_trong_ngay)
+                    has_d = model.NewBoolVar(f"has_{ctdt}_{khoa}_{d}")
+                    model.Add(has_d <= sum_mon)
+                    for x in thi_trong_ngay:
+                        model.Add(x <= has_d)
+                    occ[((ctdt, khoa), d)] = (has_d, sum_mon)
         
         # 5. CTĐT-Khóa không thi cùng ngày
         penalty_trung_ngay = []
         if self.config.ctdt_khong_trung_ngay:
-            for (ctdt, khoa), mon_list in self.ctdt_khoa_to_mon.items():
-                mon_list_filtered = [m for m in mon_list if m in ds_mon_set]
-                if len(mon_list_filtered) <= 1:
-                    continue
+            for key, mon_list_filtered in cohort_mon.items():
                 for d in DAYS:
-                    sum_mon = sum(z[(mahp, d, c)] for mahp in mon_list_filtered for c in CA)
+                    has_d, sum_mon = occ[(key, d)]
                     if relax_same_day:
-                        vi_pham = model.NewIntVar(0, len(mon_list_filtered), f"vp_{ctdt}_{khoa}_{d}")
-                        model.Add(vi_pham >= sum_mon - 1)
-                        penalty_trung_ngay.append(vi_pham)
+                        # Số môn vượt quá 1 trong ngày = sum_mon - has_d
+                        penalty_trung_ngay.append(sum_mon - has_d)
                     else:
                         model.Add(sum_mon <= 1)
                     
         # 6. CTĐT-Khóa không thi liền ngày (Mềm)
         penalty_lien_ngay = []
         if self.config.ctdt_khong_lien_ngay:
-            for (ctdt, khoa), mon_list in self.ctdt_khoa_to_mon.items():
-                mon_list_filtered = [m for m in mon_list if m in ds_mon_set]
-                if len(mon_list_filtered) <= 1:
-                    continue
-                
+            for (ctdt, khoa) in cohort_mon:
                 for i in range(len(DAYS) - 1):
                     d1, d2 = DAYS[i], DAYS[i+1]
+                    has_d1 = occ[((ctdt, khoa), d1)][0]
+                    has_d2 = occ[((ctdt, khoa), d2)][0]
                     
-                    has_d1 = model.NewBoolVar(f"has_{ctdt}_{khoa}_{d1}")
-                    sum_d1 = sum(z[(mahp, d1, c)] for mahp in mon_list_filtered for c in CA)
-                    model.Add(sum_d1 >= 1).OnlyEnforceIf(has_d1)
-                    model.Add(sum_d1 == 0).OnlyEnforceIf(has_d1.Not())
-                    
-                    has_d2 = model.NewBoolVar(f"has_{ctdt}_{khoa}_{d2}")
-                    sum_d2 = sum(z[(mahp, d2, c)] for mahp in mon_list_filtered for c in CA)
-                    model.Add(sum_d2 >= 1).OnlyEnforceIf(has_d2)
-                    model.Add(sum_d2 == 0).OnlyEnforceIf(has_d2.Not())
-                    
+                    # has_d1 AND has_d2 => both (both bị phạt nên không cần chiều ngược lại)
                     both = model.NewBoolVar(f"both_{ctdt}_{khoa}_{d1}_{d2}")
-                    model.AddBoolAnd([has_d1, has_d2]).OnlyEnforceIf(both)
-                    model.AddBoolOr([has_d1.Not(), has_d2.Not()]).OnlyEnforceIf(both.Not())
+                    model.AddBoolOr([has_d1.Not(), has_d2.Not(), both])
                     
                     penalty_lien_ngay.append(both)
         
@@ -444,19 +771,16 @@ class ExamScheduler:
         total_objective = []
         
         # 0a. Penalty SV trùng ca (nếu relax)
-        HE_SO_SV_TRUNG_CA = 100000000
-        for pen in penalty_sv_trung_ca:
-            total_objective.append(HE_SO_SV_TRUNG_CA * pen)
+        for pen, so_sv in penalty_sv_trung_ca:
+            total_objective.append(HE_SO_SV_TRUNG_CA * so_sv * pen)
         
         # 0b. Penalty CTĐT trùng ngày (nếu relax)
-        HE_SO_TRUNG_NGAY = 10000000
         for pen in penalty_trung_ngay:
             total_objective.append(HE_SO_TRUNG_NGAY * pen)
         
         # 0c. Penalty SV thi nhiều môn cùng ngày (khác ca)
-        HE_SO_SV_TRUNG_NGAY = 5000000
-        for pen in penalty_sv_trung_ngay:
-            total_objective.append(HE_SO_SV_TRUNG_NGAY * pen)
+        for pen, so_sv in penalty_sv_trung_ngay:
+            total_objective.append(HE_SO_SV_TRUNG_NGAY * so_sv * pen)
         
         # 1. Penalty liền ngày
         HE_SO_PENALTY_LIEN_NGAY = self.config.he_so_penalty_lien_ngay
@@ -510,34 +834,657 @@ class ExamScheduler:
                     
         model.Minimize(sum(total_objective))
         
+        callback = self._solution_callback(phase_name, z, ds_mon_free, fixed_schedule)
+        
+        def slot_cua(solver, mahp):
+            return next((d, c) for d in DAYS for c in CA if solver.Value(z[(mahp, d, c)]) == 1)
+        
+        return self._solve_phase_model(model, callback, phase_name, ds_mon_to_schedule, fixed_schedule,
+                                       time_limit, t_start, slot_cua)
+
+    def _solve_phase_model(self, model, callback, phase_name: str, ds_mon_to_schedule: list,
+                           fixed_schedule: dict, time_limit: int, t_start: float, slot_cua) -> Optional[dict]:
+        """Giải model của 1 phase, ghi last_phase_result + incumbent. slot_cua(solver, MaHP) -> (d, c)"""
         # Solve
         solver = cp_model.CpSolver()
         solver.parameters.max_time_in_seconds = time_limit
         solver.parameters.num_search_workers = self.config.num_workers
         
-        status = solver.Solve(model)
+        t_solve = time.time()
+        status = solver.Solve(model, callback)
         
+        self.last_phase_result = {"status": solver.StatusName(status), "objective": None}
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            self.last_phase_result["objective"] = solver.ObjectiveValue()
+        self.last_phase_result["incumbents"] = callback.incumbents
+        self.last_phase_result.update(thong_ke_model(model, solver, t_solve - t_start, time.time() - t_solve))
+        self._report(event="phase_end", phase=phase_name, status=self.last_phase_result["status"],
+                     objective=self.last_phase_result["objective"])
         if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
             result_schedule = {}
             for mahp in ds_mon_to_schedule:
-                for d in DAYS:
-                    for c in CA:
-                        if solver.Value(z[(mahp, d, c)]) == 1:
-                            result_schedule[mahp] = (d, c)
-                            break
+                if mahp in fixed_schedule:
+                    result_schedule[mahp] = tuple(fixed_schedule[mahp])
+                else:
+                    result_schedule[mahp] = slot_cua(solver, mahp)
+            self._save_incumbent(phase_name, {**fixed_schedule, **result_schedule},
+                                 self.last_phase_result["objective"], force=True)
             return result_schedule
         else:
             return None
 
+    def _build_compact_model(self, ds_mon_to_schedule: list, fixed_schedule: dict, restricted_days: list,
+                             prioritize_early: bool, relax_same_day: bool, distribute_uniformly: bool,
+                             hint_schedule: dict, slot_capacity: dict):
+        """
+        Model gọn của 1 phase (capacity_model="cumulative"): không có biến one-hot z.
+        
+        - Mỗi môn chưa fixed: slot (IntVar 0..S-1), ngày, ca; bảng (AddAllowedAssignments) nối 3 biến
+          và loại các ngày ngoài restricted_days.
+        - Sức chứa: AddCumulative (mỗi môn = interval dài 1 slot, demand = số tổ thi).
+        - Trùng ca / trùng ngày của 1 nhóm môn = số môn - số slot (ngày) khác nhau, tính qua biến
+          "môn i cùng slot (ngày) với 1 môn đứng trước"; relax_same_day=False -> số trùng = 0.
+        - Liền ngày: mỗi ngày có thi (môn đầu tiên của ngày) mà ngày sau cũng có thi bị phạt 1 lần.
+        - Rải đều: số môn tối đa mỗi ngày / mỗi ca là sức chứa (biến) của 1 AddCumulative.
+        Trả về (model, {MaHP: biến slot}) - chỉ gồm môn chưa fixed.
+        """
+        model = cp_model.CpModel()
+        DAYS = list(range(1, len(self.ngay_thi) + 1))
+        CA = self.ca_thi
+        SLOTS = [(d, c) for d in DAYS for c in CA]
+        SLOT_IDX = {slot: i for i, slot in enumerate(SLOTS)}
+        MAX_TO_PER_CA = len(self.phong_kha_dung)
+        ds_mon_set = set(ds_mon_to_schedule)
+        ngay_hop_le = set(restricted_days) if restricted_days is not None else set(DAYS)
+        
+        # Biến quyết định: môn fixed -> hằng số
+        slot_of, day_of, ca_of = {}, {}, {}
+        for mahp in ds_mon_to_schedule:
+            fix = fixed_schedule.get(mahp)
+            if fix is not None:
+                day_of[mahp], ca_of[mahp] = tuple(fix)
+                slot_of[mahp] = SLOT_IDX[tuple(fix)]
+                continue
+            slot_of[mahp] = model.NewIntVar(0, len(SLOTS) - 1, f"slot_{mahp}")
+            day_of[mahp] = model.NewIntVar(1, len(DAYS), f"day_{mahp}")
+            ca_of[mahp] = model.NewIntVar(min(CA), max(CA), f"ca_{mahp}")
+            model.AddAllowedAssignments(
+                [slot_of[mahp], day_of[mahp], ca_of[mahp]],
+                [(i, d, c) for i, (d, c) in enumerate(SLOTS) if d in ngay_hop_le]
+            )
+        ds_mon_free = [m for m in ds_mon_to_schedule if m not in fixed_schedule]
+        
+        # Gợi ý lời giải (warm start)
+        if hint_schedule:
+            so_hint = 0
+            for mahp in ds_mon_free:
+                slot = hint_schedule.get(mahp)
+                if slot is None or tuple(slot) not in SLOT_IDX:
+                    continue
+                model.AddHint(slot_of[mahp], SLOT_IDX[tuple(slot)])
+                model.AddHint(day_of[mahp], slot[0])
+                model.AddHint(ca_of[mahp], slot[1])
+                so_hint += 1
+            print(f"   Hinted courses: {so_hint}/{len(ds_mon_free)}")
+        
+        # Sức chứa: phần không dùng được của mỗi slot -> 1 interval cố định chiếm chỗ
+        fixed_usage = defaultdict(int)
+        for mahp, slot in fixed_schedule.items():
+            if mahp in self.phong_theo_mon:
+                fixed_usage[tuple(slot)] += self.phong_theo_mon[mahp]["ToThi"]
+        intervals, demands = [], []
+        for slot, i in SLOT_IDX.items():
+            if slot_capacity is not None:
+                remaining = slot_capacity.get(slot, 0)
+            else:
+                remaining = MAX_TO_PER_CA - fixed_usage.get(slot, 0)
+            blocked = MAX_TO_PER_CA - min(MAX_TO_PER_CA, max(0, remaining))
+            if blocked > 0:
+                intervals.append(model.NewFixedSizeIntervalVar(i, 1, f"blocked_{i}"))
+                demands.append(blocked)
+        for mahp in ds_mon_free:
+            intervals.append(model.NewFixedSizeIntervalVar(slot_of[mahp], 1, f"itv_{mahp}"))
+            demands.append(int(self.phong_theo_mon[mahp]["ToThi"]))
+        model.AddCumulative(intervals, demands, MAX_TO_PER_CA)
+        
+        if self.config.symmetry_breaking:
+            self._add_symmetry_breaking(model, None, DAYS, CA, ds_mon_free, fixed_usage, slot_capacity,
+                                        shifts_symmetric=False, slot_of=slot_of)
+        
+        # Môn chia: D2 cách D1 ít nhất MIN_GAP_SPLIT ngày
+        for split_list in self.split_courses.values():
+            if len(split_list) >= 2:
+                mahp_d1, mahp_d2 = split_list[0][0], split_list[1][0]
+                if mahp_d1 in ds_mon_set and mahp_d2 in ds_mon_set and not (
+                        mahp_d1 in fixed_schedule and mahp_d2 in fixed_schedule):
+                    model.Add(day_of[mahp_d2] >= day_of[mahp_d1] + MIN_GAP_SPLIT)
+        
+        # Biến "cùng slot / cùng ngày" cho từng cặp môn (dùng chung giữa các nhóm)
+        gia_tri = {"slot": slot_of, "day": day_of}
+        cung = {}
+        
+        def bang(kind, m1, m2):
+            x1, x2 = gia_tri[kind][m1], gia_tri[kind][m2]
+            if isinstance(x1, int) and isinstance(x2, int):
+                return int(x1 == x2)
+            key = (kind,) + tuple(sorted((m1, m2)))
+            if key not in cung:
+                b = model.NewBoolVar(f"cung_{kind}_{key[1]}_{key[2]}")
+                model.Add(x1 == x2).OnlyEnforceIf(b)
+                model.Add(x1 != x2).OnlyEnforceIf(b.Not())
+                cung[key] = b
+            return cung[key]
+        
+        trung_cache = {}
+        
+        def trung_truoc(kind, mon_list):
+            """[môn i cùng slot/ngày với 1 môn đứng trước nó] cho từng môn; tổng = số môn - số giá trị khác nhau"""
+            key = (kind, tuple(mon_list))
+            if key in trung_cache:
+                return trung_cache[key]
+            ket_qua = [0]
+            for i in range(1, len(mon_list)):
+                cap = [bang(kind, mon_list[j], mon_list[i]) for j in range(i)]
+                if any(isinstance(b, int) and b == 1 for b in cap):
+                    ket_qua.append(1)
+                    continue
+                cap = [b for b in cap if not isinstance(b, int)]
+                if len(cap) <= 1:
+                    ket_qua.append(cap[0] if cap else 0)
+                    continue
+                dup = model.NewBoolVar(f"dup_{kind}_{mon_list[i]}_{len(trung_cache)}")
+                model.AddMaxEquality(dup, cap)
+                ket_qua.append(dup)
+            trung_cache[key] = ket_qua
+            return ket_qua
+        
+        def so_trung(kind, mon_list):
+            tong = sum(trung_truoc(kind, mon_list))
+            if not relax_same_day and not isinstance(tong, int):
+                model.Add(tong == 0)
+                return 0
+            return tong
+        
+        # 4. SV không trùng ca (cứng khi relax_same_day=False)
+        penalty_sv_trung_ca = []
+        if self.config.sv_khong_trung_ca:
+            nhom_sv_ca = self.conflict_graph.student_cliques(ds_mon_set, drop_subsets=not relax_same_day)
+            print(f"   Student cliques (shift): {len(nhom_sv_ca)}")
+            for mon_set, so_sv in nhom_sv_ca.items():
+                penalty_sv_trung_ca.append((so_trung("slot", sorted(mon_set)), so_sv))
+        
+        # 4b. SV thi nhiều môn cùng ngày (mềm)
+        penalty_sv_trung_ngay = [
+            (sum(trung_truoc("day", sorted(mon_set))), so_sv)
+            for mon_set, so_sv in self.conflict_graph.student_cliques(ds_mon_set).items()
+        ]
+        
+        cohort_mon = {
+            key: sorted(mon_list)
+            for key, mon_list in self.conflict_graph.cohort_courses(ds_mon_set).items()
+            if len(mon_list) > 1
+        }
+        # 5. CTĐT-Khóa không thi cùng ngày
+        penalty_trung_ngay = []
+        if self.config.ctdt_khong_trung_ngay:
+            penalty_trung_ngay = [so_trung("day", mon_list) for mon_list in cohort_mon.values()]
+        
+        # 6. CTĐT-Khóa không thi liền ngày: môn đầu tiên của 1 ngày mà có môn thi ngày hôm sau
+        penalty_lien_ngay = []
+        if self.config.ctdt_khong_lien_ngay:
+            for (ctdt, khoa), mon_list in cohort_mon.items():
+                trung = trung_truoc("day", mon_list)
+                for i, m1 in enumerate(mon_list):
+                    sau = []  # Biến/hằng "m2 thi ngay sau ngày của m1"
+                    for m2 in mon_list:
+                        if m2 == m1:
+                            continue
+                        x1, x2 = day_of[m1], day_of[m2]
+                        if isinstance(x1, int) and isinstance(x2, int):
+                            sau.append(int(x2 == x1 + 1))
+                            continue
+                        b = model.NewBoolVar(f"sau_{m1}_{m2}")
+                        model.Add(x2 != x1 + 1).OnlyEnforceIf(b.Not())
+                        sau.append(b)
+                    if isinstance(trung[i], int) and all(isinstance(b, int) for b in sau):
+                        penalty_lien_ngay.append(int(not trung[i] and any(sau)))
+                        continue
+                    lien = model.NewBoolVar(f"lien_{ctdt}_{khoa}_{i}")
+                    for b in sau:
+                        model.Add(lien >= b - trung[i])
+                    penalty_lien_ngay.append(lien)
+        
+        # HÀM MỤC TIÊU (cùng hệ số với model tuyến tính)
+        total_objective = []
+        for pen, so_sv in penalty_sv_trung_ca:
+            total_objective.append(HE_SO_SV_TRUNG_CA * so_sv * pen)
+        for pen in penalty_trung_ngay:
+            total_objective.append(HE_SO_TRUNG_NGAY * pen)
+        for pen, so_sv in penalty_sv_trung_ngay:
+            total_objective.append(HE_SO_SV_TRUNG_NGAY * so_sv * pen)
+        for pen in penalty_lien_ngay:
+            total_objective.append(self.config.he_so_penalty_lien_ngay * pen)
+        
+        if prioritize_early and not distribute_uniformly:
+            for mahp in ds_mon_to_schedule:
+                total_objective.append(day_of[mahp] * self.phong_theo_mon[mahp]["ToThi"])
+        if not distribute_uniformly:
+            for mahp in ds_mon_to_schedule:
+                total_objective.append(ca_of[mahp] * 0.1)
+        
+        if distribute_uniformly:
+            print("   [Load Balancing] Enabling distribute_uniformly...")
+            # Số môn tối đa mỗi ngày / mỗi ca = sức chứa nhỏ nhất đủ cho các interval dài 1 ngày / 1 ca
+            max_exams_per_day = model.NewIntVar(0, len(ds_mon_to_schedule), "max_exams_per_day")
+            model.AddCumulative(
+                [model.NewFixedSizeIntervalVar(day_of[m], 1, f"ngay_{m}") for m in ds_mon_to_schedule],
+                [1] * len(ds_mon_to_schedule), max_exams_per_day
+            )
+            total_objective.append(max_exams_per_day * 5000)
+            
+            max_exams_per_shift = model.NewIntVar(0, len(ds_mon_to_schedule), "max_exams_per_shift")
+            model.AddCumulative(
+                [model.NewFixedSizeIntervalVar(ca_of[m], 1, f"ca_{m}") for m in ds_mon_to_schedule],
+                [1] * len(ds_mon_to_schedule), max_exams_per_shift
+            )
+            total_objective.append(max_exams_per_shift * 2000)
+        
+        objective = sum(total_objective)
+        if isinstance(objective, (int, float)):
+            # Mọi môn đều fixed: mục tiêu là hằng số
+            objective = objective * model.NewConstant(1)
+        model.Minimize(objective)
+        return model, {m: slot_of[m] for m in ds_mon_free}
+
+    def _add_symmetry_breaking(self, model, z, DAYS, CA, ds_mon_free, fixed_usage, slot_capacity, shifts_symmetric,
+                               slot_of: dict = None):
+        """
+        Ràng buộc phá đối xứng cho model của 1 phase.
+        
+        - Môn giống hệt nhau (cùng tập SV/CTĐT-Khóa, cùng ToThi và loại phòng, không phải môn chia):
+          slot của môn trước <= slot của môn sau.
+        - Các ca hoán đổi được (rải đều, không có môn fixed, sức chứa như nhau giữa các ca):
+          số môn của ca trước >= số môn của ca sau.
+        slot_of: {MaHP: biến slot} của model gọn (không có z, bỏ phần thứ tự các ca).
+        """
+        SLOT_IDX = {(d, c): i for i, (d, c) in enumerate((d, c) for d in DAYS for c in CA)}
+        
+        def slot_expr(mahp):
+            if slot_of is not None:
+                return slot_of[mahp]
+            return sum(i * z[(mahp, d, c)] for (d, c), i in SLOT_IDX.items())
+        
+        mon_chia = {m for split_list in self.split_courses.values() for m, _ in split_list}
+        so_rang_buoc = 0
+        for lop in self.conflict_graph.equivalence_classes([m for m in ds_mon_free if m not in mon_chia]):
+            theo_phong = defaultdict(list)
+            for m in lop:
+                info = self.phong_theo_mon[m]
+                theo_phong[(info["ToThi"], info.get("PhongThi", "PH"))].append(m)
+            for nhom in theo_phong.values():
+                for m1, m2 in zip(nhom, nhom[1:]):
+                    model.Add(slot_expr(m1) <= slot_expr(m2))
+                    so_rang_buoc += 1
+        
+        if shifts_symmetric and not fixed_usage and slot_of is None:
+            if slot_capacity is None or all(
+                len({slot_capacity.get((d, c), 0) for c in CA}) == 1 for d in DAYS
+            ):
+                shift_counts = [sum(z[(m, d, c)] for m in ds_mon_free for d in DAYS) for c in CA]
+                for a, b in zip(shift_counts, shift_counts[1:]):
+                    model.Add(a >= b)
+                    so_rang_buoc += 1
+        
+        print(f"   Symmetry breaking constraints: {so_rang_buoc}")
+    
+    def _lns_neighbourhood(self, kind: str, schedule: dict, rng: random.Random, max_size: int = 20,
+                           locked: set = frozenset()) -> set:
+        """
+        Chọn tập môn được "thả" cho 1 vòng LNS (không bao giờ chứa môn trong locked).
+        
+        - "day": các môn thi trong 1 ngày ngẫu nhiên
+        - "ctdt": các môn của 1 CTĐT-Khóa ngẫu nhiên
+        - "worst": các môn dính nhiều vi phạm cùng ngày (CTĐT-Khóa + SV, có trọng số số SV),
+          chọn ngẫu nhiên theo điểm vi phạm trong nhóm 3 * max_size môn tệ nhất (mỗi vòng 1 vùng khác)
+        """
+        if kind == "day":
+            ngay = sorted({d for m, (d, _) in schedule.items() if m not in locked})
+            if not ngay:
+                return set()
+            d = rng.choice(ngay)
+            return {m for m, (dd, _) in schedule.items() if dd == d and m not in locked}
+        
+        cohort_mon = {k: [m for m in v if m in schedule] for k, v in self.conflict_graph.cohort_courses().items()}
+        cohort_mon = {k: v for k, v in cohort_mon.items() if len(v) > 1}
+        if kind == "ctdt":
+            chon_duoc = sorted(k for k, v in cohort_mon.items() if any(m not in locked for m in v))
+            if not chon_duoc:
+                return set()
+            return set(cohort_mon[rng.choice(chon_duoc)]) - locked
+        
+        # "worst": điểm vi phạm của từng môn
+        diem = defaultdict(int)
+        for mon_list in cohort_mon.values():
+            theo_ngay = defaultdict(list)
+            for m in mon_list:
+                theo_ngay[schedule[m][0]].append(m)
+            for ds in theo_ngay.values():
+                if len(ds) > 1:
+                    for m in ds:
+                        diem[m] += 10 * (len(ds) - 1)
+        for mon_set, so_sv in self.conflict_graph.student_cliques(set(schedule)).items():
+            theo_ngay = defaultdict(list)
+            for m in mon_set:
+                theo_ngay[schedule[m][0]].append(m)
+            for ds in theo_ngay.values():
+                if len(ds) > 1:
+                    for m in ds:
+                        diem[m] += so_sv * (len(ds) - 1)
+        top = sorted((m for m in diem if m not in locked), key=lambda m: (-diem[m], m))[:3 * max_size]
+        # Lấy mẫu không hoàn lại có trọng số diem (khóa rng.random() ** (1 / diem), Efraimidis-Spirakis)
+        return set(sorted(top, key=lambda m: -rng.random() ** (1.0 / diem[m]))[:max_size])
+    
+    def _improve_lns(self, schedule: dict, ds_mon: list, objective: float, time_budget: float,
+                     locked: set = None) -> dict:
+        """
+        Cải thiện lời giải sau PHASE 3 bằng Large Neighbourhood Search.
+        
+        Mỗi vòng thả 1 vùng lân cận (ngày / CTĐT-Khóa / môn vi phạm nhiều nhất), giải lại model
+        của PHASE 3 với các môn còn lại cố định (gợi ý = lời giải hiện tại) và nhận nếu tốt hơn.
+        Các môn trong locked luôn giữ nguyên: solve() khóa mọi môn của PHASE 1 và PHASE 2
+        (PHASE 3 cũng coi chúng là cố định; môn Phase 2 còn bị giới hạn ngày ưu tiên).
+        """
+        locked = locked or set()
+        rng = random.Random(0)
+        if objective is None:
+            # Phase cuối không trả về objective -> tính với mọi môn cố định
+            self._run_solver_phase("LNS baseline", ds_mon, fixed_schedule=schedule, time_limit=10,
+                                   prioritize_early=False, relax_same_day=True, distribute_uniformly=True)
+            objective = self.last_phase_result.get("objective")
+        best, best_obj = dict(schedule), objective
+        if not any(m not in locked for m in ds_mon):
+            print(" [LNS] Skipped: every course is locked by PHASE 1/2")
+            self.lns_stats = {"rounds": 0, "improvements": 0, "start_objective": objective, "objective": objective}
+            return best
+        deadline = time.time() + time_budget
+        kinds = ["worst", "day", "ctdt"]
+        vong, so_cai_thien = 0, 0
+        
+        print(f" [LNS] Start: objective={best_obj}, budget={time_budget}s")
+        while time.time() < deadline - 1:
+            kind = kinds[vong % len(kinds)]
+            vong += 1
+            free = self._lns_neighbourhood(kind, best, rng, locked=locked)
+            if not free:
+                continue
+            
+            fixed = {m: best[m] for m in ds_mon if m not in free}
+            result = self._run_solver_phase(
+                f"LNS #{vong} ({kind}, {len(free)} courses)",
+                ds_mon,
+                fixed_schedule=fixed,
+                time_limit=max(1, min(self.config.lns_step_time, int(deadline - time.time()))),
+                prioritize_early=False,
+                relax_same_day=True,
+                distribute_uniformly=True,
+                hint_schedule=best
+            )
+            obj = self.last_phase_result.get("objective")
+            if result and obj is not None and (best_obj is None or obj < best_obj - 1e-6):
+                print(f"   [LNS] Improved {best_obj} -> {obj}")
+                best, best_obj = result, obj
+                so_cai_thien += 1
+        
+        print(f" [LNS] Done: {vong} rounds, {so_cai_thien} improvements, objective={best_obj}")
+        self.lns_stats = {
+            "rounds": vong,
+            "improvements": so_cai_thien,
+            "start_objective": objective,
+            "objective": best_obj,
+        }
+        return best
+    
+    def _component_scheduler(self, courses: list) -> "ExamScheduler":
+        """Bản sao gọn của scheduler chỉ chứa dữ liệu của các môn trong courses (để gửi sang process con)"""
+        course_set = set(courses)
+        sub = ExamScheduler(copy.copy(self.config))
+        sub.config.incumbent_file = None  # Lời giải từng phần, không ghi đè incumbent của bài toán đầy đủ
+        sub.ngay_thi = self.ngay_thi
+        sub.ca_thi = self.ca_thi
+        sub.map_ngay = self.map_ngay
+        sub.phong_kha_dung = self.phong_kha_dung
+        sub.phong_theo_mon = {m: self.phong_theo_mon[m] for m in courses if m in self.phong_theo_mon}
+        sub.split_courses = {
+            goc: split_list for goc, split_list in self.split_courses.items()
+            if all(m in course_set for m, _ in split_list)
+        }
+        sub.conflict_graph = self.conflict_graph.subgraph(course_set)
+        sub.data_loaded = True
+        return sub
+    
+    def _run_solver_phase_decomposed(self, phase_name: str, ds_mon_to_schedule: list,
+                                     fixed_schedule: dict = None, time_limit: int = 60, **kwargs):
+        """
+        Chạy 1 phase theo thành phần liên thông của đồ thị xung đột.
+        
+        - Các môn chưa fixed được chia theo thành phần liên thông (SV chung, cùng CTĐT-Khóa, môn chia D1/D2),
+          gom thành tối đa `decompose_workers` nhóm, giải song song (ProcessPool).
+        - Sức chứa mỗi (ngày, ca) được chia cho các nhóm theo tỉ lệ tổng tổ thi (phần dư lớn nhất,
+          tổng đúng bằng sức chứa), mỗi nhóm ít nhất bằng môn lớn nhất của nhóm.
+        - Nhóm không xếp được thì giải lại (song song, chung 1 hạn time_limit) với toàn bộ sức chứa.
+        - Cuối cùng 1 master model xếp lại các môn ở (ngày, ca) bị vượt sức chứa, phần còn lại giữ nguyên.
+        Cân bằng tải (distribute_uniformly) chỉ được tối ưu trong từng nhóm; objective của phase
+        được tính lại trên lịch đã gộp.
+        """
+        fixed_schedule = fixed_schedule or {}
+        DAYS = list(range(1, len(self.ngay_thi) + 1))
+        ds_mon_free = [m for m in ds_mon_to_schedule if m not in fixed_schedule]
+        ds_mon_fixed = [m for m in ds_mon_to_schedule if m in fixed_schedule]
+        
+        split_links = [[m for m, _ in split_list] for split_list in self.split_courses.values()]
+        components = self.conflict_graph.components(ds_mon_free, extra_links=split_links)
+        
+        so_process = self.config.decompose_workers or os.cpu_count() or 1
+        so_nhom = min(len(components), so_process)
+        print(f" [Decompose] {phase_name}: {len(components)} components -> {so_nhom} groups")
+        if so_nhom <= 1:
+            return self._run_solver_phase(phase_name, ds_mon_to_schedule, fixed_schedule=fixed_schedule,
+                                          time_limit=time_limit, **kwargs)
+        
+        self._report(event="phase_start", phase=phase_name, courses=len(ds_mon_to_schedule), groups=so_nhom)
+        
+        # Gom thành phần vào nhóm (cân bằng theo số môn)
+        nhom = [[] for _ in range(so_nhom)]
+        for comp in components:
+            min(nhom, key=len).extend(comp)
+        
+        # Sức chứa còn lại của từng slot, chia theo tỉ lệ tổng tổ thi của nhóm
+        MAX_TO_PER_CA = len(self.phong_kha_dung)
+        remaining = {(d, c): MAX_TO_PER_CA for d in DAYS for c in self.ca_thi}
+        for mahp, slot in fixed_schedule.items():
+            if mahp in self.phong_theo_mon and tuple(slot) in remaining:
+                remaining[tuple(slot)] -= self.phong_theo_mon[mahp]["ToThi"]
+        budgets = chia_suc_chua(
+            remaining,
+            [sum(self.phong_theo_mon[m]["ToThi"] for m in g) for g in nhom],
+            [max((self.phong_theo_mon[m]["ToThi"] for m in g), default=0) for g in nhom]
+        )
+        
+        tasks = []
+        for i, g in enumerate(nhom):
+            budget = budgets[i]
+            sub = self._component_scheduler(g + ds_mon_fixed)
+            sub.config.num_workers = max(1, self.config.num_workers // so_nhom)
+            tasks.append((sub, dict(
+                kwargs,
+                phase_name=f"{phase_name} [group {i + 1}/{so_nhom}]",
+                ds_mon_to_schedule=g + ds_mon_fixed,
+                fixed_schedule=fixed_schedule,
+                time_limit=time_limit,
+                slot_capacity=budget,
+            )))
+        
+        def giai_cac_nhom(map_fn):
+            results = list(map_fn(_giai_thanh_phan, [t[0] for t in tasks], [t[1] for t in tasks]))
+            # Nhóm không xếp được trong phần sức chứa được chia -> thử lại với toàn bộ sức chứa
+            thu_lai = [i for i, (res, _) in enumerate(results) if res is None]
+            if thu_lai:
+                print(f"   [Decompose] Retrying {len(thu_lai)} groups with full capacity")
+                deadline = time.time() + time_limit
+                for i in thu_lai:
+                    tasks[i][1]["slot_capacity"] = remaining
+                    tasks[i][1]["time_limit"] = max(1, int(deadline - time.time()))
+                lan_2 = map_fn(_giai_thanh_phan, [tasks[i][0] for i in thu_lai], [tasks[i][1] for i in thu_lai])
+                for i, res in zip(thu_lai, lan_2):
+                    results[i] = res
+            return results
+        
+        try:
+            with ProcessPoolExecutor(max_workers=so_nhom) as pool:
+                results = giai_cac_nhom(pool.map)
+        except Exception as e:
+            print(f"   [Decompose] Process pool failed ({e}), solving groups sequentially")
+            results = giai_cac_nhom(map)
+        
+        merged = {}
+        group_stats = []
+        for res, res_stats in results:
+            group_stats.append(res_stats)
+            if res is None:
+                print("   [Decompose] Group failed, falling back to full model")
+                return self._run_solver_phase(phase_name, ds_mon_to_schedule, fixed_schedule=fixed_schedule,
+                                              time_limit=time_limit, **kwargs)
+            merged.update(res)
+        
+        # Master: xếp lại các môn ở slot bị vượt sức chứa
+        usage = defaultdict(int)
+        for m in ds_mon_free:
+            usage[merged[m]] += self.phong_theo_mon[m]["ToThi"]
+        overloaded = {slot for slot, used in usage.items() if used > remaining.get(slot, 0)}
+        if not overloaded:
+            # Objective của lịch gộp: 1 lần giải model với mọi môn cố định
+            self._run_solver_phase(f"{phase_name} [objective]", ds_mon_to_schedule,
+                                   fixed_schedule={**fixed_schedule, **merged}, time_limit=10, **kwargs)
+            objective = self.last_phase_result.get("objective")
+            # Thống kê gộp các nhóm (giải song song: thời gian lấy max, kích thước model cộng dồn)
+            self.last_phase_result = {
+                "status": "FEASIBLE", "objective": objective, "incumbents": [],
+                "build_time": max(st.get("build_time", 0) for st in group_stats),
+                "solve_time": max(st.get("solve_time", 0) for st in group_stats),
+                "groups": group_stats,
+            }
+            for key in ("num_vars", "num_constraints", "num_conflicts", "num_branches"):
+                self.last_phase_result[key] = sum(st.get(key, 0) for st in group_stats)
+            return merged
+        
+        mon_xep_lai = [m for m in ds_mon_free if merged[m] in overloaded]
+        print(f"   [Decompose] Reconciling {len(mon_xep_lai)} courses in {len(overloaded)} overloaded slots")
+        fixed_master = dict(fixed_schedule)
+        fixed_master.update({m: merged[m] for m in ds_mon_free if m not in set(mon_xep_lai)})
+        kwargs_master = dict(kwargs)
+        kwargs_master["hint_schedule"] = merged
+        schedule = self._run_solver_phase(f"{phase_name} [master]", ds_mon_to_schedule,
+                                          fixed_schedule=fixed_master, time_limit=time_limit, **kwargs_master)
+        self.last_phase_result["groups"] = group_stats
+        return schedule
+    
+    def _load_warm_start(self, path: str) -> dict:
+        """
+        Đọc lịch thi từ file kết quả lần chạy trước -> {MaHP nội bộ: (d, c)}.
+        
+        Môn chia (MaHP_D1/D2) được nhận ra theo ToThi. Bỏ qua môn/ngày/ca không còn trong dữ liệu hiện tại.
+        File .json: incumbent_file của lần chạy trước (MaHP nội bộ -> Ngay, Ca).
+        """
+        hint = {}
+        if not path or not os.path.exists(path):
+            return hint
+        if path.lower().endswith(".json"):
+            return self._load_incumbent(path)
+        try:
+            df_old = pd.read_excel(path, sheet_name="LichThi_ToThi")
+            df_old["MaHP"] = df_old["MaHP"].astype(str).str.strip()
+            df_old["Ngay"] = pd.to_datetime(df_old["Ngay"], format="%d/%m/%Y", errors="coerce")
+            
+            ngay_to_d = {pd.Timestamp(ngay).normalize(): d for d, ngay in self.map_ngay.items()}
+            
+            for (mahp, to), (ngay, ca) in (
+                df_old.groupby(["MaHP", "ToThi"])[["Ngay", "Ca"]].first().iterrows()
+            ):
+                d = ngay_to_d.get(pd.Timestamp(ngay).normalize()) if pd.notna(ngay) else None
+                if d is None or ca not in self.ca_thi:
+                    continue
+                
+                mahp_internal = mahp
+                if mahp in self.split_courses:
+                    # Tổ 1..to_d1 thuộc D1, phần còn lại thuộc D2
+                    offset = 0
+                    for mahp_split, so_to_split in self.split_courses[mahp]:
+                        mahp_internal = mahp_split
+                        offset += so_to_split
+                        if to <= offset:
+                            break
+                
+                if mahp_internal in self.phong_theo_mon and mahp_internal not in hint:
+                    hint[mahp_internal] = (d, int(ca))
+            
+            print(f"   [Warm start] {len(hint)} courses hinted from {os.path.basename(path)}")
+        except Exception as e:
+            print(f"Warning load warm start: {e}")
+        return hint
+    
+    def _load_incumbent(self, path: str) -> dict:
+        """Đọc file JSON do _save_incumbent ghi -> {MaHP nội bộ: (d, c)}"""
+        hint = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            ngay_to_d = {pd.Timestamp(ngay).normalize(): d for d, ngay in self.map_ngay.items()}
+            for mahp, slot in data.get("schedule", {}).items():
+                d = ngay_to_d.get(pd.Timestamp(datetime.strptime(slot["Ngay"], "%d/%m/%Y")))
+                if d is not None and slot["Ca"] in self.ca_thi and mahp in self.phong_theo_mon:
+                    hint[mahp] = (d, int(slot["Ca"]))
+            print(f"   [Warm start] {len(hint)} courses hinted from {os.path.basename(path)} ({data.get('phase')})")
+        except Exception as e:
+            print(f"Warning load incumbent: {e}")
+        return hint
+    
     def solve(self) -> SchedulerResult:
         """Chạy solver xếp lịch 3 giai đoạn"""
         if not self.data_loaded:
             return SchedulerResult(status="ERROR", error="Data not loaded")
-            
+        
+        # Thống kê trả về trong SchedulerResult.stats
+        t_bat_dau = time.time()
+        stages = {}  # Bước -> thời gian (giây)
+        phases = []  # Thống kê từng phase (_thong_ke_phase)
+        stats = {"stages": stages, "phases": phases}
+        
+        def ket_thuc_buoc(ten, t):
+            stages[ten] = round(time.time() - t, 3)
+            return time.time()
+        
         try:
+            t_buoc = t_bat_dau
+            if self.config.presolve_check:
+                analysis = self.analyze_feasibility()
+                stats["analysis"] = analysis
+                for w in analysis["warnings"]:
+                    print(f"   ⚠️ {w['message']}")
+                t_buoc = ket_thuc_buoc("analyze", t_buoc)
+                if not analysis["feasible"]:
+                    for e in analysis["errors"]:
+                        print(f"   ❌ {e['message']}")
+                    stats["total_time"] = round(time.time() - t_bat_dau, 3)
+                    return SchedulerResult(
+                        status="INFEASIBLE",
+                        error="; ".join(e["message"] for e in analysis["errors"]),
+                        stats=stats
+                    )
+            
              # 0. CHIA MÔN LỚN THÀNH 2 NGÀY (Logic from test.py)
-            NGUONG_CHIA_TO = 25
             self.split_courses = {}  # Reset
+            self._incumbent_saved = None
+            self.lns_stats = {}
             split_courses = {}  # Local var for easy access
 
             print("\n CHECK LARGE EXAM GROUPS (> 25):")
@@ -586,16 +1533,14 @@ class ExamScheduler:
                     new_sv_to_mon[masv] = replace_split_courses(mon_list, split_courses)
                 self.sv_to_mon = new_sv_to_mon
                 
+                # Update conflict graph
+                self.conflict_graph = self.conflict_graph.with_split_courses(split_courses)
+                
                 print(f"   Updated constraints with {len(split_courses)} split courses")
 
             # 1. Phân loại môn
-            mon_count = defaultdict(int)
-            for mon_list in self.ctdt_khoa_to_mon.values():
-                for m in mon_list:
-                    mon_count[m] += 1
-            
-            # Phase 1: Môn Chung
-            ds_mon_chung = [m for m in self.ds_mahp_thi if mon_count[m] > 1]
+            # Phase 1: Môn Chung (thuộc nhiều CTĐT-Khóa)
+            ds_mon_chung = [m for m in self.ds_mahp_thi if self.conflict_graph.cohort_count(m) > 1]
             ds_mon_phase1 = ds_mon_chung
             
             # Phase 2: Môn Riêng Ưu Tiên
@@ -620,20 +1565,65 @@ class ExamScheduler:
                 ds_toan_bo_mon = replace_split_courses(ds_toan_bo_mon, split_courses)
 
             print(f"Stats Plan: P1={len(ds_mon_phase1)}, P2={len(ds_mon_phase2)}, Total={len(ds_toan_bo_mon)}")
+            stats.update(
+                so_mon=len(ds_toan_bo_mon),
+                so_mon_phase1=len(ds_mon_phase1),
+                so_mon_phase2=len(ds_mon_phase2),
+                so_mon_chia=len(split_courses),
+            )
+            
+            # Gợi ý từ lần chạy trước (nếu có)
+            warm_start = self._load_warm_start(self.config.warm_start_file)
+            stats["warm_start_courses"] = len(warm_start)
+            stats["engine"] = self.config.engine
+            t_buoc = ket_thuc_buoc("prepare", t_buoc)
+            
+            if self.config.heuristic_warm_start and self.config.engine != "heuristic":
+                # Lịch heuristic cho toàn bộ môn (môn PHASE 2 trong số ngày ưu tiên), lịch cũ được ưu tiên hơn
+                heuristic = HeuristicScheduler(self)
+                ngay_uu_tien = list(range(1, len(self.ngay_thi) + 1))[:max_days_phase2]
+                goi_y = heuristic.schedule(
+                    ds_toan_bo_mon,
+                    time_limit=self.config.heuristic_time_limit,
+                    allowed_days={m: ngay_uu_tien for m in ds_mon_phase2},
+                    hint_schedule=warm_start
+                ) or {}
+                warm_start = {**goi_y, **warm_start}
+                stats["heuristic_warm_start"] = {k: v for k, v in heuristic.stats.items() if k != "penalties"}
+                t_buoc = ket_thuc_buoc("heuristic_warm_start", t_buoc)
+            
+            if self.config.engine == "heuristic":
+                run_phase_impl = HeuristicScheduler(self).run_phase
+            elif self.config.decompose:
+                run_phase_impl = self._run_solver_phase_decomposed
+            else:
+                run_phase_impl = self._run_solver_phase
+            
+            def run_phase(phase_name, ds_mon, **kwargs):
+                """Chạy 1 phase + ghi thống kê vào stats["phases"]"""
+                self.last_phase_result = {}
+                t_phase = time.time()
+                schedule = run_phase_impl(phase_name, ds_mon, **kwargs)
+                phases.append(self._thong_ke_phase(phase_name, ds_mon, kwargs.get("fixed_schedule"), time.time() - t_phase))
+                return schedule
             
             # --- PHASE 1: Môn Chung ---
-            schedule_phase1 = self._run_solver_phase(
+            schedule_phase1 = run_phase(
                 "PHASE 1 (Môn chung)",
                 ds_mon_phase1,
                 fixed_schedule=None,
                 time_limit=self.config.solver_timeout,
                 prioritize_early=False,
                 relax_same_day=True,  # CRITICAL: Enable soft constraints to prevent INFEASIBLE
-                distribute_uniformly=True # Load Balancing enabled
+                distribute_uniformly=True, # Load Balancing enabled
+                hint_schedule=warm_start
             )
             
+            t_buoc = ket_thuc_buoc("phase1", t_buoc)
+            
             if schedule_phase1 is None:
-                return SchedulerResult(status="INFEASIBLE", error="Cannot schedule Phase 1 (Common)")
+                stats["total_time"] = round(time.time() - t_bat_dau, 3)
+                return SchedulerResult(status="INFEASIBLE", error="Cannot schedule Phase 1 (Common)", stats=stats)
                 
             # --- PHASE 2: Ưu Tiên ---
             schedule_phase2 = schedule_phase1.copy()
@@ -643,7 +1633,7 @@ class ExamScheduler:
                 DAYS = list(range(1, len(self.ngay_thi) + 1))
                 restricted_days = DAYS[:max_days_phase2]
                 
-                schedule_p2_result = self._run_solver_phase(
+                schedule_p2_result = run_phase(
                     "PHASE 2 (Ưu tiên)",
                     ds_mon_phase2,
                     fixed_schedule=schedule_phase1,
@@ -651,29 +1641,49 @@ class ExamScheduler:
                     restricted_days=restricted_days,
                     prioritize_early=True,
                     relax_same_day=True,
-                    distribute_uniformly=False # Phase 2 vẫn ưu tiên sớm trong 5 ngày đầu
+                    distribute_uniformly=False, # Phase 2 vẫn ưu tiên sớm trong 5 ngày đầu
+                    hint_schedule=warm_start
                 )
                 
                 if schedule_p2_result:
                     schedule_phase2.update(schedule_p2_result)
                 else:
                     print(" [Warning] Phase 2 fail match. Merge to Phase 3.")
+                t_buoc = ket_thuc_buoc("phase2", t_buoc)
             
             # --- PHASE 3: Toàn bộ (Rải đều) ---
             final_schedule_input = schedule_phase2
             
-            schedule_final = self._run_solver_phase(
+            schedule_final = run_phase(
                 "PHASE 3 (Toàn bộ - Rải đều)",
                 ds_toan_bo_mon,
                 fixed_schedule=final_schedule_input,
                 time_limit=int(self.config.solver_timeout * 1.5),
                 prioritize_early=False,
                 relax_same_day=True, # FIX: Enable soft constraints for final phase
-                distribute_uniformly=True # Load Balancing enabled
+                distribute_uniformly=True, # Load Balancing enabled
+                hint_schedule=warm_start
             )
             
+            t_buoc = ket_thuc_buoc("phase3", t_buoc)
+            
             if not schedule_final:
-                 return SchedulerResult(status="INFEASIBLE", error="Cannot schedule Phase 3 (Full)")
+                 stats["total_time"] = round(time.time() - t_bat_dau, 3)
+                 return SchedulerResult(status="INFEASIBLE", error="Cannot schedule Phase 3 (Full)", stats=stats)
+            stats["objective"] = self.last_phase_result.get("objective")
+            
+            # --- LNS: cải thiện sau PHASE 3 (tùy chọn) ---
+            if self.config.lns_time_limit > 0:
+                schedule_final = self._improve_lns(
+                    schedule_final,
+                    ds_toan_bo_mon,
+                    objective=self.last_phase_result.get("objective"),
+                    time_budget=self.config.lns_time_limit,
+                    locked=set(schedule_phase1) | set(schedule_p2_result or {})
+                )
+                stats["lns"] = dict(self.lns_stats)
+                stats["objective"] = self.lns_stats.get("objective")
+                t_buoc = ket_thuc_buoc("lns", t_buoc)
             
             # --- XỬ LÝ KẾT QUẢ ---
             records = []
@@ -705,49 +1715,55 @@ class ExamScheduler:
                     actual_to = to + start_offset
                     slot_assignments[(ngay, c)].append((mahp_output, mahp, actual_to))
             
-            # Gán phòng
+            # Gán phòng: mỗi slot, tổ đông SV trước vào phòng trống đúng loại vừa đủ SucChua
+            room_index = RoomIndex(
+                self.phong_kha_dung,
+                self.exam_config.loai_phong if self.exam_config is not None else {},
+                self.suc_chua_phong
+            )
+            so_sv_to = self.df_sv_to_thi.groupby(["MaHP", "ToThi"]).size().to_dict()
+            van_de_phong = []
             for (ngay, ca), to_list in slot_assignments.items():
-                # Tách theo loại phòng (dùng mahp_internal để tra cứu loại phòng)
-                to_list_ph = [(mout, mint, to) for mout, mint, to in to_list if self.phong_theo_mon.get(mint, {}).get("PhongThi", "PH") == "PH"]
-                to_list_pm = [(mout, mint, to) for mout, mint, to in to_list if self.phong_theo_mon.get(mint, {}).get("PhongThi", "PH") == "PM"]
-
-                # Sắp xếp
-                to_list_ph.sort(key=lambda x: (x[0], x[2]))
-                to_list_pm.sort(key=lambda x: (x[0], x[2]))
-
-                # PHONG LISTS
-                PHONG_PH = [p for p in self.phong_kha_dung if p.startswith("PH")]
-                PHONG_PM = [p for p in self.phong_kha_dung if p.startswith("PM")]
-                
-                def assign_rooms(item_list, room_list, fallback_list):
-                    for idx, (mout, mint, to) in enumerate(item_list):
-                        if room_list:
-                            phong = room_list[idx % len(room_list)]
-                        else:
-                            phong = fallback_list[idx % len(fallback_list)]
-                        records.append({
-                            "MaHP": mout,
-                            "ToThi": to,
-                            "Ngay": ngay,
-                            "Ca": ca,
-                            "PhongThi": phong
-                        })
-
-                assign_rooms(to_list_ph, PHONG_PH, self.phong_kha_dung)
-                assign_rooms(to_list_pm, PHONG_PM, self.phong_kha_dung)
+                loai_to = {
+                    (mout, to): self.phong_theo_mon.get(mint, {}).get("PhongThi", "PH")
+                    for mout, mint, to in to_list
+                }
+                assigned, problems = room_index.allocate(
+                    (ngay, ca),
+                    [(key, so_sv_to.get(key, 0), loai) for key, loai in loai_to.items()]
+                )
+                van_de_phong.extend(problems)
+                for mout, to in sorted(loai_to, key=lambda key: (loai_to[key], key)):
+                    records.append({
+                        "MaHP": mout,
+                        "ToThi": to,
+                        "Ngay": ngay,
+                        "Ca": ca,
+                        "PhongThi": assigned.get((mout, to), "")
+                    })
+            stats["rooms"] = {
+                "thieu_phong": sum(1 for p in van_de_phong if p["reason"] == "thieu_phong"),
+                "thieu_suc_chua": sum(1 for p in van_de_phong if p["reason"] == "thieu_suc_chua"),
+            }
+            if van_de_phong:
+                print(f"   ⚠️ Gán phòng: {stats['rooms']['thieu_phong']} tổ không còn phòng, "
+                      f"{stats['rooms']['thieu_suc_chua']} tổ vượt sức chứa phòng")
             
             # Tạo records_sv
             records_sv = [] 
+            ket_thuc_buoc("records", t_buoc)
+            stats["total_time"] = round(time.time() - t_bat_dau, 3)
             
             return SchedulerResult(
                 status="OPTIMAL",
                 records=records,
                 records_sv=records_sv,
-                stats={"msg": "Schedule Success (3 Phases)"}
+                stats={"msg": "Schedule Success (3 Phases)", **stats}
             )
             
         except Exception as e:
-            return SchedulerResult(status="ERROR", error=str(e))
+            stats["total_time"] = round(time.time() - t_bat_dau, 3)
+            return SchedulerResult(status="ERROR", error=str(e), stats=stats)
     
     def export_to_excel(self, result: SchedulerResult, output_path: str) -> dict:
         """Xuất kết quả ra file Excel"""
@@ -756,13 +1772,9 @@ class ExamScheduler:
             
         try:
             df_kq = pd.DataFrame(result.records)
-            df_kq["Slot"] = 0
-            
-            for (ngay, ca), df_sub in df_kq.groupby(["Ngay", "Ca"]):
-                df_sub = df_sub.sort_values(["MaHP", "ToThi"])
-                for idx, i in enumerate(df_sub.index, start=1):
-                    df_kq.loc[i, "Slot"] = idx
-            
+            df_kq["Slot"] = danh_so_slot(df_kq)
+            num_violations = 0
+
             with pd.ExcelWriter(output_path, engine="xlsxwriter") as writer:
                 # Format date column as dd/mm/yyyy
                 df_kq_export = df_kq.copy()
@@ -782,27 +1794,10 @@ class ExamScheduler:
                         how="left"
                     )
                     
-                    violations = []
-                    for (ctdt, khoa), group in df_kq_ctdt.groupby(["CTDT", "Khoa"]):
-                        if pd.isna(ctdt) or pd.isna(khoa):
-                            continue
-                        ngay_list = sorted(group["Ngay"].unique())
-                        for i in range(len(ngay_list) - 1):
-                            d1, d2 = ngay_list[i], ngay_list[i+1]
-                            if (d2 - d1).days == 1:
-                                mon_d1 = group[group["Ngay"] == d1]["MaHP"].unique()
-                                mon_d2 = group[group["Ngay"] == d2]["MaHP"].unique()
-                                violations.append({
-                                    "CTDT": ctdt,
-                                    "Khoa": khoa,
-                                    "Ngay1": d1,
-                                    "Mon_Ngay1": ", ".join(mon_d1),
-                                    "Ngay2": d2,
-                                    "Mon_Ngay2": ", ".join(mon_d2)
-                                })
-                    
-                    if violations:
-                        df_violations = pd.DataFrame(violations)
+                    df_violations = tim_vi_pham_lien_ngay(df_kq_ctdt)
+                    num_violations = len(df_violations)
+
+                    if num_violations:
                         df_violations.to_excel(
                             writer,
                             sheet_name="ViPham_LienNgay",
@@ -812,103 +1807,110 @@ class ExamScheduler:
             return {
                 "success": True,
                 "path": output_path,
-                "num_violations": len(violations) if 'violations' in dir() else 0
+                "num_violations": num_violations
             }
             
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    def export_student_list(self, result: SchedulerResult, output_path: str) -> dict:
-        """Xuất danh sách sinh viên thi theo mẫu"""
+    def export_student_list(self, result: SchedulerResult, output_path: str, partition_by: Optional[str] = None) -> dict:
+        """
+        Xuất danh sách sinh viên thi theo mẫu.
+        
+        partition_by: None = 1 sheet DanhSachSVThi | "day" = mỗi ngày thi 1 sheet | "room" = mỗi phòng 1 sheet
+        Merge / định dạng / ghi lần lượt từng (Ngay, Ca): bảng xuất đầy đủ không bao giờ nằm trong bộ nhớ.
+        """
         if not result.records or self.df_sv_to_thi is None:
             return {"success": False, "error": "Không có dữ liệu để xuất"}
+        cot_chia_sheet = {None: None, "day": "Ngày thi", "room": "Phòng thi"}
+        if partition_by not in cot_chia_sheet:
+            return {"success": False, "error": f"partition_by không hợp lệ: {partition_by!r} (None, 'day' hoặc 'room')"}
         
         try:
-            df_kq = pd.DataFrame(result.records)
-            
-            # Merge df_sv_to_thi với kết quả xếp lịch
-            df_sv_lich_thi = self.df_sv_to_thi.merge(
-                df_kq[["MaHP", "ToThi", "Ngay", "Ca", "PhongThi"]],
-                on=["MaHP", "ToThi"],
-                how="left"
-            )
+            df_kq = pd.DataFrame(result.records)[["MaHP", "ToThi", "Ngay", "Ca", "PhongThi"]]
             
-            # Merge với thông tin môn học
+            # Bảng phụ dùng chung cho mọi slot (kích thước theo số môn / số SV, không theo số lượt thi)
             if "TenMH" in self.df_lhp.columns and "SoTC" in self.df_lhp.columns:
-                df_sv_lich_thi = df_sv_lich_thi.merge(
-                    self.df_lhp[["MaHP", "TenMH", "SoTC"]].drop_duplicates(),
-                    on="MaHP",
-                    how="left"
-                )
+                df_mon = self.df_lhp[["MaHP", "TenMH", "SoTC"]].drop_duplicates()
             else:
-                df_sv_lich_thi["TenMH"] = ""
-                df_sv_lich_thi["SoTC"] = ""
-            
-            # Merge với thông tin sinh viên đầy đủ
-            if "Lop" in self.df_sv.columns:
-                df_sv_full = self.df_sv[["MaSV", "Lop"]].drop_duplicates()
-                df_sv_lich_thi = df_sv_lich_thi.merge(
-                    df_sv_full,
-                    on="MaSV",
-                    how="left"
-                )
-            else:
-                df_sv_lich_thi["Lop"] = ""
-            
-            # Tách Họ đệm và Tên
-            def tach_ho_ten(ten_full):
-                if pd.isna(ten_full):
-                    return "", ""
-                parts = str(ten_full).strip().split()
-                if len(parts) == 0:
-                    return "", ""
-                elif len(parts) == 1:
-                    return "", parts[0]
+                df_mon = None
+            df_sv_full = self.df_sv[["MaSV", "Lop"]].drop_duplicates() if "Lop" in self.df_sv.columns else None
+            
+            # Dòng SV thi của từng (Ngay, Ca); tổ thi chưa có lịch -> nhóm None
+            vi_tri_to = self.df_sv_to_thi.groupby(["MaHP", "ToThi"], sort=False, dropna=False).indices
+            slot_to = {}
+            for (mahp, to), (ngay, ca) in df_kq.groupby(["MaHP", "ToThi"], sort=False)[["Ngay", "Ca"]].first().iterrows():
+                slot_to[(mahp, to)] = (ngay, ca)
+            dong_theo_slot = defaultdict(list)
+            for key, idx in vi_tri_to.items():
+                dong_theo_slot[slot_to.get(key)].append(idx)
+            
+            def thu_tu_slot(slot):
+                # Cùng thứ tự sort_values(["Ngày thi", "Giờ thi"]) trên chuỗi dd/mm/yyyy
+                if slot is None:
+                    return ("", True, "")
+                gio = self.CA_TO_GIO.get(slot[1])
+                return (pd.Timestamp(slot[0]).strftime("%d/%m/%Y"), gio is None, str(gio))
+            
+            def xuat_slot(slot):
+                """Merge + định dạng chỉ các dòng SV của 1 slot"""
+                df_sv_lich_thi = self.df_sv_to_thi.iloc[np.concatenate(dong_theo_slot[slot])]
+                df_kq_slot = df_kq if slot is None else df_kq[(df_kq["Ngay"] == slot[0]) & (df_kq["Ca"] == slot[1])]
+                df_sv_lich_thi = df_sv_lich_thi.merge(df_kq_slot, on=["MaHP", "ToThi"], how="left")
+                
+                # Merge với thông tin môn học
+                if df_mon is not None:
+                    df_sv_lich_thi = df_sv_lich_thi.merge(df_mon, on="MaHP", how="left")
                 else:
-                    return " ".join(parts[:-1]), parts[-1]
-            
-            df_sv_lich_thi["HoDem"] = df_sv_lich_thi["Ten"].apply(lambda x: tach_ho_ten(x)[0])
-            df_sv_lich_thi["TenSV"] = df_sv_lich_thi["Ten"].apply(lambda x: tach_ho_ten(x)[1])
-            
-            # Tạo các cột theo mẫu
-            df_sv_lich_thi["MaHP_Full"] = df_sv_lich_thi["MaHP"].apply(lambda x: f"251{x}" if pd.notna(x) else "")
-            df_sv_lich_thi["GioThi"] = df_sv_lich_thi["Ca"].map(self.CA_TO_GIO)
-            df_sv_lich_thi["NgayThi_Str"] = df_sv_lich_thi["Ngay"].apply(
-                lambda x: x.strftime("%d/%m/%Y") if pd.notna(x) else ""
-            )
-            
-            # Tạo DataFrame xuất theo mẫu
-            df_export_sv = pd.DataFrame({
-                "Mã MH": df_sv_lich_thi["MaHP"],
-                "Mã HP": df_sv_lich_thi["MaHP_Full"],
-                "Tên môn": df_sv_lich_thi["TenMH"],
-                "Số TC": df_sv_lich_thi["SoTC"],
-                "Đợt thi": 1,
-                "Nhóm thi": 1,
-                "Tổ thi": df_sv_lich_thi["ToThi"],
-                "Ngày thi": df_sv_lich_thi["NgayThi_Str"],
-                "Giờ thi": df_sv_lich_thi["GioThi"],
-                "Phòng thi": df_sv_lich_thi["PhongThi"],
-                "Mã SV": df_sv_lich_thi["MaSV"],
-                "Họ đệm": df_sv_lich_thi["HoDem"],
-                "Tên": df_sv_lich_thi["TenSV"],
-                "Lớp": df_sv_lich_thi["Lop"],
-                "Ghi chú": "",
-                "Lần thi": 1
-            })
-            
-            # Sắp xếp theo ngày, ca, phòng, tên
-            df_export_sv = df_export_sv.sort_values(
-                ["Ngày thi", "Giờ thi", "Phòng thi", "Tên", "Họ đệm"]
+                    df_sv_lich_thi["TenMH"] = ""
+                    df_sv_lich_thi["SoTC"] = ""
+                
+                # Merge với thông tin sinh viên đầy đủ
+                if df_sv_full is not None:
+                    df_sv_lich_thi = df_sv_lich_thi.merge(df_sv_full, on="MaSV", how="left")
+                else:
+                    df_sv_lich_thi["Lop"] = ""
+                
+                # Tách Họ đệm và Tên
+                ho_dem, ten_sv = tach_ho_ten(df_sv_lich_thi["Ten"])
+                ngay_thi = pd.to_datetime(df_sv_lich_thi["Ngay"]).dt.strftime("%d/%m/%Y").fillna("")
+                
+                # Tạo DataFrame xuất theo mẫu
+                df_export_sv = pd.DataFrame({
+                    "Mã MH": df_sv_lich_thi["MaHP"],
+                    "Mã HP": ("251" + df_sv_lich_thi["MaHP"].astype(str)).where(df_sv_lich_thi["MaHP"].notna(), ""),
+                    "Tên môn": df_sv_lich_thi["TenMH"],
+                    "Số TC": df_sv_lich_thi["SoTC"],
+                    "Đợt thi": 1,
+                    "Nhóm thi": 1,
+                    "Tổ thi": df_sv_lich_thi["ToThi"],
+                    "Ngày thi": ngay_thi,
+                    "Giờ thi": df_sv_lich_thi["Ca"].map(self.CA_TO_GIO),
+                    "Phòng thi": df_sv_lich_thi["PhongThi"],
+                    "Mã SV": df_sv_lich_thi["MaSV"],
+                    "Họ đệm": ho_dem,
+                    "Tên": ten_sv,
+                    "Lớp": df_sv_lich_thi["Lop"],
+                    "Ghi chú": "",
+                    "Lần thi": 1
+                })
+                
+                # Sắp xếp theo phòng, tên (ngày, ca đã theo thứ tự slot)
+                return df_export_sv.sort_values(["Ngày thi", "Giờ thi", "Phòng thi", "Tên", "Họ đệm"])
+            
+            # Xuất file: mỗi lần chỉ 1 slot nằm trong bộ nhớ, ghi dòng theo dòng
+            partition_col = cot_chia_sheet[partition_by]
+            total_rows = ghi_excel_stream(
+                output_path,
+                (xuat_slot(slot) for slot in sorted(dong_theo_slot, key=thu_tu_slot)),
+                sheet_name="DanhSachSVThi",
+                partition_col=partition_col
             )
             
-            # Xuất file
-            df_export_sv.to_excel(output_path, index=False, sheet_name="DanhSachSVThi")
-            
             return {
                 "success": True,
                 "path": output_path,
-                "total_rows": len(df_export_sv)
+                "total_rows": total_rows
             }
             
         except Exception as e:
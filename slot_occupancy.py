@@ -0,0 +1,151 @@
+"""
+Slot Occupancy Module - Chỉ số SV × (Ngày, Ca) để kiểm tra trùng lịch khi chuyển tổ thi
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+
+from input_cache import file_hash, read_excel_cached
+from schedule_store import ScheduleStore, ngay_key, slot_key
+
+
+class StudentSlotIndex:
+    """
+    Chỉ số dùng cho /api/schedule/batch-update.
+
+    - Theo danh sách SV (dựng lại khi file SV đổi): môn -> mảng mã SV (CSR), SV -> các môn.
+    - Theo phiên bản lịch (ScheduleStore.version): mỗi (Ngay, Ca) và mỗi Ngay -> số môn của SV
+      trong đó (mảng đếm theo SV), dựng lười cho từng ô và bỏ khi lịch đổi.
+
+    Kiểm tra 1 lần chuyển = phép giao giữa SV của các môn đang chuyển và ô đích;
+    chỉ những SV thực sự trùng mới được duyệt để lấy chi tiết.
+    Giữ ngữ nghĩa cũ: SV học môn X bị coi là thi ở mọi ô có tổ thi của X.
+    """
+
+    def __init__(self, store: ScheduleStore):
+        self.store = store
+        self._sv_key = None
+        self._version = None
+        self.students = np.array([], dtype=object)  # id -> MaSV
+        self.course_index: Dict[str, int] = {}
+        self.course_indptr = np.zeros(1, dtype=np.int64)
+        self.course_students = np.array([], dtype=np.int64)
+        self.student_courses: List[List[str]] = []
+        self._slot_courses: Dict[Tuple[str, int], Dict[str, int]] = {}
+        self._day_courses: Dict[str, Dict[str, Tuple[int, int]]] = {}
+        self._occupancy: Dict[object, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Dựng chỉ số
+    # ------------------------------------------------------------------
+    def load_students(self, df_sv: pd.DataFrame, key=None):
+        """df_sv: cột MaSV, MaHP (đã chuẩn hóa). key: định danh phiên bản file SV (bỏ qua nếu trùng lần trước)"""
+        if key is not None and key == self._sv_key:
+            return
+        pairs = df_sv[["MaSV", "MaHP"]].drop_duplicates()
+        sv_codes, self.students = pd.factorize(pairs["MaSV"])
+        hp_codes, courses = pd.factorize(pairs["MaHP"])
+        self.course_index = {m: i for i, m in enumerate(courses)}
+
+        order = np.lexsort((sv_codes, hp_codes))
+        self.course_students = sv_codes[order].astype(np.int64)
+        self.course_indptr = np.zeros(len(courses) + 1, dtype=np.int64)
+        self.course_indptr[1:] = np.cumsum(np.bincount(hp_codes, minlength=len(courses)))
+
+        self.student_courses = [[] for _ in range(len(self.students))]
+        for sv, mahp in zip(sv_codes, pairs["MaHP"]):
+            self.student_courses[sv].append(mahp)
+
+        self._sv_key = key
+        self._occupancy = {}
+
+    def load_student_file(self, sv_path: str):
+        """Dựng chỉ số SV từ danhsachSV.xlsx (chỉ khi nội dung file đổi)"""
+        key = file_hash(sv_path)
+        with self._lock:
+            if key != self._sv_key:
+                self.load_students(read_excel_cached(sv_path, normalize="sv"), key=key)
+
+    def _students_of(self, mahp: str) -> np.ndarray:
+        i = self.course_index.get(mahp)
+        if i is None:
+            return self.course_students[:0]
+        return self.course_students[self.course_indptr[i]:self.course_indptr[i + 1]]
+
+    def _refresh_schedule(self):
+        """Ô (Ngay, Ca) / Ngay -> môn có tổ thi trong đó (tổ thi đầu tiên theo thứ tự dòng lịch)"""
+        if self._version == self.store.version:
+            return
+        slot_courses, day_courses = {}, {}
+        for row in self.store.records():
+            if row["Ngay"] is None or row["Ca"] is None:
+                continue
+            mahp, tothi, ca = row["MaHP"], int(row["ToThi"]), int(row["Ca"])
+            slot_courses.setdefault(slot_key(row["Ngay"], ca), {}).setdefault(mahp, tothi)
+            day_courses.setdefault(ngay_key(row["Ngay"]), {}).setdefault(mahp, (tothi, ca))
+        self._slot_courses, self._day_courses = slot_courses, day_courses
+        self._occupancy = {}
+        self._version = self.store.version
+
+    def _occupancy_of(self, key, courses) -> np.ndarray:
+        """Số môn (trong courses) của mỗi SV - dựng 1 lần cho mỗi ô / ngày trong 1 phiên bản lịch"""
+        occ = self._occupancy.get(key)
+        if occ is None:
+            occ = np.zeros(len(self.students), dtype=np.int32)
+            for mahp in courses:
+                occ[self._students_of(mahp)] += 1
+            self._occupancy[key] = occ
+        return occ
+
+    # ------------------------------------------------------------------
+    # Kiểm tra
+    # ------------------------------------------------------------------
+    def _conflicts(self, key, courses: dict, moving: Dict[str, int]) -> Tuple[int, List[tuple]]:
+        """
+        (tổng số xung đột, [(MaSV, moving_MaHP, moving_ToThi, conflict_MaHP, thông tin tổ xung đột)])
+        giữa SV của các môn moving và các môn khác trong courses.
+        """
+        occ = self._occupancy_of(key, courses).copy()
+        for mahp in moving:
+            if mahp in courses:
+                occ[self._students_of(mahp)] -= 1  # Môn đang chuyển không tính là xung đột
+
+        moving_sv = np.unique(np.concatenate([self._students_of(m) for m in moving] or [self.course_students[:0]]))
+        hit = moving_sv[occ[moving_sv] > 0]
+        if not len(hit):
+            return 0, []
+
+        details = []
+        for sv in hit:
+            mon_sv = self.student_courses[sv]
+            others = [m for m in mon_sv if m in courses and m not in moving]
+            for moving_mahp in (m for m in mon_sv if m in moving):
+                for conflict_mahp in others:
+                    details.append((self.students[sv], moving_mahp, moving[moving_mahp], conflict_mahp, courses[conflict_mahp]))
+        return len(details), details
+
+    def check_shift(self, moving: Dict[str, int], ngay, ca) -> Tuple[int, List[dict]]:
+        """Xung đột cùng ca (chặn cứng). moving: {MaHP: ToThi}"""
+        key = slot_key(ngay, ca)
+        with self._lock:
+            self._refresh_schedule()
+            total, details = self._conflicts(key, self._slot_courses.get(key, {}), moving)
+        return total, [
+            {'MaSV': sv, 'moving_MaHP': m, 'moving_ToThi': to, 'conflict_MaHP': c, 'conflict_ToThi': c_to}
+            for sv, m, to, c, c_to in details
+        ]
+
+    def check_day(self, moving: Dict[str, int], ngay) -> Tuple[int, List[dict]]:
+        """Xung đột cùng ngày (cảnh báo). moving: {MaHP: ToThi}"""
+        key = ngay_key(ngay)
+        with self._lock:
+            self._refresh_schedule()
+            total, details = self._conflicts(key, self._day_courses.get(key, {}), moving)
+        return total, [
+            {'MaSV': sv, 'moving_MaHP': m, 'moving_ToThi': to, 'conflict_MaHP': c,
+             'conflict_ToThi': c_to, 'conflict_Ca': c_ca}
+            for sv, m, to, c, (c_to, c_ca) in details
+        ]
@@ -0,0 +1,251 @@
+"""
+Solve Jobs Module - Chạy xếp lịch nền (process riêng) và theo dõi tiến độ
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+
+from scheduler import ExamScheduler, SchedulerConfig
+
+JOB_END = "_job_end"  # Sự kiện cuối cùng worker đẩy vào queue (kèm kết quả job)
+
+
+def run_solve_job(job_id: str, paths: dict, config_kwargs: dict, result_folder: str, progress_queue) -> dict:
+    """
+    Worker (process con): đọc dữ liệu, xếp lịch, xuất 2 file kết quả.
+
+    Sự kiện tiến độ được đẩy vào progress_queue dạng (job_id, event).
+    Trả về dict giống response cũ của /api/solve.
+    """
+    def report(event):
+        progress_queue.put((job_id, event))
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    timings = {}  # Bước của job -> thời gian (giây)
+    t = time.time()
+    if config_kwargs.get('decompose'):
+        # Job đã chạy trong process pool của SolveJobManager: không mở thêm pool lồng bên trong
+        config_kwargs = dict(config_kwargs, decompose_workers=1)
+    try:
+        scheduler = ExamScheduler(SchedulerConfig(**config_kwargs))
+        scheduler.progress_callback = report
+
+        report({"event": "stage", "stage": "load_data"})
+        load_result = scheduler.load_data(**paths)
+        timings['load_data'] = round(time.time() - t, 3)
+        if not load_result['success']:
+            return {
+                'success': False,
+                'error': f'Lỗi đọc dữ liệu: {load_result.get("error", "Unknown")}'
+            }
+
+        report({"event": "stage", "stage": "solve"})
+        t = time.time()
+        result = scheduler.solve()
+        timings['solve'] = round(time.time() - t, 3)
+        if result.error:
+            response = {
+                'success': False,
+                'status': result.status,
+                'error': result.error,
+                'data_stats': load_result['stats'],
+                'solver_stats': result.stats,
+                'timings': timings,
+            }
+            response['stats_file'] = ghi_thong_ke(result_folder, timestamp, response)
+            return response
+
+        report({"event": "stage", "stage": "export"})
+        t = time.time()
+        output_filename = f'ket_qua_xep_lich_{timestamp}.xlsx'
+        export_result = scheduler.export_to_excel(result, os.path.join(result_folder, output_filename))
+        timings['export_to_excel'] = round(time.time() - t, 3)
+
+        t = time.time()
+        sv_filename = f'BangTongHopLichThiSinhVien_{timestamp}.xlsx'
+        sv_export_result = scheduler.export_student_list(result, os.path.join(result_folder, sv_filename))
+        timings['export_student_list'] = round(time.time() - t, 3)
+
+        response = {
+            'success': True,
+            'status': result.status,
+            'result_file': output_filename,
+            'student_file': sv_filename if sv_export_result.get('success') else None,
+            'num_records': len(result.records),
+            'num_student_records': sv_export_result.get('total_rows', 0),
+            'num_violations': export_result.get('num_violations', 0),
+            'data_stats': load_result['stats'],
+            'solver_stats': result.stats,
+            'timings': timings,
+        }
+        response['stats_file'] = ghi_thong_ke(result_folder, timestamp, response)
+        response['records'] = result.records[:500]  # Giới hạn 500 dòng để tránh quá tải
+        return response
+    except Exception as e:
+        return {'success': False, 'error': str(e), 'timings': timings}
+
+
+def _chay_job(job_id: str, paths: dict, config_kwargs: dict, result_folder: str, progress_queue) -> dict:
+    """Chạy run_solve_job rồi đẩy sự kiện JOB_END (kèm kết quả) - luôn là sự kiện cuối của job"""
+    result = {'success': False, 'error': 'Job dừng bất thường'}
+    try:
+        result = run_solve_job(job_id, paths, config_kwargs, result_folder, progress_queue)
+        return result
+    finally:
+        progress_queue.put((job_id, {"event": JOB_END, "result": result}))
+
+
+def ghi_thong_ke(result_folder: str, timestamp: str, response: dict) -> Optional[str]:
+    """Ghi thống kê lần chạy (data_stats, solver_stats, timings) cạnh file kết quả -> tên file"""
+    filename = f'ket_qua_xep_lich_{timestamp}.stats.json'
+    try:
+        with open(os.path.join(result_folder, filename), 'w', encoding='utf-8') as f:
+            json.dump({k: v for k, v in response.items() if k != 'records'}, f, ensure_ascii=False, indent=2, default=str)
+    except Exception as e:
+        print(f"Warning write stats: {e}")
+        return None
+    return filename
+
+
+class SolveJobManager:
+    """
+    Hàng đợi job xếp lịch.
+
+    - submit() trả về job_id ngay, job chạy trong ProcessPoolExecutor (max_workers job cùng lúc, còn lại xếp hàng).
+    - 1 thread nền đọc sự kiện tiến độ từ các process con và cập nhật trạng thái job.
+    - get() trả về trạng thái: queued / running / done / failed, tiến độ (phase, thời gian, objective, bound)
+      và kết quả khi xong. Job chỉ xong khi thread nền đã nhận hết sự kiện (JOB_END là sự kiện cuối).
+    - Job đã xong bị xóa sau JOB_TTL giây, tối đa giữ MAX_FINISHED_JOBS job đã xong.
+    """
+
+    MAX_EVENTS = 200  # Số sự kiện gần nhất giữ lại cho mỗi job
+    JOB_TTL = 3600  # Giây giữ job đã xong
+    MAX_FINISHED_JOBS = 50
+
+    def __init__(self, max_workers: int = 1):
+        self.max_workers = max_workers
+        self.jobs: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._queue = None
+
+    def _ensure_started(self):
+        """Tạo process pool + queue khi có job đầu tiên (tránh tạo trong process reloader của Flask)"""
+        if self._executor is not None:
+            return
+        self._manager = multiprocessing.Manager()
+        self._queue = self._manager.Queue()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        threading.Thread(target=self._drain_events, daemon=True).start()
+
+    def submit(self, paths: dict, config_kwargs: dict, result_folder: str) -> str:
+        with self._lock:
+            self._ensure_started()
+            self._don_dep()
+            job_id = uuid.uuid4().hex[:12]
+            self.jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "progress": {"stage": None, "phase": None, "objective": None, "bound": None, "solutions": 0},
+                "events": [],
+                "num_events": 0,
+                "result": None,
+            }
+        future = self._executor.submit(_chay_job, job_id, paths, config_kwargs, result_folder, self._queue)
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+        return job_id
+
+    def _drain_events(self):
+        while True:
+            try:
+                job_id, event = self._queue.get()
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                job = self.jobs.get(job_id)
+                if job is None or job["finished_at"]:
+                    continue
+                if event.get("event") == JOB_END:
+                    self._ket_thuc(job, event["result"])
+                    continue
+                if job["status"] == "queued":
+                    job["status"] = "running"
+                    job["started_at"] = time.time()
+                event = dict(event, seq=job["num_events"], elapsed=round(time.time() - job["started_at"], 2))
+                job["num_events"] += 1
+                job["events"] = (job["events"] + [event])[-self.MAX_EVENTS:]
+
+                progress = job["progress"]
+                kind = event.get("event")
+                if kind == "stage":
+                    progress["stage"] = event["stage"]
+                elif kind == "phase_start":
+                    progress.update(phase=event["phase"], objective=None, bound=None, solutions=0)
+                elif kind in ("solution", "phase_end"):
+                    progress["phase"] = event["phase"]
+                    for key in ("objective", "bound", "solutions", "status"):
+                        if key in event:
+                            progress[key] = event[key]
+
+    def _on_done(self, job_id: str, future):
+        """Chỉ xử lý process con chết giữa chừng (không đẩy được JOB_END); kết quả bình thường đi qua queue"""
+        try:
+            future.result()
+            return
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None and not job["finished_at"]:
+                self._ket_thuc(job, result)
+
+    def _ket_thuc(self, job: dict, result: dict):
+        """Đặt trạng thái cuối của job (gọi khi đang giữ _lock)"""
+        job["status"] = "done" if result.get("success") else "failed"
+        job["finished_at"] = time.time()
+        job["started_at"] = job["started_at"] or job["finished_at"]
+        job["result"] = result
+
+    def _don_dep(self):
+        """Xóa job đã xong quá JOB_TTL giây và job xong cũ nhất vượt MAX_FINISHED_JOBS (gọi khi đang giữ _lock)"""
+        now = time.time()
+        da_xong = sorted((j for j in self.jobs.values() if j["finished_at"]), key=lambda j: j["finished_at"])
+        for i, job in enumerate(da_xong):
+            if now - job["finished_at"] > self.JOB_TTL or i < len(da_xong) - self.MAX_FINISHED_JOBS:
+                del self.jobs[job["id"]]
+
+    def get(self, job_id: str, since: int = 0) -> Optional[dict]:
+        """Trạng thái job (chỉ kèm các sự kiện có seq >= since)"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            now = job["finished_at"] or time.time()
+            return {
+                "id": job["id"],
+                "status": job["status"],
+                "elapsed": round(now - job["started_at"], 2) if job["started_at"] else 0,
+                "progress": dict(job["progress"]),
+                "events": [e for e in job["events"] if e["seq"] >= since],
+                "num_events": job["num_events"],
+                "result": job["result"],
+            }
+
+    def list_jobs(self) -> list:
+        with self._lock:
+            self._don_dep()
+            return [
+                {"id": j["id"], "status": j["status"], "created_at": j["created_at"], "phase": j["progress"]["phase"]}
+                for j in sorted(self.jobs.values(), key=lambda j: j["created_at"], reverse=True)
+            ]
@@ -0,0 +1,12 @@
+"""
+Solver Constants - Hằng số dùng chung cho model CP-SAT (scheduler),
+engine heuristic và phân tích khả thi (feasibility)
+"""
+
+NGUONG_CHIA_TO = 25  # Môn > 25 tổ thi được chia 2 ngày (D1/D2)
+MIN_GAP_SPLIT = 2    # D2 cách D1 ít nhất 2 ngày
+
+# Hệ số phạt trong hàm mục tiêu
+HE_SO_SV_TRUNG_CA = 100000000   # Mỗi SV thi trùng ca
+HE_SO_TRUNG_NGAY = 10000000     # Mỗi môn vượt quá 1 môn/ngày của cùng CTĐT-Khóa
+HE_SO_SV_TRUNG_NGAY = 5000000   # Mỗi SV thi 2 môn/ngày
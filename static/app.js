@@ -178,7 +178,8 @@ async function runSolver() {
             headers: { 'Content-Type': 'application/json' }
         });
 
-        const data = await response.json();
+        const job = await response.json();
+        const data = job.success ? await waitForSolveJob(job.job_id) : job;
 
         elements.progressSection.style.display = 'none';
 
@@ -198,6 +199,36 @@ async function runSolver() {
     elements.btnSolve.disabled = false;
 }
 
+// Theo dõi job xếp lịch chạy nền, trả về kết quả khi job xong
+async function waitForSolveJob(jobId) {
+    const progressText = document.getElementById('progress-text');
+
+    while (true) {
+        const response = await fetch(`/api/solve/${jobId}?since=1000000000`);
+        const job = await response.json();
+        if (!job.success) return job;
+
+        if (job.status === 'done' || job.status === 'failed') {
+            return job.result || { success: false, error: 'Job thất bại' };
+        }
+
+        if (progressText) {
+            const p = job.progress || {};
+            let text = job.status === 'queued' ? 'Đang chờ trong hàng đợi...' : `${p.phase || p.stage || 'Đang xử lý'}`;
+            if (p.objective !== null && p.objective !== undefined) {
+                text += ` | objective: ${Math.round(p.objective)}`;
+                if (p.bound !== null && p.bound !== undefined) {
+                    text += ` | bound: ${Math.round(p.bound)}`;
+                }
+            }
+            text += ` | ${Math.round(job.elapsed)}s`;
+            progressText.textContent = text;
+        }
+
+        await new Promise(resolve => setTimeout(resolve, 2000));
+    }
+}
+
 function showResult(data) {
     elements.resultSection.style.display = 'block';
 
@@ -0,0 +1,180 @@
+"""
+Student Sync Module - Đồng bộ BangTongHopLichThiSinhVien_KetQua.xlsx theo lịch thi (tăng dần)
+
+- Bảng sinh viên nằm sẵn trong bộ nhớ, chỉ số (Mã HP, Tổ thi) -> các dòng.
+- Mỗi lần sửa lịch chỉ cập nhật dòng của các tổ thi bị thay đổi.
+- File Excel được ghi nền, gộp nhiều lần sửa liên tiếp (debounce).
+"""
+
+import os
+import time
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Optional, Tuple
+
+from scheduler import ghi_excel_stream
+
+CA_TO_GIO = {1: "07:00", 2: "09:30", 3: "13:00", 4: "15:30"}
+
+
+def _khoa_sv(df: pd.DataFrame) -> pd.DataFrame:
+    """Cột khóa (Mã HP, Tổ thi) đã chuẩn hóa như khi so với lịch thi"""
+    return pd.DataFrame({
+        "MaHP": df["Mã HP"].astype(str).str.strip(),
+        "ToThi": pd.to_numeric(df["Tổ thi"], errors="coerce").fillna(0).astype(int),
+    })
+
+
+class StudentFileSync:
+    """
+    Bản trong bộ nhớ của file danh sách SV thi + bộ ghi nền.
+
+    update(rows): cập nhật Ngày thi / Giờ thi / Phòng thi cho các tổ thi trong rows
+    (dòng lịch thi: MaHP, ToThi, Ngay, Ca, PhongThi[, GioThi]) rồi hẹn ghi file sau DEBOUNCE_SECONDS.
+    Sửa liên tục thì lần ghi bị lùi lại, nhưng không quá MAX_DELAY_SECONDS kể từ lần sửa đầu chưa ghi.
+    Ghi lỗi (vd file đang mở trong Excel) thì tự hẹn ghi lại, thời gian chờ tăng gấp đôi đến RETRY_MAX_SECONDS.
+    """
+
+    DEBOUNCE_SECONDS = 2.0
+    MAX_DELAY_SECONDS = 15.0
+    RETRY_MAX_SECONDS = 60.0
+
+    def __init__(self, path: str, debounce: float = None, max_delay: float = None):
+        self.path = path
+        self.debounce = self.DEBOUNCE_SECONDS if debounce is None else debounce
+        self.max_delay = self.MAX_DELAY_SECONDS if max_delay is None else max_delay
+        self.df: Optional[pd.DataFrame] = None
+        self.index: Dict[Tuple[str, int], np.ndarray] = {}
+        self._file_sig = None
+        self._dirty_since = None
+        self._timer: Optional[threading.Timer] = None
+        self._retry_delay = 0.0
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return [st.st_mtime_ns, st.st_size]
+
+    def exists(self) -> bool:
+        return self.df is not None or os.path.exists(self.path)
+
+    def replace(self, df: pd.DataFrame) -> int:
+        """Ghi df ra file (vd /api/export-students) và dùng luôn làm bản trong bộ nhớ. Trả về số dòng"""
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                so_dong = ghi_excel_stream(self.path, df)
+                self._set_df(df.reset_index(drop=True))
+                self._file_sig = self._stat()
+                self._dirty_since = None
+                self._retry_delay = 0.0
+        return so_dong
+
+    def _set_df(self, df: pd.DataFrame):
+        self.df = df
+        self.index = _khoa_sv(df).groupby(["MaHP", "ToThi"], sort=False).indices
+
+    def preload(self):
+        """Đọc sẵn file (chạy nền lúc khởi động server, để lần sửa đầu tiên không phải chờ)"""
+        try:
+            with self._lock:
+                self._ensure_loaded()
+        except Exception as e:
+            print(f"   ⚠️ Error loading student file: {e}")
+
+    def _ensure_loaded(self) -> bool:
+        if self._dirty_since is not None:
+            return True  # Bản trong bộ nhớ mới hơn file
+        sig = self._stat()
+        if sig is None:
+            return False
+        if self.df is None or sig != self._file_sig:
+            self._set_df(pd.read_excel(self.path))
+            self._file_sig = sig
+        return True
+
+    def group_sizes(self, keys: Iterable[Tuple[str, int]]) -> Dict[Tuple[str, int], int]:
+        """Số SV của từng tổ thi (MaHP, ToThi) theo bảng SV hiện tại (rỗng nếu chưa có file)"""
+        with self._lock:
+            if not self._ensure_loaded():
+                return {}
+            return {
+                (str(mahp).strip(), int(tothi)): len(self.index.get((str(mahp).strip(), int(tothi)), ()))
+                for mahp, tothi in keys
+            }
+
+    def update(self, rows: Iterable[dict]) -> int:
+        """Cập nhật các tổ thi trong rows. Trả về số dòng SV đã đổi"""
+        with self._lock:
+            if not self._ensure_loaded():
+                return 0
+            df = self.df
+            cols = {c: df.columns.get_loc(c) for c in ("Ngày thi", "Phòng thi", "Giờ thi") if c in df.columns}
+
+            updated = 0
+            for row in rows:
+                pos = self.index.get((str(row.get("MaHP", "")).strip(), int(row.get("ToThi") or 0)))
+                if pos is None or not len(pos):
+                    continue
+                gio = row.get("GioThi") or ""
+                if not gio and row.get("Ca"):
+                    gio = CA_TO_GIO.get(int(row["Ca"]), "")
+                values = {"Ngày thi": row.get("Ngay", ""), "Phòng thi": row.get("PhongThi", ""), "Giờ thi": gio}
+                for col, j in cols.items():
+                    df.iloc[pos, j] = values[col]
+                updated += len(pos)
+
+            if updated:
+                self._schedule_write()
+            return updated
+
+    def _schedule_write(self, delay: float = None):
+        now = time.monotonic()
+        if self._dirty_since is None:
+            self._dirty_since = now
+        if self._timer is not None:
+            if now - self._dirty_since >= self.max_delay:
+                return  # Đã chờ quá lâu: giữ hẹn ghi hiện tại
+            self._timer.cancel()
+        self._timer = threading.Timer(self.debounce if delay is None else delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        """Ghi bản trong bộ nhớ ra file (ghi file tạm rồi thay thế)"""
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if self._dirty_since is None or self.df is None:
+                    return
+                snapshot = self.df.copy()
+                self._dirty_since = None
+
+            tmp = f"{os.path.splitext(self.path)[0]}.tmp.xlsx"
+            try:
+                so_dong = ghi_excel_stream(tmp, snapshot)
+                os.replace(tmp, self.path)
+            except Exception as e:
+                print(f"   ⚠️ Error writing student file: {e}")
+                with self._lock:
+                    self._dirty_since = self._dirty_since or time.monotonic()
+                    self._retry_delay = min(self.RETRY_MAX_SECONDS, max(self._retry_delay * 2, self.debounce, 1.0))
+                    if self._timer is None:
+                        print(f"   🔁 Retrying in {self._retry_delay:.0f}s")
+                        self._schedule_write(self._retry_delay)
+                return
+
+            with self._lock:
+                self._retry_delay = 0.0
+                if self._dirty_since is None:
+                    self._file_sig = self._stat()
+            print(f"   ✅ Synced {so_dong} rows to {os.path.basename(self.path)}")
@@ -4,6 +4,8 @@ from itertools import combinations
 from collections import defaultdict
 import os
 
+from scheduler import rai_sv_vao_to_thi
+
 # Lấy thư mục hiện tại của file script
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -482,12 +484,6 @@ mon_sv = (
 # ======================
 # 3.3. RẢI SINH VIÊN VÀO TỔ THI (CHIA ĐỀU – ABC)
 # ======================
-ds_sv_to_thi = []
-
-# DEBUG: Track skipped students/courses
-skipped_courses = []
-skipped_students = 0
-
 # DEBUG: Compare courses between df_sv and phong_theo_mon
 sv_courses = set(df_sv["MaHP"].unique())
 lhp_courses = set(phong_theo_mon.keys())
@@ -524,51 +520,17 @@ if "SLSV" in df_lhp.columns:
         missing_detail = df_lhp_missing[["MaHP", "SLSV", "ToThi"]].drop_duplicates().head(22)
         print(missing_detail.to_string())
 
-for mahp, df_mhp in df_sv.groupby("MaHP"):
-    # Chỉ xử lý môn có trong danh sách thi
-    if mahp not in phong_theo_mon:
-        skipped_courses.append(mahp)
-        skipped_students += len(df_mhp)
-        continue
-
-    so_to = int(phong_theo_mon[mahp]["ToThi"])
-
-    # Sắp xếp SV theo tên ABC
-    df_mhp_sorted = (
-        df_mhp
-        .sort_values("Ten")
-        .reset_index(drop=True)
-    )
-
-    N = len(df_mhp_sorted)
-    if N == 0:
-        continue
-
-    base = N // so_to
-    du = N % so_to
-
-    start_idx = 0
-
-    for to in range(1, so_to + 1):
-        # Các tổ đầu được +1 SV nếu còn dư
-        so_sv_to = base + (1 if to <= du else 0)
-
-        df_to = df_mhp_sorted.iloc[start_idx:start_idx + so_sv_to]
-
-        for _, row in df_to.iterrows():
-            ds_sv_to_thi.append({
-                "MaSV": row["MaSV"],
-                "Ten": row["Ten"],
-                "MaHP": mahp,
-                "ToThi": to
-            })
+# Môn không có trong danh sách thi -> bỏ qua
+df_sv_skipped = df_sv[~df_sv["MaHP"].isin(phong_theo_mon.keys())]
+skipped_courses = sorted(df_sv_skipped["MaHP"].unique())
+skipped_students = len(df_sv_skipped)
 
-        start_idx += so_sv_to
+# Các tổ đầu được +1 SV nếu còn dư (xem scheduler.rai_sv_vao_to_thi)
+df_sv_to_thi = rai_sv_vao_to_thi(df_sv, phong_theo_mon)
 
 # ======================
 # 3.4. DataFrame kết quả rải SV
 # ======================
-df_sv_to_thi = pd.DataFrame(ds_sv_to_thi)
 print(df_sv_to_thi)
 
 # DEBUG: Report skipped data
@@ -0,0 +1,37 @@
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conflict_graph import CourseConflictGraph  # noqa: E402
+from scheduler import ExamScheduler, SchedulerConfig  # noqa: E402
+
+
+@pytest.fixture
+def tao_scheduler():
+    """
+    ExamScheduler dựng sẵn dữ liệu (không đọc Excel).
+
+    to_thi: {MaHP: số tổ thi}, sv_to_mon: {MaSV: [MaHP]}, cohorts: {(CTDT, Khoa): [MaHP]}.
+    """
+    def _tao(to_thi, sv_to_mon, cohorts=None, so_ngay=3, ca=(1, 2), so_phong=6, **config):
+        config.setdefault("num_workers", 2)
+        scheduler = ExamScheduler(SchedulerConfig(**config))
+        ngay_dau = date(2026, 1, 5)
+        scheduler.ngay_thi = [ngay_dau + timedelta(days=i) for i in range(so_ngay)]
+        scheduler.map_ngay = {d: ngay for d, ngay in enumerate(scheduler.ngay_thi, start=1)}
+        scheduler.ca_thi = list(ca)
+        scheduler.phong_kha_dung = [f"P{i:02d}" for i in range(1, so_phong + 1)]
+        scheduler.phong_theo_mon = {m: {"ToThi": n, "PhongThi": "PH"} for m, n in to_thi.items()}
+        scheduler.ds_mahp_thi = list(to_thi)
+        scheduler.split_courses = {}
+        scheduler.ctdt_khoa_to_mon = dict(cohorts or {})
+        scheduler.conflict_graph = CourseConflictGraph.from_enrollments(
+            sv_to_mon, cohorts or {}, courses=list(to_thi)
+        )
+        scheduler.data_loaded = True
+        return scheduler
+    return _tao
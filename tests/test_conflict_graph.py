@@ -0,0 +1,59 @@
+from conflict_graph import CourseConflictGraph
+
+SV_TO_MON = {
+    "SV1": ["A", "B", "C"],
+    "SV2": ["A", "B"],        # Tập con của {A, B, C}
+    "SV3": ["A", "B"],
+    "SV4": ["C", "D"],
+    "SV5": ["E"],             # 1 môn: không phải clique
+    "SV6": ["F", "G"],
+    "SV7": ["F", "G"],
+}
+COHORTS = {("CNTT", 25): ["A", "B", "C"], ("KT", 25): ["F", "G", "H"], ("QT", 24): ["H"]}
+
+
+def tao_graph():
+    return CourseConflictGraph.from_enrollments(SV_TO_MON, COHORTS)
+
+
+def test_student_cliques_gom_theo_tap_mon():
+    cliques = tao_graph().student_cliques(set("ABCDEFGH"))
+    assert cliques == {
+        frozenset("ABC"): 1, frozenset("AB"): 2, frozenset("CD"): 1, frozenset("FG"): 2,
+    }
+
+
+def test_student_cliques_drop_subsets():
+    cliques = tao_graph().student_cliques(set("ABCDEFGH"), drop_subsets=True)
+    assert cliques == {frozenset("ABC"): 1, frozenset("CD"): 1, frozenset("FG"): 2}
+
+
+def test_student_cliques_loc_theo_tap_mon():
+    # Bỏ C: {A, B, C} thành {A, B} và gộp số SV; {C, D} chỉ còn 1 môn nên bị bỏ
+    cliques = tao_graph().student_cliques({"A", "B", "D"})
+    assert cliques == {frozenset("AB"): 3}
+    assert tao_graph().student_cliques({"A", "B", "D"}, drop_subsets=True) == {frozenset("AB"): 3}
+
+
+def test_equivalence_classes():
+    graph = tao_graph()
+    # F, G: cùng tập SV và cùng CTĐT-Khóa | A, B: cùng tập SV ({A,B,C} và {A,B}) và cùng CTĐT-Khóa
+    assert sorted(graph.equivalence_classes(list("ABCDEFGH"))) == [["A", "B"], ["F", "G"]]
+    # H thuộc thêm QT-24 nên không cùng lớp với F, G; chỉ xét môn được truyền vào
+    assert graph.equivalence_classes(["F", "H"]) == []
+    assert graph.equivalence_classes(["G", "F", "X"]) == [["F", "G"]]
+
+
+def test_components_va_shared_students():
+    graph = tao_graph()
+    comps = graph.components(list("ABCDEFGH"))
+    assert sorted(sorted(c) for c in comps) == [["A", "B", "C", "D"], ["E"], ["F", "G", "H"]]
+    assert len(graph.components(list("ABCDE"), extra_links=[("D", "E")])) == 1
+    assert graph.shared_students("A", "B") == 3
+    assert graph.shared_students("A", "D") == 0
+
+
+def test_subgraph_giu_so_sv():
+    sub = tao_graph().subgraph({"A", "B", "F", "G"})
+    assert sub.student_cliques({"A", "B", "F", "G"}) == {frozenset("AB"): 3, frozenset("FG"): 2}
+    assert sub.cohort_courses() == {("CNTT", 25): ["A", "B"], ("KT", 25): ["F", "G"]}
@@ -0,0 +1,48 @@
+from collections import defaultdict
+
+from scheduler import chia_suc_chua
+
+# 2 thành phần liên thông: A* có SV chung với nhau, B* có SV chung với nhau, không có SV chung giữa A và B
+TO_THI = {"A1": 3, "A2": 3, "A3": 2, "A4": 2, "B1": 4, "B2": 3}
+SV_TO_MON = {
+    "SV01": ["A1", "A2"], "SV02": ["A2", "A3"], "SV03": ["A3", "A4"], "SV04": ["A1", "A4"],
+    "SV05": ["B1", "B2"], "SV06": ["B1", "B2"],
+}
+
+
+def test_budgets_cong_lai_bang_suc_chua():
+    remaining = {(1, 1): 10, (1, 2): 7, (2, 1): 3, (2, 2): 0}
+    budgets = chia_suc_chua(remaining, demand=[10, 7], mon_lon_nhat=[1, 1])
+    for slot, cap in remaining.items():
+        assert sum(b[slot] for b in budgets) == cap
+    # Phần dư lớn nhất: nhóm cầu lớn hơn không bao giờ nhận ít hơn
+    assert all(budgets[0][slot] >= budgets[1][slot] for slot in remaining)
+
+
+def test_budget_it_nhat_bang_mon_lon_nhat():
+    budgets = chia_suc_chua({(1, 1): 6, (1, 2): 2}, demand=[10, 4], mon_lon_nhat=[3, 4])
+    assert budgets[1][(1, 1)] == 4          # Tỉ lệ chỉ được 2, nâng lên môn lớn nhất
+    assert budgets[1][(1, 2)] == 2          # Nhưng không vượt sức chứa của slot
+    assert budgets[0][(1, 1)] == 4
+
+
+def test_decompose_gop_lich_dung_suc_chua(tao_scheduler):
+    scheduler = tao_scheduler(TO_THI, SV_TO_MON, so_ngay=2, ca=(1, 2), so_phong=5,
+                              decompose=True, decompose_workers=2)
+    courses = list(TO_THI)
+    assert len(scheduler.conflict_graph.components(courses)) == 2
+
+    schedule = scheduler._run_solver_phase_decomposed(
+        "TEST", courses, time_limit=10, prioritize_early=False,
+        relax_same_day=True, distribute_uniformly=True
+    )
+
+    assert len(scheduler.last_phase_result["groups"]) == 2
+    assert set(schedule) == set(courses)
+    usage = defaultdict(int)
+    for mahp, slot in schedule.items():
+        usage[slot] += TO_THI[mahp]
+    assert max(usage.values()) <= 5
+    # Không có SV nào thi 2 môn cùng ca
+    for mon_list in SV_TO_MON.values():
+        assert len({schedule[m] for m in mon_list}) == len(mon_list)
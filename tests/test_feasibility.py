@@ -0,0 +1,62 @@
+from feasibility import chia_to_thi, phan_tich_kha_thi, so_slot_toi_thieu
+from scheduler import ExamScheduler
+
+
+def ma_loi(result, key):
+    return {item["code"] for item in result[key]}
+
+
+def test_chia_to_thi():
+    assert chia_to_thi(25) == [25]
+    assert chia_to_thi(26) == [13, 13]
+    assert chia_to_thi(31) == [15, 16]
+
+
+def test_so_slot_toi_thieu():
+    assert so_slot_toi_thieu([], 10) == 0
+    assert so_slot_toi_thieu([5, 5, 5, 5], 10) == 2
+    # Tổng chỉ cần 2 ca nhưng không 2 môn nào vừa chung 1 ca (cận L2 > cận L1)
+    assert so_slot_toi_thieu([6, 6, 6], 10) == 3
+    assert so_slot_toi_thieu([7, 3, 3, 3], 10) == 2
+
+
+def test_du_lieu_kha_thi(tao_scheduler):
+    scheduler = tao_scheduler({"A": 2, "B": 2, "C": 1}, {"SV1": ["A", "B"]}, {("CNTT", 25): ["A", "C"]},
+                              so_ngay=3, ca=(1, 2), so_phong=4)
+    result = phan_tich_kha_thi(scheduler)
+    assert result["success"] and result["feasible"]
+    assert result["errors"] == [] and result["warnings"] == []
+    assert result["bounds"]["suc_chua"] == 24
+    assert result["bounds"]["so_slot_toi_thieu"] == 2
+
+
+def test_mon_qua_lon_va_thieu_suc_chua(tao_scheduler):
+    scheduler = tao_scheduler({"A": 5, "B": 4, "C": 4}, {}, so_ngay=1, ca=(1, 2), so_phong=4)
+    result = phan_tich_kha_thi(scheduler)
+    assert not result["feasible"]
+    assert ma_loi(result, "errors") == {"COURSE_TOO_LARGE", "CAPACITY"}
+    assert result["errors"][0]["courses"] == ["A"]
+
+    scheduler = tao_scheduler({"A": 3, "B": 3, "C": 3}, {}, so_ngay=1, ca=(1, 2), so_phong=5)
+    assert ma_loi(phan_tich_kha_thi(scheduler), "errors") == {"CAPACITY_PACKING"}
+
+
+def test_canh_bao_sv_va_ctdt(tao_scheduler):
+    mon = {m: 1 for m in "ABCD"}
+    scheduler = tao_scheduler(mon, {"SV1": list("ABC"), "SV2": list("ABC")}, {("CNTT", 25): list("ABCD")},
+                              so_ngay=2, ca=(1, 2), so_phong=4)
+    result = phan_tich_kha_thi(scheduler)
+    assert result["feasible"]
+    assert ma_loi(result, "warnings") == {"STUDENT_DAY", "COHORT_SAME_DAY"}
+    assert result["warnings"][0]["so_sv"] == 2
+
+    # 2 môn trong 2 ngày: đủ ngày nhưng không thể vừa không trùng ngày vừa không liền ngày
+    scheduler = tao_scheduler({m: 1 for m in "AB"}, {}, {("CNTT", 25): ["A", "B"]},
+                              so_ngay=2, ca=(1,), so_phong=4)
+    result = phan_tich_kha_thi(scheduler)
+    assert ma_loi(result, "warnings") == {"COHORT_CONSECUTIVE"}
+    assert "chắc chắn có trùng ngày hoặc liền ngày" in result["warnings"][0]["message"]
+
+
+def test_chua_nap_du_lieu():
+    assert phan_tich_kha_thi(ExamScheduler()) == {"success": False, "error": "Data not loaded"}
@@ -0,0 +1,47 @@
+from collections import defaultdict
+
+import pytest
+
+from heuristic import HeuristicScheduler
+
+TO_THI = {"A": 3, "B": 2, "C": 2, "D": 1, "E": 3, "F": 1, "G": 2}
+SV_TO_MON = {"SV1": ["A", "B", "C"], "SV2": ["A", "B"], "SV3": ["C", "D", "E"], "SV4": ["E", "F"], "SV5": ["F", "G"]}
+COHORTS = {("CNTT", 25): ["A", "B", "C", "D"], ("KT", 25): ["E", "F", "G"]}
+
+
+@pytest.fixture
+def scheduler(tao_scheduler):
+    return tao_scheduler(TO_THI, SV_TO_MON, COHORTS, so_ngay=4, ca=(1, 2), so_phong=4)
+
+
+def test_lich_dung_suc_chua_va_mon_fixed(scheduler):
+    fixed = {"A": (1, 1)}
+    schedule = HeuristicScheduler(scheduler).schedule(
+        list(TO_THI), fixed_schedule=fixed, time_limit=1, allowed_days={"G": [3, 4]}
+    )
+    assert set(schedule) == set(TO_THI)
+    assert schedule["A"] == (1, 1)
+    assert schedule["G"][0] in (3, 4)
+    usage = defaultdict(int)
+    for mahp, slot in schedule.items():
+        usage[slot] += TO_THI[mahp]
+    assert max(usage.values()) <= 4
+
+
+@pytest.mark.parametrize("prioritize_early, distribute_uniformly", [(False, True), (True, False)])
+def test_objective_giong_cp_sat(scheduler, prioritize_early, distribute_uniformly):
+    heuristic = HeuristicScheduler(scheduler)
+    schedule = heuristic.schedule(list(TO_THI), time_limit=1, prioritize_early=prioritize_early,
+                                  distribute_uniformly=distribute_uniformly)
+    # Giải CP-SAT với mọi môn cố định theo lịch heuristic -> cùng giá trị hàm mục tiêu
+    scheduler._run_solver_phase("check", list(TO_THI), fixed_schedule=schedule, time_limit=10,
+                                prioritize_early=prioritize_early, relax_same_day=True,
+                                distribute_uniformly=distribute_uniformly)
+    assert scheduler.last_phase_result["objective"] == pytest.approx(heuristic.stats["objective"])
+
+
+def test_khong_du_phong(tao_scheduler):
+    scheduler = tao_scheduler({"A": 5, "B": 1}, {}, so_ngay=2, ca=(1,), so_phong=4)
+    heuristic = HeuristicScheduler(scheduler)
+    assert heuristic.schedule(["A", "B"], time_limit=1) is None
+    assert heuristic.stats["status"] == "INFEASIBLE"
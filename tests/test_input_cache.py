@@ -0,0 +1,59 @@
+import os
+
+import pandas as pd
+import pytest
+
+import input_cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    d = tmp_path / "cache"
+    monkeypatch.setattr(input_cache, "CACHE_DIR", str(d))
+    monkeypatch.setattr(input_cache, "_hash_memo", {})
+    return d
+
+
+def ghi_workbook(path, so_dong=3):
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({"MaSV": [f" SV{i} " for i in range(so_dong)], "Ten": ["An"] * so_dong,
+                      "MaHP": ["HP01 "] * so_dong}).to_excel(writer, sheet_name="SV", index=False)
+        pd.DataFrame({"Ca": [1, 2]}).to_excel(writer, sheet_name="CaThi", index=False)
+
+
+def test_doc_tu_kho_khong_parse_lai(cache_dir, tmp_path, monkeypatch):
+    path = str(tmp_path / "danhsachSV.xlsx")
+    ghi_workbook(path)
+    first = input_cache.read_excel_cached(path, sheet_name="CaThi")
+    assert first["Ca"].tolist() == [1, 2]
+
+    def khong_doc(*args, **kwargs):
+        raise AssertionError("Excel bị parse lại")
+    monkeypatch.setattr(input_cache.pd, "read_excel", khong_doc)
+    assert input_cache.read_excel_cached(path, sheet_name=1).equals(first)
+    assert list(input_cache.read_excel_cached(path, sheet_name=None)) == ["SV", "CaThi"]
+    sv = input_cache.read_excel_cached(path, normalize="sv")
+    assert sv["MaSV"].tolist() == ["SV0", "SV1", "SV2"] and sv["MaHP"].unique().tolist() == ["HP01"]
+    with pytest.raises(ValueError):
+        input_cache.read_excel_cached(path, sheet_name="Khong co")
+
+
+def test_file_doi_xoa_phien_ban_cu(cache_dir, tmp_path):
+    path = str(tmp_path / "danhsachSV.xlsx")
+    for so_dong in (3, 5, 7):
+        ghi_workbook(path, so_dong)
+        os.utime(path, ns=(so_dong, so_dong))  # mtime khác nhau dù ghi trong cùng 1 tick
+        assert len(input_cache.read_excel_cached(path)) == so_dong
+    assert len(os.listdir(cache_dir)) == 1
+    assert len(input_cache._hash_memo) == 1
+
+    assert input_cache.invalidate(path) == 1
+    assert os.listdir(cache_dir) == [] and input_cache._hash_memo == {}
+
+
+def test_validate_columns():
+    sheets = {"Sheet1": pd.DataFrame(columns=["MaSV ", "MaHP"])}
+    assert input_cache.validate_columns("sv", sheets) == ["Sheet Sheet1: thiếu cột Ten"]
+    assert input_cache.validate_columns("cfg", {"HK": pd.DataFrame(columns=["NamTH", "HKTH"])}) == [
+        "Thiếu sheet ThoiGianThi", "Thiếu sheet CaThi", "Thiếu sheet PhongThi",
+    ]
@@ -0,0 +1,54 @@
+from room_allocator import RoomIndex
+
+ROOMS = ["P30", "P40", "P60", "M40"]
+LOAI = {"P30": "PH", "P40": "PH", "P60": "PH", "M40": "PM"}
+SUC_CHUA = {"P30": 30, "P40": 40, "P60": 60, "M40": 40}
+SLOT = ("05/01/2026", 1)
+
+
+def tao_index():
+    return RoomIndex(ROOMS, LOAI, SUC_CHUA)
+
+
+def test_best_fit_to_dong_truoc():
+    index = tao_index()
+    assigned, problems = index.allocate(SLOT, [("a", 25, "PH"), ("b", 35, "PH"), ("c", 45, "PH")])
+    # c (45) -> P60, b (35) -> P40, a (25) -> P30: mỗi tổ vào phòng nhỏ nhất còn đủ chỗ
+    assert assigned == {"c": "P60", "b": "P40", "a": "P30"}
+    assert problems == []
+    assert index.free_rooms(SLOT) == ["M40"]
+
+
+def test_fallback_khac_loai_khi_het_phong_dung_loai():
+    index = tao_index()
+    index.occupy(SLOT, "P40")
+    index.occupy(SLOT, "P60")
+    assigned, problems = index.allocate(SLOT, [("a", 35, "PH")])
+    # PH còn P30 (không đủ chỗ) -> phòng khác loại đủ chỗ
+    assert assigned == {"a": "M40"}
+    assert problems == []
+
+
+def test_thieu_suc_chua_lay_phong_lon_nhat():
+    index = tao_index()
+    assigned, problems = index.allocate(SLOT, [("a", 80, "PH")])
+    assert assigned == {"a": "P60"}
+    assert problems == [{"key": "a", "reason": "thieu_suc_chua", "so_sv": 80, "PhongThi": "P60", "SucChua": 60}]
+
+
+def test_thieu_phong():
+    index = tao_index()
+    groups = [(f"t{i}", 10, "PH") for i in range(5)]
+    assigned, problems = index.allocate(SLOT, groups)
+    assert len(set(assigned.values())) == len(assigned) == 4
+    assert [p["reason"] for p in problems] == ["thieu_phong"]
+
+
+def test_release_va_reserve():
+    index = tao_index()
+    index.occupy(SLOT, "P30")
+    assigned, _ = index.allocate(SLOT, [("a", 20, "PH")], release=["P30"], reserve=False)
+    assert assigned == {"a": "P30"}
+    assert index.free_rooms(SLOT) == ["P40", "P60", "M40"]  # reserve=False: không ghi vào used
+    index.release(SLOT, "P30")
+    assert SLOT not in index.used
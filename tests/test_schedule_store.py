@@ -0,0 +1,76 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from schedule_store import ScheduleStore
+
+ROWS = [
+    {"MaHP": "HP01", "ToThi": 1, "Ngay": "05/01/2026", "Ca": 1, "PhongThi": "P01"},
+    {"MaHP": "HP01", "ToThi": 2, "Ngay": "05/01/2026", "Ca": 1, "PhongThi": "P02"},
+    {"MaHP": "HP02", "ToThi": 1, "Ngay": "06/01/2026", "Ca": 2, "PhongThi": "P01"},
+]
+
+
+@pytest.fixture
+def path(tmp_path):
+    p = tmp_path / "ket_qua_xep_lich_thi.xlsx"
+    pd.DataFrame(ROWS).to_excel(p, index=False)
+    return str(p)
+
+
+def vi_tri(store):
+    return {(r["MaHP"], int(r["ToThi"])): (r["Ngay"], int(r["Ca"]), r["PhongThi"]) for r in store.records()}
+
+
+def test_replay_change_log(path):
+    store = ScheduleStore(path, compact_every=100)
+    assert store.move("HP01", 2, "07/01/2026", 3, "P05")
+    assert store.swap(store.find("HP01", 1), store.find("HP02", 1))
+    expected = vi_tri(store)
+
+    # File Excel chưa đổi, thay đổi chỉ nằm trong log -> store mới đọc lại đúng trạng thái
+    assert pd.read_excel(path)["PhongThi"].tolist() == ["P01", "P02", "P01"]
+    with open(store.log_path, encoding="utf-8") as f:
+        assert len([line for line in f if line.strip()]) == 3  # header + 2 nhóm thay đổi
+    reloaded = ScheduleStore(path)
+    assert vi_tri(reloaded) == expected
+    assert reloaded.find_in_room("07/01/2026", 3, "P05")["ToThi"] == 2
+    reloaded.set_rooms(["P01", "P02", "P05"])
+    assert sorted(reloaded.free_rooms("05/01/2026", 1)) == ["P02", "P05"]  # P01: HP02 tổ 1 sau khi hoán đổi
+
+
+def test_compact_round_trip(path):
+    store = ScheduleStore(path, compact_every=100)
+    store.move("HP02", 1, "05/01/2026", 2, "P03")
+    expected = vi_tri(store)
+    store.flush()
+
+    assert vi_tri(ScheduleStore(path)) == expected
+    df = pd.read_excel(path)
+    assert df.loc[df["MaHP"] == "HP02", ["Ngay", "Ca", "PhongThi"]].values.tolist() == [["05/01/2026", 2, "P03"]]
+    with open(store.log_path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    assert len(lines) == 1 and "base" in lines[0]  # Log chỉ còn header của phiên bản file mới
+
+
+def test_tu_compact_sau_compact_every(path):
+    store = ScheduleStore(path, compact_every=2)
+    store.move("HP01", 1, "06/01/2026", 1, "P04")
+    assert pd.read_excel(path)["PhongThi"].tolist()[0] == "P01"
+    store.move("HP01", 2, "06/01/2026", 1, "P05")
+    assert pd.read_excel(path)["PhongThi"].tolist()[:2] == ["P04", "P05"]
+
+
+def test_bo_log_cua_file_cu_va_dong_ghi_do(path):
+    store = ScheduleStore(path, compact_every=100)
+    store.move("HP01", 1, "07/01/2026", 2, "P09")
+    with open(store.log_path, "a", encoding="utf-8") as f:
+        f.write('{"t": 1, "changes": [["HP02", 1,')  # Server dừng giữa lúc ghi
+    assert vi_tri(ScheduleStore(path))[("HP01", 1)] == ("07/01/2026", 2, "P09")
+
+    # File bị thay từ bên ngoài -> log cũ không được áp lên file mới
+    pd.DataFrame(ROWS).to_excel(path, index=False)
+    os.utime(path, ns=(1, 1))
+    assert vi_tri(ScheduleStore(path))[("HP01", 1)] == ("05/01/2026", 1, "P01")
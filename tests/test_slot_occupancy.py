@@ -0,0 +1,91 @@
+import random
+
+import pandas as pd
+import pytest
+
+from schedule_store import ScheduleStore
+from slot_occupancy import StudentSlotIndex
+
+NGAY = ["05/01/2026", "06/01/2026", "07/01/2026"]
+CA = [1, 2, 3]
+
+
+@pytest.fixture
+def du_lieu(tmp_path):
+    rng = random.Random(7)
+    mon = [f"HP{i:02d}" for i in range(12)]
+    rows = []
+    for m in mon:
+        for to in range(1, rng.randint(1, 3) + 1):
+            rows.append({"MaHP": m, "ToThi": to, "Ngay": rng.choice(NGAY), "Ca": rng.choice(CA),
+                         "PhongThi": f"P{len(rows):02d}"})
+    df_schedule = pd.DataFrame(rows)
+    path = tmp_path / "ket_qua_xep_lich_thi.xlsx"
+    df_schedule.to_excel(path, index=False)
+
+    df_sv = pd.DataFrame(
+        [{"MaSV": f"SV{s:03d}", "MaHP": m} for s in range(60) for m in rng.sample(mon, rng.randint(1, 4))]
+    )
+    index = StudentSlotIndex(ScheduleStore(str(path)))
+    index.load_students(df_sv)
+    return index, df_schedule, df_sv, mon
+
+
+def quet_tung_dong(df_schedule, df_sv, moving_info, ngay, ca=None):
+    """Cách kiểm tra cũ của /api/schedule/batch-update: duyệt từng dòng SV của các môn đang chuyển"""
+    sv_to_mahp = df_sv.groupby("MaSV")["MaHP"].apply(list).to_dict()
+    moving = list(moving_info)
+    students = df_sv[df_sv["MaHP"].isin(moving)][["MaSV", "MaHP"]].drop_duplicates()
+    mask = (df_schedule["Ngay"] == ngay) & (~df_schedule["MaHP"].isin(moving))
+    if ca is not None:
+        mask &= df_schedule["Ca"] == ca
+    exams = df_schedule[mask]
+    details = []
+    for _, row in students.iterrows():
+        for conflict in (m for m in sv_to_mahp.get(row["MaSV"], []) if m in set(exams["MaHP"])):
+            first = exams[exams["MaHP"] == conflict].iloc[0]
+            detail = (row["MaSV"], row["MaHP"], moving_info[row["MaHP"]], conflict, int(first["ToThi"]))
+            details.append(detail if ca is not None else detail + (int(first["Ca"]),))
+    return sorted(details)
+
+
+def rut_gon(details, keys):
+    return sorted(tuple(d[k] for k in keys) for d in details)
+
+
+def test_check_shift_va_check_day_giong_cach_cu(du_lieu):
+    index, df_schedule, df_sv, mon = du_lieu
+    rng = random.Random(11)
+    co_xung_dot = 0
+    for _ in range(40):
+        moving = {m: rng.randint(1, 2) for m in rng.sample(mon, rng.randint(1, 3))}
+        ngay, ca = rng.choice(NGAY), rng.choice(CA)
+
+        total, details = index.check_shift(moving, ngay, ca)
+        expected = quet_tung_dong(df_schedule, df_sv, moving, ngay, ca)
+        assert total == len(expected)
+        assert rut_gon(details, ["MaSV", "moving_MaHP", "moving_ToThi", "conflict_MaHP", "conflict_ToThi"]) == expected
+
+        total, details = index.check_day(moving, ngay)
+        expected = quet_tung_dong(df_schedule, df_sv, moving, ngay)
+        assert total == len(expected)
+        assert rut_gon(details, ["MaSV", "moving_MaHP", "moving_ToThi", "conflict_MaHP",
+                                 "conflict_ToThi", "conflict_Ca"]) == expected
+        co_xung_dot += total > 0
+    assert co_xung_dot > 5  # Dữ liệu ngẫu nhiên phải thực sự có xung đột
+
+
+def test_chi_so_cap_nhat_khi_lich_doi(du_lieu):
+    index, df_schedule, df_sv, mon = du_lieu
+    store = index.store
+    row = store.records()[0]
+    moving = {row["MaHP"]: int(row["ToThi"])}
+    index.check_day(moving, NGAY[0])
+
+    # Chuyển mọi tổ của 1 môn khác sang NGAY[0] ca 1 -> chỉ số phải dựng lại theo version mới
+    khac = next(m for m in mon if m != row["MaHP"])
+    store.apply([(khac, r["ToThi"], NGAY[0], 1, r["PhongThi"]) for r in store.records() if r["MaHP"] == khac])
+    df_moi = store.to_dataframe()
+    total, _ = index.check_day(moving, NGAY[0])
+    assert total == len(quet_tung_dong(df_moi, df_sv, moving, NGAY[0]))
+    assert index._version == store.version
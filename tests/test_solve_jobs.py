@@ -0,0 +1,111 @@
+import queue
+import time
+from concurrent.futures import Future
+
+import pytest
+
+import solve_jobs
+from solve_jobs import JOB_END, SolveJobManager
+
+
+class QueueHet(queue.Queue):
+    """Queue hết sự kiện thì báo EOFError (như Manager đã đóng) để thread nền dừng"""
+    def get(self, *args, **kwargs):
+        try:
+            return super().get(block=False)
+        except queue.Empty:
+            raise EOFError
+
+
+class ExecutorGia:
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fn, *args):
+        self.futures.append(Future())
+        return self.futures[-1]
+
+
+@pytest.fixture
+def manager():
+    mgr = SolveJobManager()
+    mgr._executor = ExecutorGia()
+    mgr._queue = QueueHet()
+    return mgr
+
+
+def test_chay_job_day_job_end_cuoi_cung(monkeypatch):
+    def run_gia(job_id, paths, config_kwargs, result_folder, progress_queue):
+        progress_queue.put((job_id, {"event": "stage", "stage": "solve"}))
+        return {"success": True}
+    monkeypatch.setattr(solve_jobs, "run_solve_job", run_gia)
+    q = queue.Queue()
+    assert solve_jobs._chay_job("j1", {}, {}, "", q) == {"success": True}
+    events = [q.get_nowait()[1] for _ in range(q.qsize())]
+    assert [e["event"] for e in events] == ["stage", JOB_END] and events[-1]["result"] == {"success": True}
+
+    def run_loi(*args):
+        raise MemoryError("hết RAM")
+    monkeypatch.setattr(solve_jobs, "run_solve_job", run_loi)
+    with pytest.raises(MemoryError):
+        solve_jobs._chay_job("j2", {}, {}, "", q)
+    job_id, event = q.get_nowait()
+    assert job_id == "j2" and event["event"] == JOB_END and not event["result"]["success"]
+
+
+def test_decompose_khong_mo_pool_long(monkeypatch):
+    configs = []
+
+    class SchedulerGia:
+        def __init__(self, config):
+            configs.append(config)
+
+        def load_data(self, **paths):
+            return {"success": False, "error": "không có file"}
+    monkeypatch.setattr(solve_jobs, "ExamScheduler", SchedulerGia)
+    kwargs = {"decompose": True, "decompose_workers": 4}
+    result = solve_jobs.run_solve_job("j", {}, kwargs, "", queue.Queue())
+    assert not result["success"]
+    assert configs[0].decompose_workers == 1 and kwargs["decompose_workers"] == 4
+
+
+def test_job_chi_xong_khi_da_nhan_het_su_kien(manager):
+    job_id = manager.submit({}, {}, "")
+    assert manager.get(job_id)["status"] == "queued"
+    # Future xong trước khi thread nền đọc queue: trạng thái chưa đổi
+    manager._executor.futures[0].set_result({"success": True})
+    manager._on_done(job_id, manager._executor.futures[0])
+    assert manager.get(job_id)["status"] == "queued"
+
+    for event in ({"event": "stage", "stage": "solve"}, {"event": "phase_start", "phase": "PHASE 1"},
+                  {"event": "solution", "phase": "PHASE 1", "objective": 10, "bound": 5, "solutions": 1},
+                  {"event": JOB_END, "result": {"success": True}},
+                  {"event": "stage", "stage": "muộn"}):
+        manager._queue.put((job_id, event))
+    manager._drain_events()
+    job = manager.get(job_id)
+    assert job["status"] == "done" and job["num_events"] == 3
+    assert job["progress"]["objective"] == 10 and job["progress"]["stage"] == "solve"
+    assert [e["seq"] for e in manager.get(job_id, since=1)["events"]] == [1, 2]
+
+
+def test_process_con_chet_thi_job_failed(manager):
+    job_id = manager.submit({}, {}, "")
+    manager._executor.futures[0].set_exception(RuntimeError("process chết"))
+    manager._on_done(job_id, manager._executor.futures[0])
+    job = manager.get(job_id)
+    assert job["status"] == "failed" and job["result"]["error"] == "process chết"
+
+
+def test_don_dep_theo_ttl_va_so_luong(manager, monkeypatch):
+    monkeypatch.setattr(SolveJobManager, "MAX_FINISHED_JOBS", 3)
+    ids = [manager.submit({}, {}, "") for _ in range(6)]
+    now = time.time()
+    for i, job_id in enumerate(ids[:5]):
+        manager._ket_thuc(manager.jobs[job_id], {"success": True})
+        manager.jobs[job_id]["finished_at"] = now - 10 * (5 - i)
+    manager.jobs[ids[0]]["finished_at"] = now - SolveJobManager.JOB_TTL - 1
+
+    listed = {j["id"] for j in manager.list_jobs()}
+    # Job 0 quá TTL, job 1 vượt MAX_FINISHED_JOBS; job đang chạy luôn được giữ
+    assert listed == set(ids[2:])
@@ -1,6 +1,8 @@
-import pandas as pd
 import os
 
+from exam_config import load_exam_config
+from input_cache import read_excel_cached
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(BASE_DIR, "Data.xlsx")
 CFG_PATH = os.path.join(BASE_DIR, "cau_hinh.xlsx")
@@ -14,9 +16,8 @@ def validate():
         print(f"❌ Không tìm thấy file {CFG_PATH}")
         return
         
-    df_thoigian = pd.read_excel(CFG_PATH, sheet_name="ThoiGianThi")
-    ngay_thi = df_thoigian[df_thoigian["SuDung"] == 1]["NgayThi"].unique()
-    so_ngay = len(ngay_thi)
+    cfg = load_exam_config(CFG_PATH)
+    so_ngay = len(set(cfg.ngay_thi))
     print(f"📅 Số ngày thi khả dụng: {so_ngay}")
     
     # 2. Đọc danh sách môn cần thi
@@ -24,20 +25,11 @@ def validate():
         print(f"❌ Không tìm thấy file {DATA_PATH}")
         return
         
-    df_data = pd.read_excel(DATA_PATH)
-    
     # Lấy học kỳ hiện tại (giả sử dữ liệu năm/kỳ đầu tiên trong file config là đúng)
-    df_hk = pd.read_excel(CFG_PATH, sheet_name="HK")
-    nam_th = int(df_hk.loc[0, "NamTH"])
-    hk_th = int(df_hk.loc[0, "HKTH"])
-    
-    df_data_thi = df_data[
-        (df_data["NamTH"] == nam_th) & 
-        (df_data["HKTH"] == hk_th)
-    ]
+    df_data_thi = read_excel_cached(DATA_PATH, normalize="data_thi", nam_th=cfg.nam_th, hk_th=cfg.hk_th)
     
     # 3. Đọc danh sách LHP để lọc môn thực tế có mở lớp
-    df_lhp = pd.read_excel(LHP_PATH)
+    df_lhp = read_excel_cached(LHP_PATH)
     ds_mahp_thuc_te = set(df_lhp["MaHP"].unique())
     
     # 4. Kiểm tra từng CTĐT-Khóa
@@ -1,6 +1,8 @@
 import pandas as pd
 from ortools.sat.python import cp_model
 
+from scheduler import rai_sv_vao_to_thi
+
 model = cp_model.CpModel()
 
 from collections import defaultdict
@@ -331,51 +333,12 @@ mon_sv = (
 # ======================
 # 3.3. RẢI SINH VIÊN VÀO TỔ THI (CHIA ĐỀU – ABC)
 # ======================
-ds_sv_to_thi = []
-
-for mahp, df_mhp in df_sv.groupby("MaHP"):
-    # Chỉ xử lý môn có trong danh sách thi
-    if mahp not in phong_theo_mon:
-        continue
-
-    so_to = int(phong_theo_mon[mahp]["ToThi"])
-
-    # Sắp xếp SV theo tên ABC
-    df_mhp_sorted = (
-        df_mhp
-        .sort_values("Ten")
-        .reset_index(drop=True)
-    )
-
-    N = len(df_mhp_sorted)
-    if N == 0:
-        continue
-
-    base = N // so_to
-    du = N % so_to
-
-    start_idx = 0
-
-    for to in range(1, so_to + 1):
-        # Các tổ đầu được +1 SV nếu còn dư
-        so_sv_to = base + (1 if to <= du else 0)
-
-        df_to = df_mhp_sorted.iloc[start_idx:start_idx + so_sv_to]
-
-        for _, row in df_to.iterrows():
-            ds_sv_to_thi.append({
-                "MaSV": row["MaSV"],
-                "Ten": row["Ten"],
-                "MaHP": mahp,
-                "ToThi": to
-            })
-
-        start_idx += so_sv_to
+# Các tổ đầu được +1 SV nếu còn dư (xem scheduler.rai_sv_vao_to_thi)
+df_sv_to_thi = rai_sv_vao_to_thi(df_sv, phong_theo_mon)
 
 # ======================
 # 3.4. DataFrame kết quả rải SV
 # ======================
-df_sv_to_thi = pd.DataFrame(ds_sv_to_thi)
 print(df_sv_to_thi)
 
 # ======================